@@ -1,9 +1,6 @@
 import streamlit as st
 import time
-from firebase_utils import log_audit_event, initialize_firebase
-
-# Initialize Firebase
-firebase_app = initialize_firebase()
+from firebase_utils import log_audit_event
 
 def initialize_session():
     """Initialize session state variables."""
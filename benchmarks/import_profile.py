@@ -0,0 +1,82 @@
+# dairy_farm_app/benchmarks/import_profile.py
+"""
+Import-time profile of the app entry point and every page module, each imported in a fresh
+interpreter with `python -X importtime` so results do not depend on import order.
+
+    python -m benchmarks.import_profile
+    python -m benchmarks.import_profile --top 15 --json import_profile.json
+
+Cold start is roughly the `main` row plus the first page's row; the heaviest packages
+column shows what a module drags in.
+"""
+import argparse
+import ast
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+def page_modules():
+    """Page modules named in main's page registry, read from the source so main is not imported."""
+    tree = ast.parse((ROOT / "main.py").read_text())
+    modules = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Assign) and any(getattr(t, "id", "") in ("MANAGER_PAGES", "STAFF_PAGES")
+                                                for t in node.targets):
+            for value in node.value.values:
+                module = value.elts[0].value
+                if module not in modules:
+                    modules.append(module)
+    return modules
+
+def profile_import(module):
+    """(total seconds, [(package, cumulative seconds)] for its direct imports), or (None, error message)."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=ROOT, capture_output=True, text=True)
+    if result.returncode != 0:
+        return None, result.stderr.strip().splitlines()[-1]
+
+    # Lines are printed child first: "import time: self | cumulative |   name", two spaces per level
+    children = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 0:
+            if name.strip() == module:
+                total, packages = int(cumulative) / 1e6, children
+                break
+            children = []
+        elif depth == 1:
+            children.append((name.strip(), int(cumulative) / 1e6))
+    else:
+        return None, "module not found in -X importtime output"
+    packages.sort(key=lambda p: p[1], reverse=True)
+    return total, packages
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile import time of the app and its page modules.")
+    parser.add_argument("--top", type=int, default=5, help="heaviest imports to list per module")
+    parser.add_argument("--json", type=Path, help="also write the results to this file")
+    args = parser.parse_args()
+
+    results = {}
+    for module in ["main"] + page_modules():
+        total, packages = profile_import(module)
+        if total is None:
+            print(f"{module:<34} not importable here: {packages}")
+            results[module] = {"error": packages}
+            continue
+        heaviest = ", ".join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in packages[:args.top])
+        print(f"{module:<34} {total * 1000:>8.0f} ms   {heaviest}")
+        results[module] = {"seconds": total, "heaviest": packages[:args.top]}
+
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2) + "\n")
+        print(f"\nWritten to {args.json}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+# dairy_farm_app/benchmarks/run_benchmarks.py
+"""
+Benchmarks for the calculation and report pipeline on synthetic farms of increasing size,
+run against in-memory tables instead of Firestore and without Streamlit.
+
+    python -m benchmarks.run_benchmarks                       # compare with benchmarks/baseline.json
+    python -m benchmarks.run_benchmarks --max-records 100000  # skip the larger farms
+    python -m benchmarks.run_benchmarks --save-baseline       # record a new baseline
+
+Time is the best of --repeat runs; peak memory comes from one extra run under tracemalloc.
+"""
+import argparse
+import json
+import math
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import date
+from pathlib import Path
+import pandas as pd
+
+from utils.data_loader import set_table_source, bump_collection_version, compact_frame, to_date
+from utils.calculations import (get_feed_inventory, calculate_feed_cost_used, calculate_profit_per_cow,
+                                calculate_monthly_salaries, build_daily_report, aggregate_report)
+from utils.pricing import get_milk_prices
+from utils.synthetic_data import generate_farm_data
+
+BASELINE_PATH = Path(__file__).with_name("baseline.json")
+# Fixed so every run benchmarks the same data
+END_DATE = date(2025, 6, 30)
+# Farm sizes: label -> (cows, days). Roughly 100 to 1M milk_production records.
+SIZES = {
+    "100": (5, 10),
+    "1k": (10, 48),
+    "10k": (50, 95),
+    "100k": (200, 238),
+    "1M": (500, 952),
+}
+REGRESSION_RATIO = 1.25   # slower than baseline by more than this is a regression
+SCALING_CLIFF = 1.3       # time growing faster than records ** this between sizes is flagged
+
+def expected_milk_records(label):
+    # About 70% of generated cows are lactating and each is milked three times a day
+    cows, days = SIZES[label]
+    return int(cows * days * 0.7 * 3)
+
+class FarmTables:
+    """In-memory table source returning shallow copies of compact frames, as load_table's shared cache does."""
+
+    def __init__(self, data):
+        self.data = {name: compact_frame(df) for name, df in data.items()}
+
+    def __call__(self, name):
+        df = self.data.get(name)
+        return df.copy(deep=False) if df is not None else pd.DataFrame()
+
+    def invalidate(self):
+        # Drop the version-keyed caches so every run does the full calculation
+        for name in self.data:
+            bump_collection_version(name)
+
+def _period_inputs(tables, employees, start_date, end_date):
+    """The period-filtered frames reports_page hands to the daily aggregation."""
+    def in_period(name, col):
+        df = to_date(tables(name), col)
+        return df[(df[col] >= start_date) & (df[col] <= end_date)] if not df.empty else df
+
+    return {
+        "milk_totals": in_period("milk_totals", "date"),
+        "milk": in_period("milk_production", "date"),
+        "feed_cost_used": calculate_feed_cost_used(start_date, end_date),
+        "feeds_received": in_period("feeds_received", "date"),
+        "health": in_period("health_records", "date"),
+        "ai": in_period("ai_records", "ai_date"),
+        "salary_costs": calculate_monthly_salaries(employees, start_date, end_date),
+        "milk_prices": get_milk_prices(),
+    }
+
+def benchmark_cases(tables, start_date, end_date):
+    """Function name -> zero-argument callable. Setup that is not being measured happens here."""
+    employees = tables("employees")
+    employees["start_date"] = pd.to_datetime(employees["start_date"], errors='coerce')
+    employees["end_date"] = pd.to_datetime(employees["end_date"], errors='coerce')
+    inputs = _period_inputs(tables, employees, start_date, end_date)
+
+    def report_aggregation():
+        daily = build_daily_report(start_date, end_date, **inputs)
+        for granularity in ["Daily", "Weekly", "Monthly"]:
+            aggregate_report(daily, granularity)
+
+    return {
+        "get_feed_inventory": get_feed_inventory,
+        "calculate_feed_cost_used": lambda: calculate_feed_cost_used(start_date, end_date),
+        "calculate_profit_per_cow": lambda: calculate_profit_per_cow(start_date, end_date),
+        "calculate_monthly_salaries": lambda: calculate_monthly_salaries(employees, start_date, end_date),
+        "report_aggregation": report_aggregation,
+    }
+
+def measure(func, tables, repeat):
+    """Best wall time over `repeat` runs and the peak traced allocation of one more run."""
+    best = math.inf
+    for _ in range(repeat):
+        tables.invalidate()
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+
+    tables.invalidate()
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return best, peak
+
+def run(sizes, repeat, only=None):
+    results = {}
+    for label in sizes:
+        cows, days = SIZES[label]
+        data = generate_farm_data(n_cows=cows, years=days / 365, end_date=END_DATE, seed=0)
+        tables = FarmTables(data)
+        set_table_source(tables)
+        try:
+            start_date = pd.Timestamp(data["milk_production"]["date"].min()).date()
+            cases = benchmark_cases(tables, start_date, END_DATE)
+            records = {name: len(df) for name, df in data.items()}
+            results[label] = {"records": records["milk_production"], "total_records": sum(records.values()),
+                              "functions": {}}
+            print(f"\n{label}: {cows} cows x {days} days, {sum(records.values()):,} records "
+                  f"({records['milk_production']:,} milk)")
+            for name, func in cases.items():
+                if only and name not in only:
+                    continue
+                seconds, peak = measure(func, tables, repeat)
+                results[label]["functions"][name] = {"seconds": seconds, "peak_bytes": peak}
+                print(f"  {name:<28} {seconds * 1000:>10.1f} ms {peak / 2**20:>9.1f} MiB")
+        finally:
+            set_table_source(None)
+    return results
+
+def scaling_cliffs(results):
+    """(function, from, to, exponent) where time grew faster than records ** SCALING_CLIFF."""
+    cliffs = []
+    labels = list(results)
+    for small, large in zip(labels, labels[1:]):
+        growth = results[large]["total_records"] / results[small]["total_records"]
+        for name, timing in results[large]["functions"].items():
+            before = results[small]["functions"].get(name)
+            # Below a millisecond the fixed overhead dominates and the exponent means nothing
+            if not before or before["seconds"] < 1e-3 or growth <= 1:
+                continue
+            exponent = math.log(timing["seconds"] / before["seconds"]) / math.log(growth)
+            if exponent > SCALING_CLIFF:
+                cliffs.append((name, small, large, exponent))
+    return cliffs
+
+def compare(results, baseline):
+    """(size, function, metric, baseline, current, ratio) for every measurement worse than the baseline allows."""
+    regressions = []
+    for label, current in results.items():
+        base = baseline.get("results", {}).get(label)
+        if not base:
+            continue
+        for name, now in current["functions"].items():
+            before = base["functions"].get(name)
+            if not before:
+                continue
+            for metric in ["seconds", "peak_bytes"]:
+                # Ignore noise on measurements that are tiny to begin with
+                floor = 5e-3 if metric == "seconds" else 2**20
+                if before[metric] < floor and now[metric] < floor:
+                    continue
+                ratio = now[metric] / before[metric] if before[metric] else math.inf
+                if ratio > REGRESSION_RATIO:
+                    regressions.append((label, name, metric, before[metric], now[metric], ratio))
+    return regressions
+
+def _format(metric, value):
+    return f"{value * 1000:.1f} ms" if metric == "seconds" else f"{value / 2**20:.1f} MiB"
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the calculation and report pipeline.")
+    parser.add_argument("--sizes", nargs="+", choices=list(SIZES), default=list(SIZES))
+    parser.add_argument("--max-records", type=int, help="skip farms with more milk records than this")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--only", nargs="+", help="benchmark only these functions")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--fail-on-regression", action="store_true", help="exit non-zero on regressions or cliffs")
+    args = parser.parse_args()
+
+    sizes = [s for s in SIZES if s in args.sizes]
+    if args.max_records:
+        sizes = [s for s in sizes if expected_milk_records(s) <= args.max_records]
+    results = run(sizes, args.repeat, args.only)
+
+    cliffs = scaling_cliffs(results)
+    if cliffs:
+        print("\nScaling cliffs (time exponent vs records):")
+        for name, small, large, exponent in cliffs:
+            print(f"  {name}: {small} -> {large} grows as n^{exponent:.2f}")
+
+    regressions = []
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps({
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "machine": platform.machine(),
+            "results": results,
+        }, indent=2) + "\n")
+        print(f"\nBaseline written to {args.baseline}")
+    elif args.baseline.exists():
+        baseline = json.loads(args.baseline.read_text())
+        regressions = compare(results, baseline)
+        if regressions:
+            print(f"\nRegressions against {args.baseline.name} (more than {REGRESSION_RATIO:.2f}x):")
+            for label, name, metric, before, now, ratio in regressions:
+                print(f"  {label} {name} {metric}: {_format(metric, before)} -> {_format(metric, now)} ({ratio:.2f}x)")
+        else:
+            print(f"\nNo regressions against {args.baseline.name}")
+    else:
+        print(f"\nNo baseline at {args.baseline}; run with --save-baseline to record one")
+
+    if args.fail_on_regression and (regressions or cliffs):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
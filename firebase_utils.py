@@ -1,11 +1,15 @@
 import streamlit as st
 import json
 import re
+import time
 import pandas as pd
 import firebase_admin
 from datetime import datetime
 from firebase_admin import credentials, firestore, auth
 import requests
+from utils.data_loader import bump_collection_version
+from utils.perf import track_firestore, record_firestore_call, current_page
+from utils.read_budget import charge_reads, exceeded_budget, remember_frame, last_frame, record_budget_alert
 
 @st.cache_resource
 def get_firebase_app():
@@ -73,58 +77,254 @@ def get_firebase_app():
     
     return firestore.client() if st.session_state.firebase_initialized else None
 
-# Initialize Firebase
-db = get_firebase_app()
+def get_db():
+    """The Firestore client. Firebase is initialised on first use, not when this module is imported."""
+    return get_firebase_app()
 
 def initialize_firebase():
     """Compatibility function to initialize Firebase app."""
     return get_firebase_app()
 
-def get_collection(collection_name):
+def over_budget_fallback(collection_name, cached=None):
+    """
+    cached (default: the last frame get_collection read for the collection) if a read
+    budget is spent, otherwise None.
+    """
+    scope = exceeded_budget()
+    if scope is None:
+        return None
+    if cached is None:
+        cached = last_frame(collection_name)
+    # A collection never read before is still read so the page can render
+    if cached is None:
+        return None
+    page = current_page() or "(outside pages)"
+    if record_budget_alert(scope, collection_name, page):
+        log_audit_event("System", "READ_BUDGET_EXCEEDED",
+                        f"{scope.capitalize()} read budget spent; {page} served cached {collection_name}")
+    return cached
+
+def refuse_over_budget(collection_name):
+    """
+    True, with a warning, if a read budget is spent. For queries and streams, which have no
+    cached frame to fall back on the way whole-collection reads do.
+    """
+    scope = exceeded_budget()
+    if scope is None:
+        return False
+    page = current_page() or "(outside pages)"
+    if record_budget_alert(scope, collection_name, page):
+        log_audit_event("System", "READ_BUDGET_EXCEEDED",
+                        f"{scope.capitalize()} read budget spent; {page} was refused {collection_name}")
+    st.warning(f"The {scope} Firestore read budget is used up; {collection_name} was not read.")
+    return True
+
+def get_collection(collection_name, keep_last=True):
+    """
+    Read a whole collection. keep_last keeps the frame as the over-budget fallback; callers
+    with their own cache (load_table) pass False to avoid holding a second copy.
+    """
+    db = get_db()
+    if not db:
+        st.error("Firebase not initialized on Cloud.")
+        return pd.DataFrame()
+    cached = over_budget_fallback(collection_name)
+    if cached is not None:
+        return cached
+    try:
+        with track_firestore("read", collection_name) as call:
+            docs = db.collection(collection_name).stream()
+            data = []
+            for doc in docs:
+                call.docs += 1
+                doc_data = doc.to_dict()
+                if doc_data:
+                    doc_data['id'] = doc.id
+                    data.append(doc_data)
+            # Firestore bills a query that matches nothing as one read
+            call.docs = max(call.docs, 1)
+        charge_reads(call.docs)
+        df = pd.DataFrame(data)
+        if keep_last:
+            remember_frame(collection_name, df)
+        return df
+    except Exception as e:
+        st.error(f"Error reading from {collection_name} on Cloud: {e}")
+        return pd.DataFrame()
+
+def query_collection(collection_name, filters):
+    """Documents matching every (field, operator, value) filter, e.g. one day's milkings, as a DataFrame."""
+    db = get_db()
     if not db:
         st.error("Firebase not initialized on Cloud.")
         return pd.DataFrame()
+    if refuse_over_budget(collection_name):
+        return pd.DataFrame()
+    query = db.collection(collection_name)
+    for field, op, value in filters:
+        query = query.where(field, op, value)
     try:
-        docs = db.collection(collection_name).stream()
+        with track_firestore("read", collection_name) as call:
+            docs = list(query.stream())
+            call.docs = max(len(docs), 1)
+        charge_reads(call.docs)
+    except Exception as e:
+        st.error(f"Error reading from {collection_name} on Cloud: {e}")
+        return pd.DataFrame()
+    data = []
+    for doc in docs:
+        doc_data = doc.to_dict()
+        if doc_data:
+            doc_data['id'] = doc.id
+            data.append(doc_data)
+    return pd.DataFrame(data)
+
+def stream_collection(collection_name, chunk_size=1000, order_field=None, start=None, end=None):
+    """
+    Yield a collection as DataFrame chunks of at most chunk_size documents, paging with
+    query cursors so only one chunk is held in memory. start/end filter order_field (inclusive).
+    """
+    db = get_db()
+    if not db:
+        st.error("Firebase not initialized on Cloud.")
+        return
+    if refuse_over_budget(collection_name):
+        return
+    query = db.collection(collection_name)
+    if order_field:
+        if start is not None:
+            query = query.where(order_field, ">=", start)
+        if end is not None:
+            query = query.where(order_field, "<=", end)
+        query = query.order_by(order_field)
+    else:
+        query = query.order_by("__name__")
+    query = query.limit(chunk_size)
+
+    last_doc = None
+    while True:
+        try:
+            page = query.start_after(last_doc) if last_doc is not None else query
+            with track_firestore("read", collection_name) as call:
+                docs = list(page.stream())
+                call.docs = max(len(docs), 1)
+            charge_reads(call.docs)
+        except Exception as e:
+            st.error(f"Error reading from {collection_name} on Cloud: {e}")
+            return
         data = []
         for doc in docs:
             doc_data = doc.to_dict()
             if doc_data:
                 doc_data['id'] = doc.id
                 data.append(doc_data)
-        return pd.DataFrame(data)
+        if data:
+            yield pd.DataFrame(data)
+        if len(docs) < chunk_size:
+            return
+        last_doc = docs[-1]
+
+def _page_query(db, collection_name, order_field=None, descending=False, prefix_field=None, prefix=None):
+    """
+    The query behind a paginated table. A prefix search becomes a range on prefix_field,
+    which Firestore serves from the field's automatic index; the range field must also be
+    the first sort field, so searches are ordered by prefix_field instead of order_field.
+    """
+    query = db.collection(collection_name)
+    if prefix_field and prefix:
+        query = query.where(prefix_field, ">=", prefix).where(prefix_field, "<", prefix + "\uf8ff")
+        return query.order_by(prefix_field)
+    if order_field:
+        direction = firestore.Query.DESCENDING if descending else firestore.Query.ASCENDING
+        return query.order_by(order_field, direction=direction)
+    return query.order_by("__name__")
+
+def count_documents(collection_name, order_field=None, descending=False, prefix_field=None, prefix=None):
+    """Number of documents a paginated query matches, from a count aggregation instead of reading them."""
+    db = get_db()
+    if not db:
+        st.error("Firebase not initialized on Cloud.")
+        return 0
+    try:
+        query = _page_query(db, collection_name, order_field, descending, prefix_field, prefix)
+        with track_firestore("read", collection_name) as call:
+            total = int(query.count().get()[0][0].value)
+            # Firestore bills a count as one read per 1000 index entries, with a minimum of one
+            call.docs = max(1, -(-total // 1000))
+        charge_reads(call.docs)
+        return total
+    except Exception as e:
+        st.error(f"Error counting {collection_name} on Cloud: {e}")
+        return 0
+
+def read_page(collection_name, page_size, cursor=None, order_field=None, descending=False, prefix_field=None, prefix=None):
+    """
+    One page of a paginated query as (DataFrame, cursor). cursor is the last document of the
+    previous page (None for the first page); pass the returned cursor to read the next one.
+    """
+    db = get_db()
+    if not db:
+        st.error("Firebase not initialized on Cloud.")
+        return pd.DataFrame(), None
+    try:
+        query = _page_query(db, collection_name, order_field, descending, prefix_field, prefix).limit(page_size)
+        if cursor is not None:
+            query = query.start_after(cursor)
+        with track_firestore("read", collection_name) as call:
+            docs = list(query.stream())
+            call.docs = max(len(docs), 1)
+        charge_reads(call.docs)
     except Exception as e:
         st.error(f"Error reading from {collection_name} on Cloud: {e}")
-        return pd.DataFrame()
+        return pd.DataFrame(), None
+    data = []
+    for doc in docs:
+        doc_data = doc.to_dict()
+        if doc_data:
+            doc_data['id'] = doc.id
+            data.append(doc_data)
+    return pd.DataFrame(data), docs[-1] if docs else None
 
 def add_document(collection_name, data):
+    db = get_db()
     if not db:
         st.error("Firebase not initialized")
         return False
     try:
-        db.collection(collection_name).add(data)
+        with track_firestore("write", collection_name) as call:
+            db.collection(collection_name).add(data)
+            call.docs = 1
+        bump_collection_version(collection_name)
         return True
     except Exception as e:
         st.error(f"Error adding to {collection_name} on Cloud: {e}")
         return False
 
 def update_document(collection_name, doc_id, data):
+    db = get_db()
     if not db:
         st.error("Firebase not initialized")
         return False
     try:
-        db.collection(collection_name).document(doc_id).update(data)
+        with track_firestore("write", collection_name) as call:
+            db.collection(collection_name).document(doc_id).update(data)
+            call.docs = 1
+        bump_collection_version(collection_name)
         return True
     except Exception as e:
         st.error(f"Error updating {collection_name}/{doc_id} on Cloud: {e}")
         return False
 
 def delete_document(collection_name, doc_id):
+    db = get_db()
     if not db:
         st.error("Firebase not initialized")
         return False
     try:
-        db.collection(collection_name).document(doc_id).delete()
+        with track_firestore("write", collection_name) as call:
+            db.collection(collection_name).document(doc_id).delete()
+            call.docs = 1
+        bump_collection_version(collection_name)
         return True
     except Exception as e:
         st.error(f"Error deleting {collection_name}/{doc_id} on Cloud: {e}")
@@ -132,12 +332,16 @@ def delete_document(collection_name, doc_id):
 
 def get_document(collection_name, document_id):
     """Get a single document from Firestore"""
+    db = get_db()
     if not db:
         st.error("Firebase not initialized")
         return None
     try:
         doc_ref = db.collection(collection_name).document(document_id)
-        doc = doc_ref.get()
+        with track_firestore("read", collection_name) as call:
+            doc = doc_ref.get()
+            call.docs = 1
+        charge_reads(1)
         if doc.exists:
             return doc.to_dict()
         else:
@@ -148,25 +352,99 @@ def get_document(collection_name, document_id):
 
 def set_document(collection_name, document_id, data):
     """Set a document in Firestore (creates or overwrites)"""
+    db = get_db()
     if not db:
         st.error("Firebase not initialized")
         return False
     try:
         doc_ref = db.collection(collection_name).document(document_id)
-        doc_ref.set(data)
+        with track_firestore("write", collection_name) as call:
+            doc_ref.set(data)
+            call.docs = 1
+        bump_collection_version(collection_name)
         return True
     except Exception as e:
         st.error(f"Error setting document on Cloud: {e}")
         return False
 
-def log_audit_event(user, action, details=""):
+def get_documents(collection_name, document_ids):
+    """Fetch several documents in one round trip. Returns {id: data} for the ones that exist."""
+    db = get_db()
+    if not db:
+        st.error("Firebase not initialized")
+        return {}
+    try:
+        refs = [db.collection(collection_name).document(doc_id) for doc_id in document_ids]
+        with track_firestore("read", collection_name) as call:
+            docs = list(db.get_all(refs))
+            call.docs = len(refs)
+        charge_reads(call.docs)
+        return {doc.id: doc.to_dict() for doc in docs if doc.exists}
+    except Exception as e:
+        st.error(f"Error getting documents from {collection_name} on Cloud: {e}")
+        return {}
+
+def increment(amount):
+    """A field value for write_batch that adds amount to the stored number on the server."""
+    return firestore.Increment(amount)
+
+def commit_writes(db, writes):
+    """
+    Commit writes atomically in one WriteBatch (at most 500). Each write is
+    (collection, document id, data, merge): a document id of None adds a new document,
+    data of None deletes the document, and merge=True updates only the given fields.
+    Raises on failure and makes no Streamlit calls, so it can run in worker threads.
+    """
+    batch = db.batch()
+    counts = {}
+    for collection_name, doc_id, data, merge in writes:
+        collection = db.collection(collection_name)
+        ref = collection.document(doc_id) if doc_id is not None else collection.document()
+        if data is None:
+            batch.delete(ref)
+        else:
+            batch.set(ref, data, merge=merge)
+        counts[collection_name] = counts.get(collection_name, 0) + 1
+    started = time.perf_counter()
+    try:
+        batch.commit()
+    except Exception:
+        for collection_name, docs in counts.items():
+            record_firestore_call("write", collection_name, docs, time.perf_counter() - started, error=True)
+        raise
+    # One commit: its time is shared between the collections by their number of writes
+    seconds = time.perf_counter() - started
+    for collection_name, docs in counts.items():
+        record_firestore_call("write", collection_name, docs, seconds * docs / len(writes))
+        bump_collection_version(collection_name)
+
+def write_batch(writes):
+    """Commit writes atomically in one WriteBatch; see commit_writes. Returns True on success."""
+    db = get_db()
+    if not db:
+        st.error("Firebase not initialized")
+        return False
+    try:
+        commit_writes(db, writes)
+        return True
+    except Exception as e:
+        collections = ", ".join(dict.fromkeys(write[0] for write in writes))
+        st.error(f"Error writing batch to {collections} on Cloud: {e}")
+        return False
+
+def audit_event_write(user, action, details=""):
+    """An audit log entry as a write_batch write, to commit it together with the change it records."""
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    add_document("audit_log", {
+    return ("audit_log", None, {
         "timestamp": timestamp,
         "user": user,
         "action": action,
         "details": details
-    })
+    }, False)
+
+def log_audit_event(user, action, details=""):
+    collection_name, _, data, _ = audit_event_write(user, action, details)
+    add_document(collection_name, data)
 
 def verify_id_token(id_token):
     """Verify a Firebase ID token and return user info."""
@@ -184,6 +462,3 @@ def is_online():
     except:
         st.warning("Offline mode on Cloud: Data will sync when connected.")
         return False
-
-# Run on app load to display status
-is_online()
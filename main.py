@@ -1,7 +1,77 @@
 import streamlit as st
+import importlib
+import sys
 import time
 from datetime import date
 from utils.data_loader import load_table, to_date
+from utils.perf import page_timer, record_import
+from utils.read_budget import exceeded_budget, budget_alerts
+from utils.memory import record_session_memory
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+# Page name -> (module, render function). A page's module is imported the first time
+# the page is opened, so plotly and friends load only for the pages that use them.
+MANAGER_PAGES = {
+    "Dashboard": ("page_modules.dashboard", "dashboard_page"),
+    "Health": ("page_modules.health", "manager_health_page"),
+    "Artificial Insemination": ("page_modules.ai", "manager_ai_page"),
+    "Reports": ("page_modules.reports", "reports_page"),
+    "Audit Log": ("page_modules.audit_log", "audit_log_page"),
+    "Staff Performance": ("page_modules.staff_performance", "staff_performance_page"),
+    "Employee Management": ("page_modules.employee_management", "employee_management_page"),
+    "Password Management": ("page_modules.password_management", "password_management_page"),
+    "Edit Data": ("page_modules.data_edit", "data_edit_page"),
+    "Import Data": ("page_modules.data_import", "data_import_page"),
+    "Performance": ("page_modules.performance", "performance_page"),
+}
+STAFF_PAGES = {
+    "Dashboard": ("page_modules.dashboard", "dashboard_page"),
+    "Milk Production Records": ("page_modules.milk_records", "milk_records_page"),
+    "Feed Records": ("page_modules.feed_records", "feed_records_page"),
+    "Health": ("page_modules.health", "staff_health_page"),
+    "Artificial Insemination": ("page_modules.ai", "staff_ai_page"),
+    "Knowledge Base": ("page_modules.knowledge_base", "knowledge_base_page"),
+}
+
+def load_page(module_name, function_name):
+    """Import a page module the first time its page is opened and return its render function."""
+    module = sys.modules.get(module_name)
+    if module is None:
+        started = time.perf_counter()
+        module = importlib.import_module(module_name)
+        record_import(module_name, time.perf_counter() - started)
+    return getattr(module, function_name)
+
+def report_filters():
+    """Sidebar date range and aggregation for Reports, bounded by the dates in the data."""
+    all_milk = to_date(load_table("milk_production"), "date")
+    all_feeds_recv = to_date(load_table("feeds_received"), "date")
+    all_feeds_used = to_date(load_table("feeds_used"), "date")
+    all_obs = to_date(load_table("observations"), "date")
+
+    min_date = min([d for d in [all_milk["date"].min() if not all_milk.empty else None,
+                                all_feeds_recv["date"].min() if not all_feeds_recv.empty else None,
+                                all_feeds_used["date"].min() if not all_feeds_used.empty else None,
+                                all_obs["date"].min() if not all_obs.empty else None] if d is not None], default=date.today())
+    max_date = max([d for d in [all_milk["date"].max() if not all_milk.empty else None,
+                                all_feeds_recv["date"].max() if not all_feeds_recv.empty else None,
+                                all_feeds_used["date"].max() if not all_feeds_used.empty else None,
+                                all_obs["date"].max() if not all_obs.empty else None] if d is not None], default=date.today())
+
+    with st.sidebar:
+        st.markdown("### Analysis Filters")
+        date_range = st.date_input("Date Range", value=(min_date, max_date), min_value=min_date, max_value=max_date if max_date >= min_date else min_date, key="date_range")
+        if isinstance(date_range, tuple) and len(date_range) == 2:
+            start_date, end_date = date_range
+        else:
+            start_date = date_range
+            end_date = date_range
+        if isinstance(start_date, tuple):
+            start_date = start_date[0]
+        if isinstance(end_date, tuple):
+            end_date = end_date[0]
+        granularity = st.selectbox("Aggregation", ["Daily", "Weekly", "Monthly"], key="granularity_select")
+    return start_date, end_date, granularity
 
 def main():
     st.set_page_config(page_title="Dairy Farm Management", page_icon="🐄", layout="wide")
@@ -24,6 +94,10 @@ def main():
 
     # Update last activity time
     st.session_state.last_activity = time.time()
+    if "online" not in st.session_state:
+        # Checked once per session instead of when firebase_utils is first imported
+        from firebase_utils import is_online
+        st.session_state.online = is_online()
     username = st.session_state.get("username")
     role = st.session_state.get("role")
     with st.sidebar:
@@ -32,30 +106,21 @@ def main():
         from auth import logout_button
         logout_button()
 
-        if role == "Manager":
-            from page_modules.dashboard import dashboard_page
-            from page_modules.health import manager_health_page
-            from page_modules.ai import manager_ai_page
-            from page_modules.reports import reports_page
-            from page_modules.audit_log import audit_log_page
-            from page_modules.staff_performance import staff_performance_page
-            from page_modules.employee_management import employee_management_page
-            from page_modules.password_management import password_management_page
-            from page_modules.data_edit import data_edit_page
-            nav_options = [
-                "Dashboard", "Health", "Artificial Insemination", "Reports",
-                "Audit Log", "Staff Performance", "Employee Management", "Password Management", "Edit Data"
-            ]
-        else:  # Staff
-            from page_modules.dashboard import dashboard_page
-            from page_modules.health import staff_health_page
-            from page_modules.ai import staff_ai_page
-            from page_modules.knowledge_base import knowledge_base_page
-            from page_modules.milk_records import milk_records_page
-            from page_modules.feed_records import feed_records_page
-            nav_options = ["Dashboard", "Milk Production Records", "Feed Records", "Health", "Artificial Insemination", "Knowledge Base"]
-
+        pages = MANAGER_PAGES if role == "Manager" else STAFF_PAGES
+        nav_options = list(pages)
         page = st.sidebar.selectbox("Go to", nav_options, key="page_select")
+        render = load_page(*pages[page])
+
+        over_budget = exceeded_budget()
+        if over_budget:
+            st.warning(f"The {over_budget} Firestore read budget is used up; pages show the last data read.")
+        if role == "Manager":
+            alerts = budget_alerts()
+            for alert in alerts.head(3).itertuples():
+                st.error(f"Read budget alert: {alert.page} reading {alert.collection} "
+                         f"({alert.scope} budget {alert.budget:,})")
+            if len(alerts) > 3:
+                st.error(f"{len(alerts) - 3} more read budget alerts today. See Performance.")
 
     # Automatically manage sidebar visibility
     if page != "Dashboard" and st.session_state.last_page != page:
@@ -68,66 +133,21 @@ def main():
     if not st.session_state.get("show_sidebar", True):
         st.markdown("<style>button[title='View fullscreen']{display: none;} div[data-testid='stSidebar'] {display: none;}</style>", unsafe_allow_html=True)
 
-    all_milk = to_date(load_table("milk_production"), "date")
-    all_feeds_recv = to_date(load_table("feeds_received"), "date")
-    all_feeds_used = to_date(load_table("feeds_used"), "date")
-    all_cows = load_table("cows")
-    all_obs = to_date(load_table("observations"), "date")
-
-    min_date = min([d for d in [all_milk["date"].min() if not all_milk.empty else None,
-                                all_feeds_recv["date"].min() if not all_feeds_recv.empty else None,
-                                all_feeds_used["date"].min() if not all_feeds_used.empty else None,
-                                all_obs["date"].min() if not all_obs.empty else None] if d is not None], default=date.today())
-    max_date = max([d for d in [all_milk["date"].max() if not all_milk.empty else None,
-                                all_feeds_recv["date"].max() if not all_feeds_recv.empty else None,
-                                all_feeds_used["date"].max() if not all_feeds_used.empty else None,
-                                all_obs["date"].max() if not all_obs.empty else None] if d is not None], default=date.today())
-
-    if role == "Manager" and page == "Reports":
-        with st.sidebar:
-            st.markdown("### Analysis Filters")
-            date_range = st.date_input("Date Range", value=(min_date, max_date), min_value=min_date, max_value=max_date if max_date >= min_date else min_date, key="date_range")
-            if isinstance(date_range, tuple) and len(date_range) == 2:
-                start_date, end_date = date_range
-            else:
-                start_date = date_range
-                end_date = date_range
-            if isinstance(start_date, tuple):
-                start_date = start_date[0]
-            if isinstance(end_date, tuple):
-                end_date = end_date[0]
-            granularity = st.selectbox("Aggregation", ["Daily", "Weekly", "Monthly"], key="granularity_select")
-        reports_page(start_date, end_date, granularity)
-    elif page == "Dashboard":
-        dashboard_page(role, username)
-    elif page == "Health":
-        if role == "Manager":
-            manager_health_page()
+    # Everything below, including the Reports date-range loads, counts towards the page's render time and reads
+    with page_timer(page):
+        if role == "Manager" and page == "Reports":
+            start_date, end_date, granularity = report_filters()
+            render(start_date, end_date, granularity)
+        elif page == "Dashboard":
+            render(role, username)
+        elif page in ("Milk Production Records", "Feed Records", "Edit Data", "Import Data"):
+            render(username)
         else:
-            staff_health_page()
-    elif page == "Artificial Insemination":
-        if role == "Manager":
-            manager_ai_page()
-        else:
-            staff_ai_page()
-    elif page == "Knowledge Base":
-        knowledge_base_page()
-    elif page == "Milk Production Records" and role == "Staff":
-        milk_records_page(username)
-    elif page == "Feed Records" and role == "Staff":
-        feed_records_page(username)
-    elif page == "Reports" and role == "Manager":
-        reports_page(start_date, end_date, granularity)
-    elif page == "Audit Log" and role == "Manager":
-        audit_log_page()
-    elif page == "Staff Performance" and role == "Manager":
-        staff_performance_page()
-    elif page == "Employee Management" and role == "Manager":
-        employee_management_page()
-    elif page == "Password Management" and role == "Manager":
-        password_management_page()
-    elif page == "Edit Data" and role == "Manager":
-        data_edit_page(username)
+            render()
+
+    ctx = get_script_run_ctx()
+    if ctx is not None:
+        record_session_memory(ctx.session_id, username, page, st.session_state)
 
 if __name__ == "__main__":
     main()
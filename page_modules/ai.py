@@ -4,6 +4,8 @@ import pandas as pd
 from datetime import date, timedelta, datetime
 from utils.data_loader import to_date
 from utils.calculations import get_all_cows
+from utils.cow_registry import search_cows
+from utils.validation import validate_record
 from firebase_utils import get_collection, add_document, update_document, log_audit_event
 from page_modules.staff_performance import record_staff_performance
 import plotly.express as px
@@ -25,7 +27,7 @@ def get_ai_records():
 def add_ai_record(cow_tag, heat_date, heat_signs, ai_date, ai_time, technician, technician_id, bull_id, bull_breed,
                  semen_batch, semen_expiry, semen_quality, expected_calving_date, success_rating, observations):
     try:
-        success = add_document("ai_records", {
+        record = {
             "cow_tag": cow_tag,
             "heat_date": heat_date,
             "heat_signs": heat_signs,
@@ -44,7 +46,13 @@ def add_ai_record(cow_tag, heat_date, heat_signs, ai_date, ai_time, technician,
             "cost": None,
             "pregnancy_status": None,
             "calving_outcome": None
-        })
+        }
+        problems = validate_record("ai_records", record)
+        for problem in problems:
+            st.warning(problem)
+        if problems:
+            return False
+        success = add_document("ai_records", record)
 
         if success:
             log_audit_event("Staff", "AI_RECORD_ADDED", f"{cow_tag}: {bull_breed}")
@@ -68,64 +76,7 @@ def staff_ai_page():
 
     with tab1:
         with st.expander("➕ Add New AI Record", expanded=True):
-            search_cow = st.text_input("Search Cow", key="ai_cow_search")
-            cow_options = get_all_cows()
-            filtered_cows = [c for c in cow_options if search_cow.lower() in c.lower()] if search_cow else cow_options
-            cow_tag = st.selectbox("Select Cow", filtered_cows)
-
-            col1, col2 = st.columns(2)
-            with col1:
-                heat_date = st.date_input("Heat Detection Date", value=date.today())
-                heat_signs = st.multiselect("Heat Signs Observed", [
-                    "Mounting other cows", "Standing to be mounted", "Swollen vulva",
-                    "Clear mucus discharge", "Restlessness", "Decreased milk production"
-                ])
-            with col2:
-                ai_date = st.date_input("AI Date", value=date.today())
-                ai_time = st.time_input("AI Time", value=datetime.now().time())
-
-            technician = st.text_input("Technician Name")
-            technician_id = st.text_input("Technician ID (if available)")
-
-            col3, col4 = st.columns(2)
-            with col3:
-                bull_id = st.text_input("Bull ID")
-                bull_breed = st.text_input("Bull Breed")
-            with col4:
-                semen_batch = st.text_input("Semen Batch")
-                semen_expiry = st.date_input("Semen Expiry Date")
-
-            semen_quality = st.selectbox("Semen Quality", ["Poor", "Fair", "Good", "Excellent"])
-            success_rating = st.slider("Procedure Rating", 1, 5, 3)
-
-            expected_calving_date = st.date_input("Expected Calving Date",
-                                               value=ai_date + timedelta(days=280))
-
-            observations = st.text_area("Observations")
-
-            if st.button("Submit AI Record"):
-                success = add_ai_record(
-                    cow_tag,
-                    heat_date.isoformat(),
-                    ", ".join(heat_signs),
-                    ai_date.isoformat(),
-                    ai_time.strftime("%H:%M"),
-                    technician,
-                    technician_id,
-                    bull_id,
-                    bull_breed,
-                    semen_batch,
-                    semen_expiry.isoformat() if semen_expiry else None,
-                    semen_quality,
-                    expected_calving_date.isoformat(),
-                    success_rating,
-                    observations
-                )
-                if success:
-                    st.success("AI record added successfully!")
-                    record_staff_performance("Staff", f"AI record for {cow_tag}")
-                else:
-                    st.error("Failed to add AI record.")
+            ai_record_form(get_all_cows())
 
     with tab2:
         st.subheader("AI History")
@@ -184,6 +135,70 @@ def staff_ai_page():
         else:
             st.info("No AI data available for analytics")
 
+# A fragment, so the cow search and the dates that drive the expected calving date rerun
+# only the form and not the AI history and analytics tabs
+@st.fragment
+def ai_record_form(cow_options):
+    search_cow = st.text_input("Search Cow", key="ai_cow_search")
+    filtered_cows, fuzzy = search_cows(search_cow, cow_options)
+    if fuzzy and filtered_cows:
+        st.caption(f"No cow starts with '{search_cow}'. Showing close matches.")
+    cow_tag = st.selectbox("Select Cow", filtered_cows)
+
+    col1, col2 = st.columns(2)
+    with col1:
+        heat_date = st.date_input("Heat Detection Date", value=date.today())
+        heat_signs = st.multiselect("Heat Signs Observed", [
+            "Mounting other cows", "Standing to be mounted", "Swollen vulva",
+            "Clear mucus discharge", "Restlessness", "Decreased milk production"
+        ])
+    with col2:
+        ai_date = st.date_input("AI Date", value=date.today())
+        ai_time = st.time_input("AI Time", value=datetime.now().time())
+
+    technician = st.text_input("Technician Name")
+    technician_id = st.text_input("Technician ID (if available)")
+
+    col3, col4 = st.columns(2)
+    with col3:
+        bull_id = st.text_input("Bull ID")
+        bull_breed = st.text_input("Bull Breed")
+    with col4:
+        semen_batch = st.text_input("Semen Batch")
+        semen_expiry = st.date_input("Semen Expiry Date")
+
+    semen_quality = st.selectbox("Semen Quality", ["Poor", "Fair", "Good", "Excellent"])
+    success_rating = st.slider("Procedure Rating", 1, 5, 3)
+
+    expected_calving_date = st.date_input("Expected Calving Date",
+                                       value=ai_date + timedelta(days=280))
+
+    observations = st.text_area("Observations")
+
+    if st.button("Submit AI Record"):
+        success = add_ai_record(
+            cow_tag,
+            heat_date.isoformat(),
+            ", ".join(heat_signs),
+            ai_date.isoformat(),
+            ai_time.strftime("%H:%M"),
+            technician,
+            technician_id,
+            bull_id,
+            bull_breed,
+            semen_batch,
+            semen_expiry.isoformat() if semen_expiry else None,
+            semen_quality,
+            expected_calving_date.isoformat(),
+            success_rating,
+            observations
+        )
+        if success:
+            st.success("AI record added successfully!")
+            record_staff_performance("Staff", f"AI record for {cow_tag}")
+        else:
+            st.error("Failed to add AI record.")
+
 
 def manager_ai_page():
     st.title("🤰 Artificial Insemination Management")
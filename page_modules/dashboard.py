@@ -1,34 +1,30 @@
 import streamlit as st
 import pandas as pd
-from datetime import date, timedelta
-from utils.data_loader import load_table, to_date
-from utils.helpers import show_table, money, liters
-from utils.calculations import get_feed_inventory, get_available_feed_types, get_all_cows
+from datetime import date
+from utils.data_loader import load_table, to_date, get_collection_version, table_token
+from utils.helpers import show_table, show_firestore_table, money, liters, number_format
+from utils.calculations import get_available_feed_types, get_all_cows
+from utils.milk_counters import read_milk_counters, rebuild_milk_counters
+from utils.milk_reconciliation import STATUSES, TOLERANCE_SHARE, recent_reconciliation
+from utils.yield_matrix import ALERT_DAYS, BASELINE_DAYS, DROP_SHARE, DROP_Z, get_yield_matrix, yield_drops
+from utils.validation import validate_record, audit_collection, audit_summary
+from utils.feed_forecast import HALF_LIFE_DAYS, LEAD_TIME_DAYS, SAFETY_DAYS, feed_forecast, feed_versions, record_feed_receipt
 from firebase_utils import add_document, log_audit_event
 from page_modules.staff_performance import record_staff_performance
 
 def dashboard_page(role, username):
     st.title("🐄 Dairy Farm Management System")
     
-    all_milk_totals = to_date(load_table("milk_totals"), "date")  # Total production for profit calculation
-    all_milk = to_date(load_table("milk_production"), "date")     # Individual cow records
-    all_cows = load_table("cows")
-    
     if role == "Staff":
         st.header("Data Overview")
         
-        if not all_milk.empty and 'date' in all_milk.columns:
-            todays_milk = all_milk[all_milk["date"] == date.today()]
-        else:
-            todays_milk = pd.DataFrame()
+        # Today's counter document instead of every milk record
+        counters = read_milk_counters(date.today(), periods=False)
+        morning, lunch, evening = counters["morning"], counters["lunch"], counters["evening"]
+        total = morning + lunch + evening
         
-        if not todays_milk.empty:
+        if total:
             st.subheader("Milk Production for Today")
-            morning = todays_milk[todays_milk["time_of_milking"] == "Morning"]["litres_sell"].sum()
-            lunch = todays_milk[todays_milk["time_of_milking"] == "Lunch"]["litres_sell"].sum()
-            evening = todays_milk[todays_milk["time_of_milking"] == "Evening"]["litres_sell"].sum()
-            total = morning + lunch + evening
-            
             col1, col2, col3, col4 = st.columns(4)
             col1.metric("Morning", f"{morning:.1f} L", delta_color="off")
             col2.metric("Lunch", f"{lunch:.1f} L", delta_color="off")
@@ -53,42 +49,59 @@ def dashboard_page(role, username):
     if role == "Manager":
         st.header("Manager Dashboard")
         
-        # Milk production metrics at the top (using milk_totals for profit calculation)
+        # Milk production metrics at the top (milk_totals, from the day, week and month counters)
         st.subheader("Milk Production Summary")
+        counters = read_milk_counters(date.today())
         col_metrics1, col_metrics2, col_metrics3 = st.columns(3)
-        
-        with col_metrics1:
-            # Today's milk
-            today = date.today()
-            if not all_milk_totals.empty:
-                today_total = all_milk_totals[all_milk_totals["date"] == today]["total_litres"].sum()
-            else:
-                today_total = 0
-            col_metrics1.metric("Today's Production", f"{today_total:.1f} L")
-        
-        with col_metrics2:
-            # This week's milk
-            week_start = today - timedelta(days=today.weekday())
-            if not all_milk_totals.empty:
-                week_total = all_milk_totals[
-                    (all_milk_totals["date"] >= week_start) & 
-                    (all_milk_totals["date"] <= today)
-                ]["total_litres"].sum()
+        col_metrics1.metric("Today's Production", f"{counters['day_total']:.1f} L")
+        col_metrics2.metric("This Week's Production", f"{counters['week_total']:.1f} L")
+        col_metrics3.metric("This Month's Production", f"{counters['month_total']:.1f} L")
+        with st.popover("Recount"):
+            st.caption("Recompute the summary counters from every milk record, e.g. after records "
+                       "were written outside this app.")
+            if st.button("Recount Milk Totals", key="rebuild_counters_btn"):
+                written = rebuild_milk_counters()
+                if written is not None:
+                    st.success(f"Rebuilt {written} counters.")
+                    log_audit_event(username, "MILK_COUNTERS_REBUILT", f"{written} counters")
+                else:
+                    st.warning("Counters were not rebuilt: a read budget is spent or a write failed. Try again later.")
+
+        drops = yield_drops(get_yield_matrix(), end=date.today())
+        with st.expander(f"🚨 Yield Drop Alerts ({len(drops)})", expanded=not drops.empty):
+            st.caption(f"Milkings of the last {ALERT_DAYS} days at least {DROP_SHARE:.0%} and {-DROP_Z:g} standard "
+                       f"deviations below the cow's own level for that session over the previous {BASELINE_DAYS} days. "
+                       "A sudden drop can be an early sign of mastitis.")
+            if drops.empty:
+                st.success("No sudden yield drops.")
             else:
-                week_total = 0
-            col_metrics2.metric("This Week's Production", f"{week_total:.1f} L")
-        
-        with col_metrics3:
-            # This month's milk
-            month_start = date(today.year, today.month, 1)
-            if not all_milk_totals.empty:
-                month_total = all_milk_totals[
-                    (all_milk_totals["date"] >= month_start) & 
-                    (all_milk_totals["date"] <= today)
-                ]["total_litres"].sum()
+                st.dataframe(drops, hide_index=True, use_container_width=True,
+                             column_config={"litres": st.column_config.NumberColumn("Litres", format="%.1f"),
+                                            "baseline": st.column_config.NumberColumn("Usual Litres", format="%.1f"),
+                                            "z_score": st.column_config.NumberColumn("Z-Score", format="%.1f"),
+                                            "drop": st.column_config.NumberColumn("Drop", format="percent")})
+
+        with st.expander("⚖️ Milk Reconciliation", expanded=False):
+            st.caption(f"Individual cow records (litres for sale) against the recorded daily totals. Days differing "
+                       f"by more than {TOLERANCE_SHARE:.0%}, or with only one of the two, are listed.")
+            recon_days = st.selectbox("Period", [7, 30, 90], index=1, format_func=lambda d: f"Last {d} days",
+                                      key="recon_days")
+            recon = milk_reconciliation(recon_days)
+            flagged = recon[recon["status"] != "ok"]
+            col_r1, col_r2, col_r3, col_r4 = st.columns(4)
+            col_r1.metric("Days Matching", f"{(recon['status'] == 'ok').sum()} / {len(recon)}")
+            col_r2.metric("Mismatches", int((recon["status"] == "mismatch").sum()))
+            col_r3.metric("Missing Totals", int((recon["status"] == "no total").sum()))
+            col_r4.metric("Missing Cow Records", int(recon["status"].isin(["no cow records", "no records"]).sum()))
+            if flagged.empty:
+                st.success("Every day matches.")
             else:
-                month_total = 0
-            col_metrics3.metric("This Month's Production", f"{month_total:.1f} L")
+                st.dataframe(flagged.assign(action=flagged["status"].map(STATUSES)).sort_values("date", ascending=False),
+                             hide_index=True, use_container_width=True,
+                             column_config={"per_cow": st.column_config.NumberColumn("Cow Records (L)", format="%.1f"),
+                                            "recorded": st.column_config.NumberColumn("Daily Total (L)", format="%.1f"),
+                                            "difference": st.column_config.NumberColumn("Difference (L)", format="%.1f"),
+                                            "difference_pct": st.column_config.NumberColumn("Difference", format="%.1f%%")})
 
         colA, colB = st.columns(2)
         with colA:
@@ -124,67 +137,94 @@ def dashboard_page(role, username):
                 fr_cost = st.number_input("Total Cost (KES)", min_value=0.0, max_value=1000000.0, step=None, format="%f", key="fr_cost")
                 
                 if st.button("Save Feed Received", key="save_fr_btn"):
+                    record = {
+                        "date": date.today().isoformat(),
+                        "feed_type": fr_type.strip() if fr_type else "",
+                        "quantity": float(fr_qty),  # Store as float
+                        "cost": float(fr_cost)      # Store as float
+                    }
+                    problems = validate_record("feeds_received", record)
                     if fr_qty <= 0:
                         st.warning("Quantity must be > 0.")
                     elif fr_cost <= 0:
                         st.warning("Cost must be > 0.")
-                    elif not fr_type.strip():
+                    elif not record["feed_type"]:
                         st.warning("Feed type is required.")
+                    elif problems:
+                        for problem in problems:
+                            st.warning(problem)
                     else:
-                        add_document("feeds_received", {
-                            "date": date.today().isoformat(),
-                            "feed_type": fr_type.strip(),
-                            "quantity": float(fr_qty),  # Store as float
-                            "cost": float(fr_cost)      # Store as float
-                        })
-                        st.success("Feed receipt recorded.")
-                        log_audit_event(username, "FEED_RECEIVED", f"{fr_qty}kg of {fr_type} for KES {fr_cost}")
+                        since = feed_versions()
+                        if add_document("feeds_received", record):
+                            record_feed_receipt(record["feed_type"], date.today(), record["quantity"], since)
+                            st.success("Feed receipt recorded.")
+                            log_audit_event(username, "FEED_RECEIVED", f"{fr_qty}kg of {fr_type} for KES {fr_cost}")
 
         st.markdown("---")
         
         with st.expander("📊 Feed Inventory", expanded=True):
-            inventory = get_feed_inventory()
+            inventory = feed_forecast()
             if inventory.empty:
                 st.info("No feed inventory data available. Ensure feeds are recorded in 'Feeds Received' and 'Feeds Used'.")
                 st.write("Debug: feeds_received or feeds_used is empty")
             else:
+                st.caption(f"Daily rate: usage weighted towards recent days (a day counts half after {HALF_LIFE_DAYS} days). "
+                           f"Reorder once stock falls to {LEAD_TIME_DAYS + SAFETY_DAYS} days of use: "
+                           f"{LEAD_TIME_DAYS} days for delivery and {SAFETY_DAYS} in reserve.")
                 def style_black(row):
                     return ['color: white; background-color: black'] * len(row)
                 styled_inventory = inventory.style.apply(style_black, axis=1)
-                st.dataframe(styled_inventory.format({"quantity_received": "{:,.1f} kg", "quantity_used": "{:,.1f} kg", "remaining": "{:,.1f} kg"}), use_container_width=True)
-                critical_inventory = inventory[inventory["remaining"] < 50]
-                warning_inventory = inventory[(inventory["remaining"] >= 50) & (inventory["remaining"] < 100)]
-                if not critical_inventory.empty:
-                    for _, row in critical_inventory.iterrows():
-                        st.error(f"🚨 Critical inventory for {row['feed_type']}: only {row['remaining']:,.1f} kg remaining!")
-                if not warning_inventory.empty:
-                    for _, row in warning_inventory.iterrows():
-                        st.warning(f"⚠️ Low inventory for {row['feed_type']}: {row['remaining']:,.1f} kg remaining")
+                st.dataframe(styled_inventory.format({"quantity_received": "{:,.1f} kg", "quantity_used": "{:,.1f} kg",
+                                                      "remaining": "{:,.1f} kg", "daily_rate": "{:,.1f} kg/day",
+                                                      "days_of_cover": "{:,.0f}", "reorder_point": "{:,.1f} kg"},
+                                                     na_rep="-"), use_container_width=True)
+                # Feeds without recent usage have no rate, so no cover to run out of
+                critical_inventory = inventory[inventory["days_of_cover"] < LEAD_TIME_DAYS]
+                warning_inventory = inventory[inventory["reorder"] & ~(inventory["days_of_cover"] < LEAD_TIME_DAYS)
+                                              & inventory["daily_rate"].notna()]
+                for _, row in critical_inventory.iterrows():
+                    st.error(f"🚨 Critical inventory for {row['feed_type']}: {row['remaining']:,.1f} kg remaining, "
+                             f"runs out around {row['stockout_date']:%d %b} - sooner than a new delivery arrives!")
+                for _, row in warning_inventory.iterrows():
+                    st.warning(f"⚠️ Reorder {row['feed_type']}: {row['remaining']:,.1f} kg remaining, "
+                               f"about {row['days_of_cover']:,.0f} days at {row['daily_rate']:,.1f} kg/day")
+
+        with st.expander("🩺 Data Quality", expanded=False):
+            st.caption("Stored records checked for missing or invalid values, out-of-range numbers, unknown cows, "
+                       "duplicates and outliers. Results are kept until the records change.")
+            # Reads every checked collection, so only on request
+            if st.checkbox("Check stored records", key="dq_check"):
+                summary = audit_summary()
+                st.dataframe(summary, hide_index=True, use_container_width=True)
+                flagged = summary.loc[summary["total"] > 0, "collection"].tolist()
+                if flagged:
+                    collection = st.selectbox("Show problems in", flagged, key="dq_collection")
+                    issues = audit_collection(collection)
+                    show_table(issues.assign(value=issues["value"].astype(str)), "Problems",
+                               search_cols=["field", "rule", "message"], page_size=15, key_prefix=f"dq_tbl_{collection}",
+                               data_version=(table_token(collection), table_token("cows")))
+                else:
+                    st.success("No problems found.")
 
         with st.expander("🐄 Cow List", expanded=False):
             cows = load_table("cows")
             if not cows.empty:
                 cows_display = cows.drop(columns=["id"])  # Remove id
-                show_table(cows_display, "Cows", search_cols=["name", "status", "gender"], page_size=15, key_prefix="cows_tbl")
+                show_table(cows_display, "Cows", search_cols=["name", "status", "gender"], page_size=15, key_prefix="cows_tbl",
+                           data_version=table_token("cows"))
 
         with st.expander("📦 Feeds Received", expanded=False):
-            df = load_table("feeds_received")
-            if not df.empty:
-                df = to_date(df, "date")
-                df_display = df[["date", "feed_type", "quantity", "cost"]].copy()
-                df_display["quantity"] = df_display["quantity"].apply(lambda x: f"{x:,.1f} kg" if isinstance(x, (int, float)) else x)
-                df_display["cost"] = df_display["cost"].apply(money)
-                show_table(df_display, "Feeds Received", page_size=15, key_prefix="fr_tbl")
-            else:
-                st.info("No feed receipts yet.")
+            show_firestore_table("feeds_received", "Feeds Received", search_field="feed_type", page_size=15,
+                                 key_prefix="fr_tbl", columns=["date", "feed_type", "quantity", "cost"],
+                                 formatters={"quantity": number_format("{:,.1f} kg"), "cost": money})
 
         with st.expander("🍽 Feeds Used", expanded=False):
             df = load_table("feeds_used")
             if not df.empty:
                 df = to_date(df, "date")
-                df_fmt = df.copy()
-                df_fmt["quantity"] = df_fmt["quantity"].apply(lambda x: f"{x:,.1f} kg" if isinstance(x, (int, float)) else x)
-                show_table(df_fmt, "Feeds Used", search_cols=["category", "feed_type"], page_size=15, key_prefix="fu_tbl")
+                show_table(df, "Feeds Used", search_cols=["category", "feed_type"], page_size=15, key_prefix="fu_tbl",
+                           data_version=table_token("feeds_used"),
+                           formatters={"quantity": number_format("{:,.1f} kg")})
             else:
                 st.info("No feed usage records yet.")
 
@@ -193,33 +233,37 @@ def dashboard_page(role, username):
             tab1, tab2 = st.tabs(["Individual Records", "Total Production"])
             
             with tab1:
-                df = load_table("milk_production")
-                if not df.empty:
-                    df = to_date(df, "date")
-                    df_fmt = df.copy()
-                    df_fmt["litres_sell"] = df_fmt["litres_sell"].apply(lambda x: f"{x:,.1f} L" if isinstance(x, (int, float)) else x)
-                    df_fmt["litres_calves"] = df_fmt["litres_calves"].apply(lambda x: f"{x:,.1f} L" if isinstance(x, (int, float)) else x)
-                    df_display = df_fmt.drop(columns=["id"])
-                    show_table(df_display, "Milk Production (Individual)", search_cols=["cow", "time_of_milking"], page_size=20, key_prefix="milk_tbl")
-                else:
-                    st.info("No milk records yet.")
+                st.caption("Read a page at a time, so search matches the start of the cow name exactly "
+                           "(case-sensitive) and cannot filter by milking session.")
+                show_firestore_table("milk_production", "Milk Production (Individual)", search_field="cow", page_size=20,
+                                     key_prefix="milk_tbl",
+                                     formatters={"litres_sell": number_format("{:,.1f} L"), "litres_calves": number_format("{:,.1f} L")})
             
             with tab2:
                 df = load_table("milk_totals")
                 if not df.empty:
                     df = to_date(df, "date")
-                    df_fmt = df.copy()
-                    df_fmt["total_litres"] = df_fmt["total_litres"].apply(lambda x: f"{x:,.1f} L" if isinstance(x, (int, float)) else x)
-                    df_display = df_fmt.drop(columns=["id"])
-                    show_table(df_display, "Milk Production (Total)", search_cols=[], page_size=20, key_prefix="milk_total_tbl")
+                    df_display = df.drop(columns=["id"])
+                    show_table(df_display, "Milk Production (Total)", search_cols=[], page_size=20, key_prefix="milk_total_tbl",
+                               formatters={"total_litres": number_format("{:,.1f} L")})
                 else:
                     st.info("No total production records yet.")
 
         with st.expander("📝 Observations", expanded=False):
+            # A small collection, so it is searched in full: any part of the note, in any case
             df = load_table("observations")
             if not df.empty:
                 df = to_date(df, "date")
-                df_display = df.drop(columns=["id"])
-                show_table(df_display, "Observations", search_cols=["note"], page_size=10, key_prefix="obs_tbl")
+                show_table(df.drop(columns=["id"]), "Observations", search_cols=["note"], page_size=10, key_prefix="obs_tbl",
+                           data_version=table_token("observations"))
             else:
                 st.info("No observations yet.")
+
+def milk_reconciliation(days):
+    """recent_reconciliation, read once per period and counter write for this session."""
+    key = (date.today(), days, get_collection_version("milk_counters"))
+    cached = st.session_state.get("milk_reconciliation")
+    if cached is None or cached[0] != key:
+        cached = (key, recent_reconciliation(days))
+        st.session_state.milk_reconciliation = cached
+    return cached[1]
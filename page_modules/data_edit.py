@@ -4,7 +4,10 @@ import pandas as pd
 from datetime import date
 from utils.data_loader import load_table, to_date
 from utils.calculations import get_all_cows, get_available_feed_types
-from firebase_utils import update_document, delete_document, log_audit_event
+from utils.cow_registry import get_cow_registry, search_cows
+from firebase_utils import update_document, delete_document, write_batch, log_audit_event
+from utils.milk_counters import milking_counter_writes
+from utils.validation import validate_record
 
 def data_edit_page(username):
     st.title("📝 Edit Data Entries")
@@ -19,24 +22,24 @@ def data_edit_page(username):
     selected_type = st.selectbox("Select Data Type to Edit/Delete", data_types, key="edit_type_select")
     
     if selected_type == "Cows":
-        df = load_table("cows")
-        if not df.empty:
+        registry = get_cow_registry()
+        if len(registry):
+            cow_names = registry.names
             if search_term:
-                df = df[df["name"].str.lower().str.contains(search_term.lower())]
-            cow_names = df["name"].tolist()
+                cow_names, _ = search_cows(search_term, cow_names)
             selected_cow_name = st.selectbox("Select Cow by Name", cow_names, key="edit_cow_name_select")
-            selected_cow = df[df["name"] == selected_cow_name].index[0]
+            selected_cow = registry.get(selected_cow_name) or {}
             if st.button("Delete Cow", key="delete_cow_btn"):
-                delete_document("cows", df.loc[selected_cow, "id"])
+                delete_document("cows", selected_cow["id"])
                 st.success("Cow deleted.")
                 log_audit_event(username, "COW_DELETED", f"Name: {selected_cow_name}")
                 st.rerun()
             if st.button("Edit Cow", key="edit_cow_btn"):
                 name = st.text_input("Cow Name", value=selected_cow_name, key="edit_cow_name")
-                status = st.selectbox("Status", ["Lactating", "Dry", "Calf"], index=["Lactating", "Dry", "Calf"].index(df.loc[selected_cow, "status"]), key="edit_cow_status")
-                gender = st.selectbox("Gender", ["Male", "Female", "Unknown"], index=["Male", "Female", "Unknown"].index(df.loc[selected_cow, "gender"]), key="edit_cow_gender")
+                status = st.selectbox("Status", ["Lactating", "Dry", "Calf"], index=["Lactating", "Dry", "Calf"].index(selected_cow["status"]), key="edit_cow_status")
+                gender = st.selectbox("Gender", ["Male", "Female", "Unknown"], index=["Male", "Female", "Unknown"].index(selected_cow["gender"]), key="edit_cow_gender")
                 if st.button("Save Edit", key="save_edit_cow_btn"):
-                    if update_document("cows", df.loc[selected_cow, "id"], {
+                    if update_document("cows", selected_cow["id"], {
                         "name": name.strip(),
                         "status": status,
                         "gender": gender
@@ -64,7 +67,7 @@ def data_edit_page(username):
                 st.rerun()
             if st.button("Edit Feed Usage", key="edit_feed_inventory_btn"):
                 category = st.selectbox("Cow Category", ["Grown Cow", "Calf"], index=["Grown Cow", "Calf"].index(df_used.loc[selected_feed, "category"]), key="edit_feed_inventory_cat")
-                qty = st.number_input("Quantity Used (kg)", value=df_used.loc[selected_feed, "quantity"], key="edit_feed_inventory_qty")
+                qty = st.number_input("Quantity Used (kg)", value=float(df_used.loc[selected_feed, "quantity"]), key="edit_feed_inventory_qty")
                 if st.button("Save Edit", key="save_edit_feed_inventory_btn"):
                     if update_document("feeds_used", df_used.loc[selected_feed, "id"], {
                         "category": category,
@@ -92,7 +95,7 @@ def data_edit_page(username):
                 st.rerun()
             if st.button("Edit Feed Usage", key="edit_feeds_used_btn"):
                 category = st.selectbox("Cow Category", ["Grown Cow", "Calf"], index=["Grown Cow", "Calf"].index(df.loc[selected_feed, "category"]), key="edit_feeds_used_cat")
-                qty = st.number_input("Quantity Used (kg)", value=df_used.loc[selected_feed, "quantity"], key="edit_feeds_used_qty")
+                qty = st.number_input("Quantity Used (kg)", value=float(df.loc[selected_feed, "quantity"]), key="edit_feeds_used_qty")
                 if st.button("Save Edit", key="save_edit_feeds_used_btn"):
                     if update_document("feeds_used", df.loc[selected_feed, "id"], {
                         "category": category,
@@ -166,13 +169,15 @@ def data_edit_page(username):
         df = load_table("milk_production")
         if not df.empty:
             if search_term:
-                df = df[df["cow"].str.lower().str.contains(search_term.lower())]
+                df = df[df["cow"].isin(search_cows(search_term, df["cow"].dropna().unique().tolist())[0])]
             df = to_date(df, "date")
             cow_names = df["cow"].unique().tolist()
             selected_cow_name = st.selectbox("Select Cow by Name", cow_names, key="edit_milk_cow_select")
             selected_record = df[df["cow"] == selected_cow_name].index[0]
             if st.button("Delete Milk Record", key="delete_milk_btn"):
-                delete_document("milk_production", df.loc[selected_record, "id"])
+                record = df.loc[selected_record]
+                write_batch([("milk_production", record["id"], None, False)] +
+                            milking_counter_writes(record["date"], {record["time_of_milking"]: -float(record["litres_sell"])}))
                 st.success("Milk record deleted.")
                 log_audit_event(username, "MILK_RECORD_DELETED", f"Cow: {selected_cow_name}")
                 st.rerun()
@@ -181,11 +186,22 @@ def data_edit_page(username):
                 litres_sell = st.number_input("Litres for Sale", value=float(df.loc[selected_record, "litres_sell"]), min_value=0.0, step=0.1, key="edit_milk_sell")
                 litres_calves = st.number_input("Litres for Calves", value=float(df.loc[selected_record, "litres_calves"]), min_value=0.0, step=0.1, key="edit_milk_calves")
                 if st.button("Save Edit", key="save_edit_milk_btn"):
-                    if update_document("milk_production", df.loc[selected_record, "id"], {
+                    record = df.loc[selected_record]
+                    # The cow is not changed here, so old records of cows no longer in the herd stay editable
+                    problems = validate_record("milk_production", {
+                        "cow": selected_cow_name, "date": record["date"].isoformat(), "time_of_milking": time_of_milking,
+                        "litres_sell": float(litres_sell), "litres_calves": float(litres_calves)}, herd=())
+                    # Move the record's litres between the day's session counters in the same batch
+                    changes = {record["time_of_milking"]: -float(record["litres_sell"])}
+                    changes[time_of_milking] = changes.get(time_of_milking, 0.0) + float(litres_sell)
+                    if problems:
+                        for problem in problems:
+                            st.error(problem)
+                    elif write_batch([("milk_production", record["id"], {
                         "time_of_milking": time_of_milking,
                         "litres_sell": float(litres_sell),
                         "litres_calves": float(litres_calves)
-                    }):
+                    }, True)] + milking_counter_writes(record["date"], changes)):
                         st.success("Milk record updated.")
                         log_audit_event(username, "MILK_RECORD_UPDATED", f"Cow: {selected_cow_name}")
                         st.rerun()
@@ -196,7 +212,7 @@ def data_edit_page(username):
         df = load_table("health_records")
         if not df.empty:
             if search_term:
-                df = df[df["cow_tag"].str.lower().str.contains(search_term.lower())]
+                df = df[df["cow_tag"].isin(search_cows(search_term, df["cow_tag"].dropna().unique().tolist())[0])]
             df = to_date(df, "date")
             cow_tags = df["cow_tag"].unique().tolist()
             selected_cow_tag = st.selectbox("Select Cow by Tag", cow_tags, key="edit_health_cow_select")
@@ -232,7 +248,7 @@ def data_edit_page(username):
         df = load_table("ai_records")
         if not df.empty:
             if search_term:
-                df = df[df["cow_tag"].str.lower().str.contains(search_term.lower())]
+                df = df[df["cow_tag"].isin(search_cows(search_term, df["cow_tag"].dropna().unique().tolist())[0])]
             df = to_date(df, "ai_date")
             cow_tags = df["cow_tag"].unique().tolist()
             selected_cow_tag = st.selectbox("Select Cow by Tag", cow_tags, key="edit_ai_cow_select")
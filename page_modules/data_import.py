@@ -0,0 +1,59 @@
+# dairy_farm_app/page_modules/data_import.py
+import streamlit as st
+from utils.bulk_import import IMPORT_COLLECTIONS, import_formats, check_header, import_file
+from utils.schemas import SCHEMAS
+
+def data_import_page(username):
+    st.title("📥 Import Historical Records")
+    st.caption("Load CSV or Excel files of past records. Rows are checked against the collection's fields; "
+               "valid rows are imported and the rest are listed for correction.")
+
+    collection = st.selectbox("Collection", IMPORT_COLLECTIONS, key="import_collection",
+                              format_func=lambda name: name.replace("_", " ").title())
+    schema = SCHEMAS[collection]
+    st.write("**Columns:** " + ", ".join(f"`{field}`" + (" (required)" if spec.get("required") else "")
+                                         for field, spec in schema.items()))
+    st.caption("Dates are best written as YYYY-MM-DD. Headers are matched ignoring case and spaces.")
+
+    uploaded = st.file_uploader("File", type=import_formats(), key="import_file")
+    if uploaded is None:
+        return
+    data = uploaded.getvalue()
+
+    missing = check_header(data, uploaded.name, collection)
+    if missing:
+        st.error(f"The file has no column for: {', '.join(missing)}")
+        return
+
+    if st.button("Import", type="primary", key="import_btn"):
+        bar = st.progress(0.0, text="Importing...")
+
+        def progress(rows, imported):
+            bar.progress(min(imported / max(rows, 1), 1.0), text=f"{imported:,} rows imported of {rows:,} read")
+
+        try:
+            st.session_state.import_result = import_file(data, uploaded.name, collection, username, progress=progress)
+        except Exception as e:
+            st.error(f"Import stopped: {e}. Rows committed so far are kept; import the same file again to resume.")
+            return
+        bar.empty()
+
+    result = st.session_state.get("import_result")
+    if not result:
+        return
+    if result["status"] == "already imported":
+        st.info(f"This file was already imported into {collection}: {result['imported']:,} rows.")
+        return
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Rows in File", f"{result['rows']:,}")
+    col2.metric("Imported", f"{result['imported']:,}")
+    col3.metric("Rejected Rows", f"{result['errors']['row'].nunique():,}")
+    if result.get("counters_stale"):
+        st.warning("The dashboard milk totals were not recounted. Use Recount on the dashboard once the read budget allows.")
+    if result["resumed"]:
+        st.caption(f"Resumed an earlier run: {result['resumed']:,} rows were already committed.")
+    if not result["errors"].empty:
+        st.write("**Rejected rows** (row numbers are spreadsheet lines; fix them and import those rows again)")
+        st.dataframe(result["errors"], hide_index=True)
+        st.download_button("Download Error Report", result["errors"].to_csv(index=False),
+                           file_name=f"import_errors_{collection}.csv", mime="text/csv")
@@ -1,6 +1,9 @@
 import streamlit as st
 from firebase_utils import add_document, log_audit_event, get_collection, update_document
 from utils.calculations import get_available_feed_types, get_cows_by_status, get_all_cows, get_feed_inventory
+from utils.cow_registry import get_cow_registry
+from utils.validation import validate_record
+from utils.feed_forecast import feed_versions, record_feed_use
 from page_modules.staff_performance import record_staff_performance
 from datetime import date
 import pandas as pd
@@ -20,7 +23,29 @@ def feed_records_page(username):
     
     # Load or initialize cow categories
     cow_categories = load_cow_categories()
+    feed_allocation_section(username, lactating_cows, cow_categories, dairy_meal_stock())
     
+    st.markdown("---")
+    
+    # Manual Feed Recording (existing code)
+    st.subheader("Manual Feed Recording")
+    available_feeds = get_available_feed_types()
+    if not available_feeds:
+        st.warning("No feed available. Manager needs to add feed receipts.")
+    else:
+        manual_feed_form(username, available_feeds)
+
+def dairy_meal_stock():
+    inventory = get_feed_inventory()
+    if not inventory.empty and "Dairy Meal" in inventory["feed_type"].values:
+        dairy_meal_row = inventory[inventory["feed_type"] == "Dairy Meal"]
+        return dairy_meal_row["remaining"].values[0]
+    return 0
+
+# The allocation section is a fragment so picking cows and amounts reruns only this section,
+# not the page's cow, category and inventory loads. Those are read once per page run.
+@st.fragment
+def feed_allocation_section(username, lactating_cows, cow_categories, dairy_meal_inventory):
     # Create two columns for high and low yielders
     col1, col2 = st.columns(2)
     
@@ -69,13 +94,6 @@ def feed_records_page(username):
     custom_total = (len(high_yielders) * high_yielder_amount) + (len(low_yielders) * low_yielder_amount)
     st.write(f"**Custom Daily Requirement:** {custom_total}kg")
     
-    # Check inventory
-    inventory = get_feed_inventory()
-    dairy_meal_inventory = 0
-    if not inventory.empty and "Dairy Meal" in inventory["feed_type"].values:
-        dairy_meal_row = inventory[inventory["feed_type"] == "Dairy Meal"]
-        dairy_meal_inventory = dairy_meal_row["remaining"].values[0]
-    
     st.write(f"**Current Dairy Meal Inventory:** {dairy_meal_inventory}kg")
     
     if dairy_meal_inventory < custom_total:
@@ -92,21 +110,24 @@ def feed_records_page(username):
     
     with col6:
         if st.button("Save & Deduct Dairy Meal", type="primary", key="deduct_feed"):
-            if dairy_meal_inventory < custom_total:
+            # The inventory shown above is from the last page run; check the current stock
+            if dairy_meal_stock() < custom_total:
                 st.error("Cannot deduct - insufficient inventory")
             else:
                 # Save categories
                 save_cow_categories(high_yielders, low_yielders)
                 
                 # Record the dairy meal usage
-                add_document("feeds_used", {
+                since = feed_versions()
+                if add_document("feeds_used", {
                     "date": date.today().isoformat(),
                     "category": "Lactating Cows",
                     "feed_type": "Dairy Meal",
                     "quantity": float(custom_total),
                     "automated": True,
                     "note": f"Auto-deducted: {len(high_yielders)} high yielders @{high_yielder_amount}kg, {len(low_yielders)} low yielders @{low_yielder_amount}kg"
-                })
+                }):
+                    record_feed_use("Dairy Meal", date.today(), custom_total, since)
                 
                 # Record individual allocations for profit analysis
                 for cow in high_yielders:
@@ -133,17 +154,13 @@ def feed_records_page(username):
                 record_staff_performance(username, f"Auto-deducted {custom_total}kg Dairy Meal")
                 log_audit_event(username, "FEED_AUTO_DEDUCT", 
                               f"Dairy Meal: {custom_total}kg, High: {len(high_yielders)}, Low: {len(low_yielders)}")
+
+@st.fragment
+def manual_feed_form(username, available_feeds):
+    search_feed = st.text_input("Search Feed", key="feed_search")
+    filtered_feeds = [f for f in available_feeds if search_feed.lower() in f.lower()] if search_feed else available_feeds
     
-    st.markdown("---")
-    
-    # Manual Feed Recording (existing code)
-    st.subheader("Manual Feed Recording")
-    available_feeds = get_available_feed_types()
-    if not available_feeds:
-        st.warning("No feed available. Manager needs to add feed receipts.")
-    else:
-        search_feed = st.text_input("Search Feed", key="feed_search")
-        filtered_feeds = [f for f in available_feeds if search_feed.lower() in f.lower()] if search_feed else available_feeds
+    with st.form("manual_feed_form"):
         feed_type = st.selectbox("Feed Type", filtered_feeds, key="feed_type")
         
         col1, col2 = st.columns(2)
@@ -152,20 +169,29 @@ def feed_records_page(username):
             quantity = st.number_input("Quantity Used (kg)", min_value=0.0, max_value=100000.0, step=None, format="%f", key="feed_qty")
         with col2:
             date_used = st.date_input("Date", value=date.today(), key="feed_date")
-        
-        if st.button("Record Feed Usage"):
-            if quantity <= 0 or not feed_type:
-                st.warning("Quantity must be positive and feed type is required.")
-            else:
-                add_document("feeds_used", {
-                    "date": date_used.isoformat(),
-                    "category": category,
-                    "feed_type": feed_type,
-                    "quantity": float(quantity)
-                })
-                st.success("Feed usage recorded!")
-                record_staff_performance(username, f"Feed usage recorded for {feed_type}")
-                log_audit_event(username, "FEED_USED", f"{quantity}kg of {feed_type} for {category}")
+        submitted = st.form_submit_button("Record Feed Usage")
+    
+    if submitted:
+        record = {
+            "date": date_used.isoformat(),
+            "category": category,
+            "feed_type": feed_type,
+            "quantity": float(quantity)
+        }
+        problems = validate_record("feeds_used", record)
+        if quantity <= 0 or not feed_type:
+            st.warning("Quantity must be positive and feed type is required.")
+        elif problems:
+            for problem in problems:
+                st.warning(problem)
+        else:
+            since = feed_versions()
+            if not add_document("feeds_used", record):
+                return
+            record_feed_use(feed_type, date_used, quantity, since)
+            st.success("Feed usage recorded!")
+            record_staff_performance(username, f"Feed usage recorded for {feed_type}")
+            log_audit_event(username, "FEED_USED", f"{quantity}kg of {feed_type} for {category}")
 
 # Helper functions for cow categories
 def load_cow_categories():
@@ -195,31 +221,20 @@ def save_cow_categories(high_yielders, low_yielders):
         "total_low": len(low_yielders)
     })
     
-    # Get all cows with their document IDs
-    cows_data = get_collection("cows")
-    if not cows_data.empty:
-        # Create a mapping from cow name to document ID
-        name_to_id = {}
-        for idx, row in cows_data.iterrows():
-            # The document ID is stored in the 'id' column
-            name_to_id[row["name"]] = row["id"]
-        
-        # Update cow documents with their category
-        for cow_name in high_yielders:
-            if cow_name in name_to_id:
-                update_document("cows", name_to_id[cow_name], {"yield_category": "High"})
-            else:
-                st.error(f"Warning: Cow '{cow_name}' not found in database")
+    registry = get_cow_registry()
+    if len(registry):
+        high, low = set(high_yielders), set(low_yielders)
+        categories = {name: "High" for name in high_yielders}
+        categories.update({name: "Low" for name in low_yielders})
+        # Mark lactating cows that aren't categorized as "Uncategorized"
+        for name in registry.names_with_status("Lactating"):
+            if name not in high and name not in low:
+                categories[name] = "Uncategorized"
         
-        for cow_name in low_yielders:
-            if cow_name in name_to_id:
-                update_document("cows", name_to_id[cow_name], {"yield_category": "Low"})
-            else:
+        # Update cow documents whose category changed
+        for cow_name, category in categories.items():
+            cow = registry.get(cow_name)
+            if cow is None:
                 st.error(f"Warning: Cow '{cow_name}' not found in database")
-        
-        # Mark lactating cows that aren't categorized as "Uncategorized"
-        for idx, row in cows_data.iterrows():
-            if (row["status"] == "Lactating" and 
-                row["name"] not in high_yielders and 
-                row["name"] not in low_yielders):
-                update_document("cows", row["id"], {"yield_category": "Uncategorized"})
+            elif cow.get("yield_category") != category:
+                update_document("cows", cow["id"], {"yield_category": category})
@@ -4,6 +4,8 @@ import pandas as pd
 from datetime import date
 from utils.data_loader import to_date
 from utils.calculations import get_all_cows
+from utils.cow_registry import search_cows
+from utils.validation import validate_record
 from firebase_utils import get_collection, add_document, update_document, delete_document, log_audit_event
 from page_modules.staff_performance import record_staff_performance
 
@@ -37,7 +39,7 @@ def add_medicine(name, supplier, quantity, unit_price, expiry_date=None):
 
 def add_health_record(cow_tag, disease, medicine, medicine_id, medicine_quantity, medicine_price, date, vaccinations, observations):
     try:
-        success = add_document("health_records", {
+        record = {
             "cow_tag": cow_tag,
             "disease": disease,
             "medicine": medicine,
@@ -48,7 +50,13 @@ def add_health_record(cow_tag, disease, medicine, medicine_id, medicine_quantity
             "vaccinations": vaccinations,
             "observations": observations,
             "cost": None
-        })
+        }
+        problems = validate_record("health_records", record)
+        for problem in problems:
+            st.warning(problem)
+        if problems:
+            return False
+        success = add_document("health_records", record)
         if success:
             log_audit_event("Staff", "HEALTH_RECORD_ADDED", f"{cow_tag}: {disease}")
         return success
@@ -78,54 +86,7 @@ def staff_health_page():
         medicine_options = {row["name"]: row["id"] for _, row in medicines.iterrows()}
     
     with st.expander("➕ Add New Health Record", expanded=True):
-        search_cow = st.text_input("Search Cow", key="health_cow_search")
-        cow_options = get_all_cows()
-        filtered_cows = [c for c in cow_options if search_cow.lower() in c.lower()] if search_cow else cow_options
-        cow_tag = st.selectbox("Select Cow", filtered_cows if filtered_cows else ["No cows available"], key="health_cow_select")
-        
-        if not filtered_cows and search_cow:
-            st.warning("Cow not found. Please check the name or add the cow in the Manager Dashboard.")
-        
-        disease = st.text_input("Disease")
-        
-        # Medicine selection
-        col1, col2 = st.columns(2)
-        with col1:
-            if medicine_options:
-                selected_medicine = st.selectbox("Select Medicine", ["None"] + list(medicine_options.keys()))
-                medicine_id = medicine_options[selected_medicine] if selected_medicine != "None" else None
-                medicine = selected_medicine if selected_medicine != "None" else ""
-            else:
-                st.info("No medicines available. Manager needs to add medicines first.")
-                medicine = st.text_input("Medicine Given")
-                medicine_id = None
-                
-        with col2:
-            if medicine_options and selected_medicine != "None":
-                # Get selected medicine details
-                selected_med = medicines[medicines["id"] == medicine_id].iloc[0]
-                st.info(f"Available: {selected_med['remaining']}")
-                medicine_quantity = st.number_input("Quantity Used", min_value=1, max_value=selected_med["remaining"], step=1, value=1)
-                medicine_price = selected_med["unit_price"] * medicine_quantity
-                st.write(f"Cost: KES {medicine_price:,.2f}")
-            else:
-                medicine_quantity = 0
-                medicine_price = st.number_input("Medicine Price (KES)", min_value=0.0, max_value=100000.0, step=100.0)
-        
-        record_date = st.date_input("Date", value=date.today())
-        vaccinations = st.text_input("Vaccinations (if calf)")
-        observations = st.text_area("Observations")
-        
-        if st.button("Submit Health Record"):
-            success = add_health_record(
-                cow_tag, disease, medicine, medicine_id, medicine_quantity, 
-                medicine_price, record_date.isoformat(), vaccinations, observations
-            )
-            if success:
-                st.success("Health record added successfully!")
-                record_staff_performance("Staff", f"Health record for {cow_tag}")
-            else:
-                st.error("Failed to add health record.")
+        health_record_form(medicines, medicine_options, get_all_cows())
     
     st.markdown("---")
     st.subheader("Health Observations")
@@ -137,6 +98,60 @@ def staff_health_page():
     else:
         st.info("No health records available")
 
+# A fragment, so the dependent medicine and quantity widgets rerun only the form and not
+# the medicine and health record reads around it
+@st.fragment
+def health_record_form(medicines, medicine_options, cow_options):
+    search_cow = st.text_input("Search Cow", key="health_cow_search")
+    filtered_cows, fuzzy = search_cows(search_cow, cow_options)
+    if fuzzy and filtered_cows:
+        st.caption(f"No cow starts with '{search_cow}'. Showing close matches.")
+    cow_tag = st.selectbox("Select Cow", filtered_cows if filtered_cows else ["No cows available"], key="health_cow_select")
+    
+    if not filtered_cows and search_cow:
+        st.warning("Cow not found. Please check the name or add the cow in the Manager Dashboard.")
+    
+    disease = st.text_input("Disease")
+    
+    # Medicine selection
+    col1, col2 = st.columns(2)
+    with col1:
+        if medicine_options:
+            selected_medicine = st.selectbox("Select Medicine", ["None"] + list(medicine_options.keys()))
+            medicine_id = medicine_options[selected_medicine] if selected_medicine != "None" else None
+            medicine = selected_medicine if selected_medicine != "None" else ""
+        else:
+            st.info("No medicines available. Manager needs to add medicines first.")
+            medicine = st.text_input("Medicine Given")
+            medicine_id = None
+            
+    with col2:
+        if medicine_options and selected_medicine != "None":
+            # Get selected medicine details
+            selected_med = medicines[medicines["id"] == medicine_id].iloc[0]
+            st.info(f"Available: {selected_med['remaining']}")
+            medicine_quantity = st.number_input("Quantity Used", min_value=1, max_value=selected_med["remaining"], step=1, value=1)
+            medicine_price = selected_med["unit_price"] * medicine_quantity
+            st.write(f"Cost: KES {medicine_price:,.2f}")
+        else:
+            medicine_quantity = 0
+            medicine_price = st.number_input("Medicine Price (KES)", min_value=0.0, max_value=100000.0, step=100.0)
+    
+    record_date = st.date_input("Date", value=date.today())
+    vaccinations = st.text_input("Vaccinations (if calf)")
+    observations = st.text_area("Observations")
+    
+    if st.button("Submit Health Record"):
+        success = add_health_record(
+            cow_tag, disease, medicine, medicine_id, medicine_quantity, 
+            medicine_price, record_date.isoformat(), vaccinations, observations
+        )
+        if success:
+            st.success("Health record added successfully!")
+            record_staff_performance("Staff", f"Health record for {cow_tag}")
+        else:
+            st.error("Failed to add health record.")
+
 def manager_health_page():
     st.title("🏥 Health Management")
     
@@ -1,91 +1,224 @@
 import streamlit as st
-from firebase_utils import add_document, log_audit_event, get_collection
+import numpy as np
+import pandas as pd
+from firebase_utils import write_batch, log_audit_event, query_collection, audit_event_write, refuse_over_budget
+from utils.data_loader import get_collection_version
 from utils.calculations import get_all_cows, get_cows_by_status
-from page_modules.staff_performance import record_staff_performance
+from utils.cow_registry import search_cows
+from utils.milk_counters import BATCH_SIZE, milking_counter_writes, total_counter_writes
+from utils.schemas import MAX_LITRES
+from utils.validation import validate_frame, validate_record
+from utils.yield_matrix import record_milkings
+from page_modules.staff_performance import record_staff_performance, staff_performance_write, staff_performance_writes
 from datetime import date
 
 def milk_records_page(username):
     st.title("🥛 Milk Production Records")
     
-    # Section 1: Individual Cow Milking Records
-    st.subheader("Record Individual Cow Milking")
     cows = get_cows_by_status("Lactating")  # Only lactating cows
+    mode = st.radio("Entry Mode", ["Individual Cow", "Whole Session"], horizontal=True, key="milk_entry_mode")
+    if mode == "Whole Session":
+        # Section 1: All lactating cows for one milking session
+        st.subheader("Record a Milking Session")
+        session_milking_grid(username, cows)
+    else:
+        # Section 1: Individual Cow Milking Records
+        st.subheader("Record Individual Cow Milking")
+        cow_milking_form(username, cows)
+    
+    st.markdown("---")
+    
+    # Section 2: Total Daily Production (for profit calculation)
+    st.subheader("Record Total Daily Production (for Profit Calculation)")
+    total_production_form(username)
+
+# The entry sections are fragments: the cow search reruns only its own section, and the
+# inputs sit in forms that send nothing to the server until they are submitted.
+@st.fragment
+def cow_milking_form(username, cows):
     search_cow = st.text_input("Search Cow", key="milk_cow_search")
-    filtered_cows = [c for c in cows if search_cow.lower() in c.lower()] if search_cow else cows
-    selected_cow = st.selectbox("Select Cow", filtered_cows if filtered_cows else ["No lactating cows available"], key="milk_cow_select")
+    filtered_cows, fuzzy = search_cows(search_cow, cows)
+    if fuzzy and filtered_cows:
+        st.caption(f"No cow starts with '{search_cow}'. Showing close matches.")
     
     if not filtered_cows and search_cow:
         st.warning("No lactating cow found. Please check the name or add a lactating cow in the Manager Dashboard.")
     
-    col1, col2 = st.columns(2)
-    with col1:
-        time_of_milking = st.selectbox("Time of Milking", ["Morning", "Lunch", "Evening"], key="milk_time")
-        # Allow decimal input with step=None
-        litres_sell = st.number_input("Litres for Sale", min_value=0.0, max_value=10000.0, step=None, format="%f", key="milk_sell")
-        record_date = st.date_input("Date of Recording", value=date.today(), key="milk_date")
-    with col2:
-        # Allow decimal input with step=None
-        litres_calves = st.number_input("Litres for Calves", min_value=0.0, max_value=10000.0, step=None, format="%f", key="milk_calves")
+    with st.form("cow_milking_form"):
+        selected_cow = st.selectbox("Select Cow", filtered_cows if filtered_cows else ["No lactating cows available"], key="milk_cow_select")
+        col1, col2 = st.columns(2)
+        with col1:
+            time_of_milking = st.selectbox("Time of Milking", ["Morning", "Lunch", "Evening"], key="milk_time")
+            # Allow decimal input with step=None
+            litres_sell = st.number_input("Litres for Sale", min_value=0.0, max_value=10000.0, step=None, format="%f", key="milk_sell")
+            record_date = st.date_input("Date of Recording", value=date.today(), key="milk_date")
+        with col2:
+            # Allow decimal input with step=None
+            litres_calves = st.number_input("Litres for Calves", min_value=0.0, max_value=10000.0, step=None, format="%f", key="milk_calves")
+        submitted = st.form_submit_button("Record Cow Milking")
     
-    if st.button("Record Cow Milking"):
-        if selected_cow == "No lactating cows available" or litres_sell < 0 or litres_calves < 0:
-            st.warning("Please select a valid lactating cow and ensure litres are non-negative.")
+    if submitted:
+        if selected_cow == "No lactating cows available":
+            st.warning("Please select a valid lactating cow.")
         else:
-            # Check for duplicate milking entries
-            existing_records = get_collection("milk_production")
-            if not existing_records.empty:
-                duplicate = existing_records[
-                    (existing_records["cow"] == selected_cow) & 
-                    (existing_records["date"] == record_date.isoformat()) & 
-                    (existing_records["time_of_milking"] == time_of_milking)
-                ]
-                
-                if not duplicate.empty:
-                    st.error(f"Error: {selected_cow} already has a milking record for {time_of_milking} on {record_date}.")
-                    return
-            
-            add_document("milk_production", {
+            record = {
                 "cow": selected_cow,
                 "date": record_date.isoformat(),
                 "time_of_milking": time_of_milking,
                 "litres_sell": float(litres_sell),  # Store as float
                 "litres_calves": float(litres_calves),  # Store as float
-            })
+            }
+            # Checked against this cow's records for the day and session, for duplicate milking entries;
+            # not saved unchecked when the read budget is spent
+            if refuse_over_budget("milk_production"):
+                return
+            existing = query_collection("milk_production", [("cow", "==", selected_cow),
+                                                            ("date", "==", record_date.isoformat()),
+                                                            ("time_of_milking", "==", time_of_milking)])
+            problems = validate_record("milk_production", record, existing=existing)
+            if problems:
+                for problem in problems:
+                    st.error(problem)
+                return
+            
+            # The record, the dashboard counters, the performance entry and the audit events in one commit
+            since = get_collection_version("milk_production")
+            if not write_batch([("milk_production", None, record, False)]
+                + milking_counter_writes(record_date, {time_of_milking: litres_sell})
+                + staff_performance_writes(username, f"Milk recorded for {selected_cow}")
+                + [audit_event_write(username, "MILK_RECORDED", f"{selected_cow} - {litres_sell}L sell, {litres_calves}L calves")]):
+                return
+            record_milkings([record], since)
             st.success("Cow milking recorded!")
-            record_staff_performance(username, f"Milk recorded for {selected_cow}")
-            log_audit_event(username, "MILK_RECORDED", f"{selected_cow} - {litres_sell}L sell, {litres_calves}L calves")
+
+def recorded_cows(record_date, time_of_milking):
+    """Cows that already have a record for the session, read once per session, day and write."""
+    key = (record_date.isoformat(), time_of_milking, get_collection_version("milk_production"))
+    cached = st.session_state.get("milk_session_recorded")
+    if cached is None or cached[0] != key:
+        records = query_collection("milk_production", [("date", "==", record_date.isoformat()),
+                                                       ("time_of_milking", "==", time_of_milking)])
+        cached = (key, set(records["cow"]) if not records.empty else set())
+        st.session_state.milk_session_recorded = cached
+    return cached[1]
+
+def validate_session_grid(grid, record_date, time_of_milking):
+    """Entered rows of the grid with litres as floats, and a list of problems. One pass over the grid."""
+    litres = grid[["litres_sell", "litres_calves"]].apply(pd.to_numeric, errors="coerce")
+    entered = litres.notna().any(axis=1)
+    litres = litres[entered].fillna(0.0)
+    rows = grid.loc[litres.index, ["cow"]].assign(litres_sell=litres["litres_sell"], litres_calves=litres["litres_calves"])
+    issues = validate_frame(rows.assign(date=record_date.isoformat(), time_of_milking=time_of_milking), "milk_production")
+    # One line per problem, naming every cow that has it
+    problems = [f"{field.replace('_', ' ').capitalize()}: {message} ({', '.join(rows.loc[group['row'], 'cow'])})."
+                for (field, message), group in issues.groupby(["field", "message"], sort=False)]
+    return rows, problems
+
+@st.fragment
+def session_milking_grid(username, cows):
+    saved = st.session_state.pop("milk_session_saved", None)
+    if saved:
+        st.success(saved)
     
-    st.markdown("---")
+    col1, col2 = st.columns(2)
+    with col1:
+        record_date = st.date_input("Date of Recording", value=date.today(), key="milk_session_date")
+    with col2:
+        time_of_milking = st.selectbox("Time of Milking", ["Morning", "Lunch", "Evening"], key="milk_session_time")
     
-    # Section 2: Total Daily Production (for profit calculation)
-    st.subheader("Record Total Daily Production (for Profit Calculation)")
+    done = recorded_cows(record_date, time_of_milking)
+    pending = [cow for cow in cows if cow not in done]
+    if done:
+        st.caption(f"{len(done)} cows already recorded for this session are left out of the grid.")
+    if not pending:
+        st.info("Every lactating cow has a record for this session.")
+        return
+    
+    # A new key after each save starts an empty grid
+    grid_key = f"milk_session_grid_{st.session_state.get('milk_session_round', 0)}"
+    with st.form("session_milking_form"):
+        grid = st.data_editor(
+            pd.DataFrame({"cow": pending, "litres_sell": np.nan, "litres_calves": np.nan}),
+            column_config={
+                "cow": st.column_config.TextColumn("Cow"),
+                "litres_sell": st.column_config.NumberColumn("Litres for Sale", min_value=0.0, max_value=MAX_LITRES),
+                "litres_calves": st.column_config.NumberColumn("Litres for Calves", min_value=0.0, max_value=MAX_LITRES),
+            },
+            disabled=["cow"], hide_index=True, num_rows="fixed", use_container_width=True, key=grid_key,
+        )
+        submitted = st.form_submit_button("Record Session")
+    
+    if not submitted:
+        return
+    rows, problems = validate_session_grid(grid, record_date, time_of_milking)
+    if problems:
+        for problem in problems:
+            st.error(problem)
+        return
+    if rows.empty:
+        st.warning("Enter litres for at least one cow.")
+        return
+    # Another device may have recorded some of these cows since the grid was drawn
+    clashes = sorted(set(rows["cow"]) & recorded_cows(record_date, time_of_milking))
+    if clashes:
+        st.error(f"Already recorded for {time_of_milking} on {record_date}: {', '.join(clashes)}.")
+        return
     
-    col3, col4 = st.columns(2)
-    with col3:
-        total_date = st.date_input("Date", value=date.today(), key="total_date")
-    with col4:
-        total_litres = st.number_input("Total Litres Produced", min_value=0.0, max_value=10000.0, step=None, format="%f",
-                                      help="Total litres produced for the day (used for profit calculation)")
+    day = record_date.isoformat()
+    total_sell, total_calves = float(rows["litres_sell"].sum()), float(rows["litres_calves"].sum())
+    summary = f"{day} {time_of_milking}: {len(rows)} cows, {total_sell:,.1f}L sell, {total_calves:,.1f}L calves"
+    records = [("milk_production", None, {"cow": cow, "date": day, "time_of_milking": time_of_milking,
+                                          "litres_sell": float(sell), "litres_calves": float(calves)}, False)
+               for cow, sell, calves in rows.itertuples(index=False)]
+    since = get_collection_version("milk_production")
+    # One commit for a typical herd; larger herds are split, each batch carrying the counter
+    # increment for its own records so a failed batch leaves the counters matching what was saved
+    size = BATCH_SIZE - 3  # room for the counter, performance and audit writes
+    for start in range(0, len(records), size):
+        batch = records[start:start + size]
+        writes = batch + milking_counter_writes(record_date, {time_of_milking: sum(data["litres_sell"] for _, _, data, _ in batch)})
+        if start + size >= len(records):
+            writes += [staff_performance_write(username, f"Milk recorded for {len(rows)} cows ({time_of_milking})"),
+                       audit_event_write(username, "MILK_SESSION_RECORDED", summary)]
+        if not write_batch(writes):
+            st.error(f"Saved {start} of {len(records)} records before the error.")
+            return
+    record_milkings([data for _, _, data, _ in records], since)
+    st.session_state.milk_session_saved = f"Recorded {summary}."
+    st.session_state.milk_session_round = st.session_state.get("milk_session_round", 0) + 1
+    st.rerun(scope="fragment")
+
+@st.fragment
+def total_production_form(username):
+    with st.form("total_production_form"):
+        col3, col4 = st.columns(2)
+        with col3:
+            total_date = st.date_input("Date", value=date.today(), key="total_date")
+        with col4:
+            total_litres = st.number_input("Total Litres Produced", min_value=0.0, max_value=10000.0, step=None, format="%f",
+                                          help="Total litres produced for the day (used for profit calculation)")
+        submitted = st.form_submit_button("Record Total Production")
     
-    if st.button("Record Total Production"):
+    if submitted:
         if total_litres <= 0:
             st.warning("Total litres must be positive.")
         else:
-            # Check if total production already recorded for this date
-            existing_totals = get_collection("milk_totals")
-            if not existing_totals.empty:
-                duplicate = existing_totals[
-                    (existing_totals["date"] == total_date.isoformat())
-                ]
-                
-                if not duplicate.empty:
-                    st.error(f"Error: Total production already recorded for {total_date}.")
-                    return
-            
-            add_document("milk_totals", {
+            record = {
                 "date": total_date.isoformat(),
                 "total_litres": float(total_litres)  # Store total litres
-            })
+            }
+            # Checked against any total already recorded for this date
+            if refuse_over_budget("milk_totals"):
+                return
+            existing = query_collection("milk_totals", [("date", "==", total_date.isoformat())])
+            problems = validate_record("milk_totals", record, existing=existing)
+            if problems:
+                for problem in problems:
+                    st.error(problem)
+                return
+            
+            if not write_batch([("milk_totals", None, record, False)] + total_counter_writes(total_date, total_litres)):
+                return
             st.success("Total production recorded!")
             record_staff_performance(username, f"Total milk production recorded for {total_date}")
             log_audit_event(username, "TOTAL_MILK_RECORDED", f"{total_date} - {total_litres}L total")
@@ -0,0 +1,99 @@
+import streamlit as st
+import plotly.express as px
+from utils.perf import firestore_stats, page_stats, top_read_offenders, totals, reset, import_stats
+from utils.read_budget import get_read_budgets, read_usage, budget_alerts
+from utils.memory import (table_cache_report, session_report, peak_rss_mib, start_tracing, stop_tracing,
+                          is_tracing, top_allocations, traced_memory_mib)
+
+def performance_page():
+    st.title("⏱️ Performance")
+    summary = totals()
+    st.caption(f"Counted by this server process since {summary['since']:%Y-%m-%d %H:%M:%S}, across all sessions.")
+
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Documents Read", f"{summary['reads']:,}")
+    col2.metric("Documents Written", f"{summary['writes']:,}")
+    col3.metric("Page Renders", f"{summary['renders']:,}")
+
+    st.subheader("Read Budgets")
+    budgets = get_read_budgets()
+    usage = read_usage()
+    col4, col5 = st.columns(2)
+    col4.metric("Reads Today (all sessions)", f"{usage['daily']:,} / {budgets['daily']:,}")
+    col5.metric("Reads This Session", f"{usage['session']:,} / {budgets['session']:,}")
+    col4.progress(min(usage["daily"] / budgets["daily"], 1.0) if budgets["daily"] else 1.0)
+    col5.progress(min(usage["session"] / budgets["session"], 1.0) if budgets["session"] else 1.0)
+    alerts = budget_alerts()
+    if not alerts.empty:
+        st.error("Pages were served cached data today because a read budget was spent:")
+        st.dataframe(alerts, hide_index=True)
+
+    st.subheader("Top Read Offenders")
+    offenders = top_read_offenders()
+    if not offenders.empty:
+        offenders["source"] = offenders["page"] + " · " + offenders["collection"]
+        fig = px.bar(offenders, x="documents", y="source", orientation="h",
+                     labels={"documents": "Documents read", "source": ""})
+        fig.update_layout(yaxis={"categoryorder": "total ascending"})
+        st.plotly_chart(fig, use_container_width=True)
+    else:
+        st.info("No Firestore reads recorded yet.")
+
+    st.subheader("Page Render Times")
+    pages = page_stats()
+    if not pages.empty:
+        st.dataframe(pages.round(1), hide_index=True)
+    else:
+        st.info("No page renders recorded yet.")
+
+    imports = import_stats()
+    if not imports.empty:
+        st.write("**Page module imports** (first open of each page in this process)")
+        st.dataframe(imports.round(1), hide_index=True)
+
+    st.subheader("Firestore Calls")
+    calls = firestore_stats()
+    if not calls.empty:
+        st.dataframe(calls.round(2), hide_index=True)
+    else:
+        st.info("No Firestore calls recorded yet.")
+
+    memory_report()
+
+    if st.button("Reset Counters"):
+        reset()
+        st.rerun()
+
+def memory_report():
+    st.subheader("Memory")
+    tables = table_cache_report()
+    sessions = session_report()
+    col1, col2, col3 = st.columns(3)
+    peak_rss = peak_rss_mib()
+    col1.metric("Peak Process Memory", f"{peak_rss:,.0f} MiB" if peak_rss is not None else "n/a")
+    col2.metric("Shared Table Cache", f"{tables['size (MiB)'].sum() if not tables.empty else 0:,.1f} MiB")
+    col3.metric("Session State (all sessions)", f"{sessions['size (MiB)'].sum() if not sessions.empty else 0:,.1f} MiB")
+
+    st.write("**Shared tables** (one compact copy per collection, used by every session)")
+    if not tables.empty:
+        st.dataframe(tables.round(2), hide_index=True)
+    else:
+        st.info("No tables cached yet.")
+
+    st.write("**Sessions** (frames and files kept in each session's state)")
+    if not sessions.empty:
+        st.dataframe(sessions.round(2), hide_index=True)
+
+    st.write("**Allocations by source line** (tracemalloc)")
+    if is_tracing():
+        current, peak = traced_memory_mib()
+        st.caption(f"Tracing: {current:,.1f} MiB live, {peak:,.1f} MiB peak since tracing started.")
+        st.dataframe(top_allocations().round(2), hide_index=True)
+        if st.button("Stop Tracing"):
+            stop_tracing()
+            st.rerun()
+    else:
+        st.caption("Tracing slows every allocation, so it is off until started here.")
+        if st.button("Start Tracing"):
+            start_tracing()
+            st.rerun()
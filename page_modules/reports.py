@@ -3,25 +3,28 @@ import pandas as pd
 from datetime import datetime, date
 import plotly.express as px
 import plotly.graph_objects as go
-from io import BytesIO
-from utils.data_loader import load_table, to_date
-from utils.calculations import calculate_profit_per_cow, calculate_feed_cost_used
+from utils.data_loader import load_table, to_date, table_tokens
+from utils.calculations import (calculate_profit_per_cow, calculate_feed_cost_used, calculate_monthly_salaries,
+                                build_daily_report, aggregate_report)
 from utils.helpers import format_with_commas
+from utils.charts import time_series_figure, time_series_line, time_series_area
+from utils.report_pdf import REPORTLAB_AVAILABLE, REPORT_COLLECTIONS, report_cache_key, report_pdf_status, request_report_pdf
+from utils.exports import EXPORT_TABLES, EXPORT_FORMATS, available_formats, export_table, export_tables_zip
+from utils.pricing import get_milk_prices, price_on
+from utils.cost_attribution import get_cow_day_costs
+from utils.farm_cube import get_farm_cube, PERIODS
+from utils.validation import audit_summary
+from utils.milk_reconciliation import TOLERANCE_SHARE, reconcile_records
+from utils.lactation import UNDERPERFORM_SHARE, with_lactation
+from firebase_utils import add_document, log_audit_event
+import importlib.util
+import os
+import tempfile
 
-try:
-    from reportlab.lib.pagesizes import A4
-    from reportlab.pdfgen import canvas
-    from reportlab.lib.units import cm
-    REPORTLAB_AVAILABLE = True
-except Exception:
-    REPORTLAB_AVAILABLE = False
-
-# Add statsmodels import with error handling
-try:
-    import statsmodels.api as sm
-    HAS_STATSMODELS = True
-except ImportError:
-    HAS_STATSMODELS = False
+# plotly imports statsmodels itself for OLS trendlines, so only check that it is installed
+HAS_STATSMODELS = importlib.util.find_spec("statsmodels") is not None
+# Seconds between checks on a PDF that is rendering
+PDF_POLL_SECONDS = 2
 
 def reports_page(start_date, end_date, granularity):
     st.title("📊 Reports")
@@ -34,6 +37,8 @@ def reports_page(start_date, end_date, granularity):
         date_range_str = f"Past 31 days (from {start_date} to {end_date})"
     
     st.write(f"**Report Period:** {date_range_str}")
+
+    milk_prices_editor()
     
     # Load all relevant data
     milk_totals = to_date(load_table("milk_totals"), "date")  # Total production for profit calculation
@@ -66,75 +71,18 @@ def reports_page(start_date, end_date, granularity):
     else:
         salary_costs = pd.DataFrame(columns=["salary_cost"])
 
-    price_per_litre = 43
-    milk_daily = pd.DataFrame()
-    
-    # Use milk_totals for profit calculation (as requested)
-    if not milk_totals.empty:
-        milk_daily = (milk_totals.groupby("date")["total_litres"].sum().to_frame("milk_l"))
-        milk_daily["revenue"] = milk_daily["milk_l"] * price_per_litre
-    elif not milk.empty:
-        # Fallback to individual records if totals not available
-        milk_daily = (milk.groupby("date")["litres_sell"].sum().to_frame("milk_l"))
-        milk_daily["revenue"] = milk_daily["milk_l"] * price_per_litre
+    milk_prices = get_milk_prices()
 
     # Calculate feed cost used (based on actual consumption, not purchases)
     feed_cost_used = calculate_feed_cost_used(start_date, end_date)
-    if not feed_cost_used.empty:
-        cost_daily = feed_cost_used.groupby("date")["cost"].sum().to_frame("feed_cost")
-    else:
-        cost_daily = pd.DataFrame(columns=["feed_cost"])
-
-    # Calculate total feed purchased in KES (not kg)
-    if not fr.empty:
-        feed_purchased_daily = fr.groupby("date")["cost"].sum().to_frame("feed_purchased_cost")
-        total_feed_purchased = fr["cost"].sum()
-    else:
-        feed_purchased_daily = pd.DataFrame(columns=["feed_purchased_cost"])
-        total_feed_purchased = 0
-
-    health_costs = pd.DataFrame()
-    if not health.empty and 'cost' in health.columns:
-        health_costs = health.groupby("date")["cost"].sum().to_frame("health_cost")
-
-    ai_costs = pd.DataFrame()
-    if not ai.empty and 'cost' in ai.columns:
-        ai_costs = ai.groupby("ai_date")["cost"].sum().to_frame("ai_cost")
 
-    daily = pd.DataFrame(index=pd.date_range(start=start_date, end=end_date, freq="D"))
-    daily.index.name = "date"
-    if not milk_daily.empty:
-        daily = daily.join(milk_daily, how="left")
-    if not cost_daily.empty:
-        daily = daily.join(cost_daily, how="left")
-    if not feed_purchased_daily.empty:
-        daily = daily.join(feed_purchased_daily, how="left")
-    if not health_costs.empty:
-        daily = daily.join(health_costs, how="left")
-    if not ai_costs.empty:
-        daily = daily.join(ai_costs, how="left")
-    if not salary_costs.empty:
-        daily = daily.join(salary_costs, how="left")
+    daily = build_daily_report(start_date, end_date, milk_totals, milk, feed_cost_used, fr, health, ai,
+                               salary_costs, milk_prices)
+    df_agg = aggregate_report(daily, granularity)
 
-    pd.set_option('future.no_silent_downcasting', True)
-    numeric_cols = ['milk_l', 'revenue', 'feed_cost', 'feed_purchased_cost', 'health_cost', 'ai_cost', 'salary_cost', 'total_cost', 'profit']
-    for col in numeric_cols:
-        if col not in daily.columns:
-            daily[col] = 0.0
-        else:
-            daily[col] = pd.to_numeric(daily[col], errors='coerce')
-    daily = daily.infer_objects(copy=False).fillna(0.0).reset_index()
-    daily["total_cost"] = daily["feed_cost"] + daily["health_cost"] + daily["ai_cost"] + daily["salary_cost"]
-    daily["profit"] = daily["revenue"] - daily["total_cost"]
-
-    def aggregate(df_daily, rule):
-        df = df_daily.copy()
-        df["date"] = pd.to_datetime(df["date"])
-        df = df.set_index("date").resample(rule).sum().reset_index()
-        return df
-
-    agg_map = {"Daily": ("D", daily), "Weekly": ("W", aggregate(daily, "W")), "Monthly": ("ME", aggregate(daily, "ME"))}
-    rule_code, df_agg = agg_map[granularity]
+    # Average price realised over the period, used by the per-litre checks below
+    total_milk_l = daily["milk_l"].sum()
+    price_per_litre = daily["revenue"].sum() / total_milk_l if total_milk_l > 0 else price_on(end_date, milk_prices)
     
     # Calculate totals
     total_revenue = df_agg["revenue"].sum()
@@ -179,39 +127,52 @@ def reports_page(start_date, end_date, granularity):
         st.info(f"""
         - Calculated Feed Cost/L: KES {calculated_feed_cost_per_liter:.2f}
         - Calculated Efficiency: {calculated_efficiency:.2f}
-        - Milk Price: KES {price_per_litre}/L
+        - Average Milk Price: KES {price_per_litre:.2f}/L
         """)
         
         if abs(calculated_efficiency - feed_efficiency) > 0.1:
             st.error("Inconsistency detected between feed cost and efficiency calculations!")
+        
+        # Invalid stored records skew every figure above; outliers may be genuine, so they are not counted
+        summary = audit_summary(["milk_production", "milk_totals", "feeds_received", "feeds_used"])
+        invalid = summary[["required", "type", "range", "reference", "duplicate"]].sum(axis=1)
+        if invalid.sum():
+            st.warning(f"{invalid.sum():,} problems found in the milk and feed records "
+                       f"({', '.join(summary.loc[invalid > 0, 'collection'])}). "
+                       "See Data Quality on the Manager Dashboard.")
+        
+        # Revenue comes from the daily totals; days without one, or far from the cow records, are understated
+        if not milk_totals.empty and not milk.empty:
+            recon = reconcile_records(milk, milk_totals, start_date, end_date)["status"]
+            no_total, mismatch = int((recon == "no total").sum()), int((recon == "mismatch").sum())
+            if no_total or mismatch:
+                st.warning(f"Milk revenue uses the daily totals: {no_total} days of this period have individual "
+                           f"records but no total, and {mismatch} days differ from the individual records by more "
+                           f"than {TOLERANCE_SHARE:.0%}. See Milk Reconciliation on the Manager Dashboard.")
     
     st.markdown("---")
     
     tab1, tab2, tab3, tab4 = st.tabs(["Revenue & Costs", "Milk Production", "Feed Insights", "Profit Analysis"])
     
     with tab1:
-        fig_rev_cost = go.Figure()
-        fig_rev_cost.add_trace(go.Scatter(x=df_agg["date"], y=df_agg["revenue"], 
-                                         name="Revenue", line=dict(color='green')))
-        fig_rev_cost.add_trace(go.Scatter(x=df_agg["date"], y=df_agg["total_cost"], 
-                                         name="Total Cost", line=dict(color='red')))
-        fig_rev_cost.update_layout(title="Revenue vs Costs Over Time",
-                                  xaxis_title="Date",
-                                  yaxis_title="KES")
+        fig_rev_cost = time_series_figure(df_agg, "date", ["revenue", "total_cost"],
+                                          names=["Revenue", "Total Cost"], colors=["green", "red"],
+                                          title="Revenue vs Costs Over Time",
+                                          xaxis_title="Date", yaxis_title="KES")
         st.plotly_chart(fig_rev_cost, use_container_width=True)
     
     with tab2:
         # Use milk_totals for production chart if available
         if not milk_totals.empty:
             milk_by_period = milk_totals.groupby("date")["total_litres"].sum().reset_index()
-            fig_milk = px.line(milk_by_period, x="date", y="total_litres", 
+            fig_milk = time_series_line(milk_by_period, x="date", y="total_litres",
                               title="Milk Production Over Time (Total Litres)",
                               labels={"total_litres": "Total Liters", "date": "Date"})
             st.plotly_chart(fig_milk, use_container_width=True)
         elif not milk.empty:
             # Fallback to individual records if totals not available
             milk_by_period = milk.groupby("date")["litres_sell"].sum().reset_index()
-            fig_milk = px.line(milk_by_period, x="date", y="litres_sell", 
+            fig_milk = time_series_line(milk_by_period, x="date", y="litres_sell",
                               title="Milk Production Over Time (Litres Sold)",
                               labels={"litres_sell": "Liters Sold", "date": "Date"})
             st.plotly_chart(fig_milk, use_container_width=True)
@@ -226,7 +187,7 @@ def reports_page(start_date, end_date, granularity):
         if not milk_totals.empty and not fu.empty and not fr.empty:
             # Calculate average cost per kg for each feed type
             fr['cost_per_kg'] = fr['cost'] / fr['quantity']
-            avg_cost_per_feed = fr.groupby('feed_type')['cost_per_kg'].mean().reset_index()
+            avg_cost_per_feed = fr.groupby('feed_type', observed=True)['cost_per_kg'].mean().reset_index()
             
             # Merge with feeds_used to calculate actual cost of used feed
             fu_with_cost = fu.merge(avg_cost_per_feed, on='feed_type', how='left')
@@ -242,7 +203,7 @@ def reports_page(start_date, end_date, granularity):
                 
                 # Add explanation
                 if feed_cost_per_liter > price_per_litre:  # If cost exceeds selling price
-                    st.warning(f"⚠️ Feed cost (KES {feed_cost_per_liter:.2f}/L) exceeds milk price (KES {price_per_litre}/L)!")
+                    st.warning(f"⚠️ Feed cost (KES {feed_cost_per_liter:.2f}/L) exceeds milk price (KES {price_per_litre:.2f}/L)!")
                     st.info("This suggests either: 1) High feed costs, 2) Low milk production, or 3) Data entry errors")
                 elif feed_cost_per_liter > price_per_litre * 0.6:  # If cost is more than 60% of selling price
                     st.warning(f"⚠️ High feed cost: {feed_cost_per_liter/price_per_litre*100:.1f}% of milk price")
@@ -254,11 +215,10 @@ def reports_page(start_date, end_date, granularity):
                 feed_daily_cost = fu_with_cost.groupby("date")["actual_cost"].sum().reset_index()
                 
                 merged_daily = milk_daily_totals.merge(feed_daily_cost, on="date", how="left").fillna(0)
-                merged_daily["feed_cost_per_liter"] = merged_daily.apply(
-                    lambda row: row["actual_cost"] / row["total_litres"] if row["total_litres"] > 0 else 0, axis=1
-                )
+                litres = merged_daily["total_litres"]
+                merged_daily["feed_cost_per_liter"] = (merged_daily["actual_cost"] / litres.where(litres > 0)).fillna(0)
                 
-                fig_cost_per_liter = px.line(merged_daily, x="date", y="feed_cost_per_liter",
+                fig_cost_per_liter = time_series_line(merged_daily, x="date", y="feed_cost_per_liter",
                                            title="Feed Cost Per Liter Over Time (Corrected Calculation)",
                                            labels={"feed_cost_per_liter": "Cost Per Liter (KES)", "date": "Date"})
                 st.plotly_chart(fig_cost_per_liter, use_container_width=True)
@@ -302,7 +262,7 @@ def reports_page(start_date, end_date, granularity):
             
             # Consumption trends over time
             consumption_trend = fu.groupby("date")["quantity"].sum().reset_index()
-            fig_trend = px.line(consumption_trend, x="date", y="quantity",
+            fig_trend = time_series_line(consumption_trend, x="date", y="quantity",
                                title="Feed Consumption Over Time",
                                labels={"quantity": "Quantity (kg)", "date": "Date"})
             st.plotly_chart(fig_trend, use_container_width=True)
@@ -312,7 +272,7 @@ def reports_page(start_date, end_date, granularity):
         # 4. Feed Cost Breakdown
         st.write("#### Feed Cost Breakdown")
         if not fr.empty:
-            cost_by_feed_type = fr.groupby("feed_type")["cost"].sum().reset_index()
+            cost_by_feed_type = fr.groupby("feed_type", observed=True)["cost"].sum().reset_index()
             fig_feed_cost = px.pie(cost_by_feed_type, values="cost", names="feed_type",
                                   title="Feed Cost Distribution by Type")
             st.plotly_chart(fig_feed_cost, use_container_width=True)
@@ -320,7 +280,7 @@ def reports_page(start_date, end_date, granularity):
             # Average cost per kg for each feed type
             fr_with_avg = fr.copy()
             fr_with_avg["cost_per_kg"] = fr_with_avg["cost"] / fr_with_avg["quantity"]
-            avg_cost_by_type = fr_with_avg.groupby("feed_type")["cost_per_kg"].mean().reset_index()
+            avg_cost_by_type = fr_with_avg.groupby("feed_type", observed=True)["cost_per_kg"].mean().reset_index()
             
             fig_avg_cost = px.bar(avg_cost_by_type, x="feed_type", y="cost_per_kg",
                                  title="Average Cost Per Kg by Feed Type",
@@ -369,7 +329,7 @@ def reports_page(start_date, end_date, granularity):
             st.info("Need both feed usage and milk production data for correlation analysis")
     
     with tab4:
-        fig_profit = px.area(df_agg, x="date", y="profit", 
+        fig_profit = time_series_area(df_agg, x="date", y="profit",
                             title="Profit/Loss Over Time",
                             labels={"profit": "KES", "date": "Date"})
         fig_profit.update_traces(line=dict(color='rgba(0,100,80,0.2)'), 
@@ -397,16 +357,31 @@ def reports_page(start_date, end_date, granularity):
     
     st.markdown("---")
     
+    slice_and_dice(start_date, end_date)
+    
+    st.markdown("---")
+    
     st.subheader("Profit Analysis per Cow")
     profit_per_cow = calculate_profit_per_cow(start_date, end_date)
     
     if not profit_per_cow.empty:
+        profit_per_cow = with_lactation(profit_per_cow)
         st.dataframe(profit_per_cow.style.format({
             "Milk Produced (L)": "{:,.1f}",
             "Revenue (KES)": "KES {:,.0f}",
+            "Feed Cost (KES)": "KES {:,.0f}",
+            "Health Cost (KES)": "KES {:,.0f}",
+            "AI Cost (KES)": "KES {:,.0f}",
             "Cost (KES)": "KES {:,.0f}",
-            "Profit (KES)": "KES {:,.0f}"
-        }))
+            "Profit (KES)": "KES {:,.0f}",
+            "Days in Milk": "{:,.0f}",
+            "Predicted 305-Day Yield (L)": "{:,.0f}"
+        }, na_rep="-"))
+        
+        underperformers = profit_per_cow.loc[profit_per_cow["Underperformer"], "Cow"].tolist()
+        if underperformers:
+            st.warning(f"Predicted to give less than {UNDERPERFORM_SHARE:.0%} of the herd's median 305-day yield "
+                       f"(from each cow's lactation curve): {', '.join(underperformers)}")
         
         col8, col9 = st.columns(2)
         with col8:
@@ -418,6 +393,8 @@ def reports_page(start_date, end_date, granularity):
             bottom_performers = profit_per_cow.nsmallest(5, "Profit (KES)")
             st.write("📉 Lowest Performers")
             st.dataframe(bottom_performers[["Cow", "Profit (KES)"]])
+
+        cow_profit_chart(profit_per_cow["Cow"].tolist(), start_date, end_date)
     else:
         st.info("No data available for profit per cow analysis")
     
@@ -428,11 +405,7 @@ def reports_page(start_date, end_date, granularity):
     col10, col11, col12 = st.columns(3)
     
     with col10:
-        if st.button("📄 Generate PDF Report"):
-            if generate_pdf_report(df_agg, profit_per_cow, start_date, end_date):
-                st.success("PDF report generated successfully!")
-            else:
-                st.error("PDF generation failed. Please check dependencies.")
+        generate_pdf_report(df_agg, profit_per_cow, start_date, end_date, granularity)
     
     with col11:
         csv = df_agg.to_csv(index=False)
@@ -453,120 +426,160 @@ def reports_page(start_date, end_date, granularity):
                 mime="text/csv"
             )
 
-def calculate_monthly_salaries(employees, start_date, end_date):
+    raw_records_export(start_date, end_date)
+
+def raw_records_export(start_date, end_date):
+    """Export raw records for the period, streamed to a temporary file in chunks."""
+    with st.expander("📦 Export Raw Records", expanded=False):
+        tables = st.multiselect("Tables", list(EXPORT_TABLES.keys()), default=list(EXPORT_TABLES.keys()),
+                                key="export_tables")
+        fmt = st.selectbox("Format", available_formats(), key="export_format")
+        as_zip = len(tables) > 1 or st.checkbox("Zip the file", key="export_zip")
+
+        if st.button("Prepare Export", key="export_prepare_btn"):
+            if not tables:
+                st.warning("Select at least one table.")
+                return
+
+            # Drop the previous export file before writing a new one
+            previous = st.session_state.pop("export_file", None)
+            if previous and os.path.exists(previous["path"]):
+                os.remove(previous["path"])
+
+            suffix = ".zip" if as_zip else EXPORT_FORMATS[fmt]
+            fd, path = tempfile.mkstemp(suffix=suffix)
+            os.close(fd)
+            with st.spinner("Exporting records..."):
+                if as_zip:
+                    counts = export_tables_zip(tables, start_date, end_date, fmt, path)
+                    name = f"dairy_records_{start_date}_{end_date}.zip"
+                else:
+                    counts = {tables[0]: export_table(tables[0], start_date, end_date, fmt, path)}
+                    name = f"{EXPORT_TABLES[tables[0]][0]}_{start_date}_{end_date}{suffix}"
+
+            if sum(counts.values()) == 0:
+                os.remove(path)
+                st.info("No records in the selected period.")
+                return
+            st.session_state.export_file = {"path": path, "name": name, "counts": counts}
+
+        export_file = st.session_state.get("export_file")
+        if export_file and os.path.exists(export_file["path"]):
+            st.write(", ".join(f"{table}: {rows:,} rows" for table, rows in export_file["counts"].items()))
+            with open(export_file["path"], "rb") as f:
+                st.download_button(
+                    label="⬇️ Download Export",
+                    data=f,
+                    file_name=export_file["name"],
+                    mime="application/octet-stream",
+                    key="export_download_btn"
+                )
+
+def slice_and_dice(start_date, end_date):
+    """Ad-hoc pivots over the shared date x cow x category cube."""
+    st.subheader("🧊 Slice & Dice")
+    cube = get_farm_cube()
+    if cube.empty:
+        st.info("No data available for slicing")
+        return
+
+    measures = {"Milk (L)": "milk", "Feed Cost (KES)": "feed", "Health Cost (KES)": "health", "AI Cost (KES)": "ai"}
+    breakdowns = {"Cow": "cow", "Category": "category", "Total": None}
+
+    col1, col2, col3, col4 = st.columns(4)
+    measure = col1.selectbox("Measure", list(measures.keys()), key="cube_measure")
+    breakdown = col2.selectbox("Break down by", list(breakdowns.keys()), key="cube_breakdown")
+    period = col3.selectbox("Period", list(PERIODS.keys()), index=2, key="cube_period")
+    cows = col4.multiselect("Cows", list(cube.cows), key="cube_cows")
+
+    sliced = cube.select(start=start_date, end=end_date, cows=cows or None, group=measures[measure])
+    if sliced.empty or sliced.total() == 0:
+        st.info("No values for this slice")
+        return
+
+    freq = PERIODS[period]
+    if breakdowns[breakdown] is None:
+        table = sliced.rollup(by=("date",), freq=freq).set_index("date")
+    else:
+        table = sliced.pivot(index=breakdowns[breakdown], columns="date", freq=freq)
+        table.columns = [str(c)[:10] for c in table.columns]
+    st.dataframe(table.style.format("{:,.1f}"), use_container_width=True)
+
+def cow_profit_chart(cows, start_date, end_date):
+    """Daily revenue and attributed costs for one cow, sliced from the cow x day cost frame."""
+    selected_cow = st.selectbox("Cow Revenue vs Costs", cows, key="profit_cow_select")
+    cow_day = get_cow_day_costs(start_date, end_date)
+    cow_daily = cow_day[cow_day["cow"] == selected_cow].sort_values("date")
+    if cow_daily.empty:
+        st.info(f"No milk or cost records for {selected_cow} in this period.")
+        return
+    fig = time_series_figure(cow_daily, "date", ["revenue", "total_cost"],
+                             names=["Revenue", "Attributed Cost"], colors=["green", "red"],
+                             title=f"{selected_cow}: Revenue vs Attributed Costs",
+                             xaxis_title="Date", yaxis_title="KES")
+    st.plotly_chart(fig, use_container_width=True)
+
+def milk_prices_editor():
+    """Show the milk price history and let the manager record a new price."""
+    with st.expander("💰 Milk Prices", expanded=False):
+        prices = get_milk_prices()
+        if prices.empty:
+            st.info("No milk prices recorded yet. Revenue uses the default price of KES 43/L.")
+        else:
+            st.dataframe(prices.rename(columns={"effective_date": "Effective From",
+                                                "price_per_litre": "Price (KES/L)"}), hide_index=True)
+
+        col1, col2 = st.columns(2)
+        with col1:
+            effective_date = st.date_input("Effective From", value=date.today(), key="milk_price_date")
+        with col2:
+            new_price = st.number_input("Price per Litre (KES)", min_value=0.0, max_value=1000.0, step=0.5,
+                                        value=price_on(date.today(), prices), key="milk_price_value")
+        if st.button("Save Milk Price", key="save_milk_price_btn"):
+            if new_price <= 0:
+                st.warning("Price must be > 0.")
+            elif add_document("milk_prices", {
+                "effective_date": effective_date.isoformat(),
+                "price_per_litre": float(new_price)
+            }):
+                st.success("Milk price saved.")
+                log_audit_event(st.session_state.get("username", "Manager"), "MILK_PRICE_SET",
+                                f"KES {new_price}/L from {effective_date}")
+                st.rerun()
+
+def generate_pdf_report(df_agg, profit_per_cow, start_date, end_date, granularity):
     """
-    Calculate monthly salaries paid on the 1st of each month
+    Offer the PDF download. The PDF renders in a background thread once asked for and is
+    cached per period and data version, so the page never waits on it.
     """
-    # Create a date range for the 1st of each month in the period
-    start_dt = pd.to_datetime(start_date)
-    end_dt = pd.to_datetime(end_date)
-    
-    # Generate all 1st of month dates in the range
-    monthly_dates = pd.date_range(
-        start=start_dt.replace(day=1),
-        end=end_dt.replace(day=1),
-        freq='MS'
-    )
-    
-    # Create a DataFrame to store salary costs
-    salary_costs = pd.DataFrame(index=monthly_dates, columns=["salary_cost"])
-    salary_costs.index.name = "date"
-    salary_costs["salary_cost"] = 0.0
-    
-    # For each month, add salaries for employees active on the 1st of that month
-    for month_start in monthly_dates:
-        total_monthly_salary = 0
-        
-        for _, emp in employees.iterrows():
-            emp_start = pd.to_datetime(emp["start_date"])
-            emp_end = pd.to_datetime(emp["end_date"]) if pd.notna(emp["end_date"]) else pd.Timestamp.max
-            
-            # Check if employee was active on the 1st of this month
-            if emp_start <= month_start <= emp_end:
-                total_monthly_salary += emp["salary"]
-        
-        salary_costs.loc[month_start, "salary_cost"] = total_monthly_salary
-    
-    return salary_costs
-
-def generate_pdf_report(df_agg, profit_per_cow, start_date, end_date):
     if not REPORTLAB_AVAILABLE:
-        st.error("ReportLab is not available. PDF generation disabled.")
+        st.info("Install 'reportlab' to enable PDF reports")
         return False
-    
-    try:
-        buffer = BytesIO()
-        c = canvas.Canvas(buffer, pagesize=A4)
-        width, height = A4
-        
-        c.setFont("Helvetica-Bold", 16)
-        c.drawString(2*cm, height-2*cm, f"Dairy Farm Management Report")
-        c.setFont("Helvetica", 12)
-        c.drawString(2*cm, height-2.5*cm, f"Period: {start_date} to {end_date}")
-        c.drawString(2*cm, height-3*cm, f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M')}")
-        
-        c.setFont("Helvetica-Bold", 12)
-        c.drawString(2*cm, height-4*cm, "Summary Metrics:")
-        c.setFont("Helvetica", 10)
-        
-        metrics_y = height-4.5*cm
-        metrics = [
-            f"Total Revenue: KES {format_with_commas(df_agg['revenue'].sum())}",
-            f"Total Costs: KES {format_with_commas(df_agg['total_cost'].sum())}",
-            f"Total Profit: KES {format_with_commas(df_agg['profit'].sum())}",
-            f"Feed Efficiency: {df_agg['revenue'].sum()/df_agg['feed_cost'].sum():.2f}" if df_agg['feed_cost'].sum() > 0 else "Feed Efficiency: N/A",
-            f"Total Salary Cost: KES {format_with_commas(df_agg['salary_cost'].sum())}"
-        ]
-        
-        for metric in metrics:
-            c.drawString(2*cm, metrics_y, metric)
-            metrics_y -= 0.5*cm
-        
-        if not profit_per_cow.empty:
-            c.showPage()
-            c.setFont("Helvetica-Bold", 14)
-            c.drawString(2*cm, height-2*cm, "Profit per Cow Analysis")
-            
-            headers = ["Cow", "Milk (L)", "Revenue", "Cost", "Profit"]
-            col_widths = [3*cm, 3*cm, 3*cm, 3*cm, 3*cm]
-            
-            c.setFont("Helvetica-Bold", 10)
-            y_pos = height-3*cm
-            for i, header in enumerate(headers):
-                c.drawString(2*cm + sum(col_widths[:i]), y_pos, header)
-            
-            c.setFont("Helvetica", 9)
-            y_pos -= 0.7*cm
-            for _, row in profit_per_cow.iterrows():
-                if y_pos < 2*cm:
-                    c.showPage()
-                    y_pos = height-2*cm
-                
-                values = [
-                    row["Cow"],
-                    f"{row['Milk Produced (L)']:,.1f}",
-                    f"KES {row['Revenue (KES)']:,.0f}",
-                    f"KES {row['Cost (KES)']:,.0f}",
-                    f"KES {row['Profit (KES)']:,.0f}"
-                ]
-                
-                for i, value in enumerate(values):
-                    c.drawString(2*cm + sum(col_widths[:i]), y_pos, value)
-                
-                y_pos -= 0.5*cm
-        
-        c.save()
-        buffer.seek(0)
-        
-        st.download_button(
-            label="⬇️ Download PDF Report",
-            data=buffer,
-            file_name=f"dairy_report_{start_date}_{end_date}.pdf",
-            mime="application/pdf"
-        )
-        
-        return True
-    
-    except Exception as e:
-        st.error(f"PDF generation error: {e}")
+
+    key = report_cache_key(start_date, end_date, granularity, table_tokens(*REPORT_COLLECTIONS))
+    pdf, error, rendering = report_pdf_status(key)
+    if pdf is None and not rendering:
+        if error is not None:
+            st.error(f"PDF generation error: {error}")
+        if not st.button("📄 Prepare PDF", key="pdf_prepare_btn"):
+            return False
+        request_report_pdf(key, df_agg, profit_per_cow, start_date, end_date)
+        rendering = True
+    if rendering:
+        st.fragment(run_every=PDF_POLL_SECONDS)(pdf_progress)(key)
         return False
+
+    st.download_button(
+        label="📄 Download PDF Report",
+        data=pdf,
+        file_name=f"dairy_report_{start_date}_{end_date}.pdf",
+        mime="application/pdf"
+    )
+    return True
+
+def pdf_progress(key):
+    """Polled while the PDF renders; reruns the page once it is done to offer the download."""
+    if report_pdf_status(key)[2]:
+        st.info("⏳ Preparing PDF report...")
+    else:
+        st.rerun()
@@ -2,17 +2,27 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from firebase_utils import get_collection, add_document, log_audit_event
+from firebase_utils import get_collection, write_batch, audit_event_write
 from datetime import date
 
-def record_staff_performance(staff_name, task):
-    add_document("staff_performance", {
+def staff_performance_write(staff_name, task):
+    """The performance entry alone, for callers that log their own audit event."""
+    return ("staff_performance", None, {
         "date": date.today().isoformat(),
         "staff_name": staff_name,
         "task": task,
         "completed": 1
-    })
-    log_audit_event(staff_name, "ACTION_COMPLETED", f"Task: {task}")
+    }, False)
+
+def staff_performance_writes(staff_name, task):
+    """The performance entry and its audit event as write_batch writes."""
+    return [
+        staff_performance_write(staff_name, task),
+        audit_event_write(staff_name, "ACTION_COMPLETED", f"Task: {task}"),
+    ]
+
+def record_staff_performance(staff_name, task):
+    write_batch(staff_performance_writes(staff_name, task))
 
 def get_staff_performance():
     perf_df = get_collection("staff_performance")
@@ -0,0 +1,6 @@
+# dairy_farm_app/tests/conftest.py
+import os
+import sys
+
+# The app imports its modules from the project root (utils.x, page_modules.x)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,44 @@
+# dairy_farm_app/tests/test_bulk_import.py
+import pandas as pd
+import pytest
+
+pytest.importorskip("streamlit")
+pytest.importorskip("firebase_admin")
+
+from utils import bulk_import
+from utils.data_loader import compact_frame
+
+class Herd:
+    by_name = {"Daisy": None, "Bella": None}
+
+@pytest.fixture
+def committed(monkeypatch):
+    """Records committed by import_file, with Firestore and the shared tables replaced."""
+    writes = []
+    stored = compact_frame(pd.DataFrame([{"id": "x1", "cow": "Bella", "date": "2025-06-01",
+                                          "time_of_milking": "Morning", "litres_sell": 11.0, "litres_calves": 0.0}]))
+    monkeypatch.setattr(bulk_import, "get_db", lambda: object())
+    monkeypatch.setattr(bulk_import, "get_document", lambda collection, doc_id: None)
+    monkeypatch.setattr(bulk_import, "set_document", lambda collection, doc_id, data: True)
+    monkeypatch.setattr(bulk_import, "commit_writes", lambda db, batch: writes.extend(batch))
+    monkeypatch.setattr(bulk_import, "log_audit_event", lambda *args: None)
+    monkeypatch.setattr(bulk_import, "rebuild_milk_counters", lambda: 0)
+    monkeypatch.setattr(bulk_import, "load_table", lambda collection: stored)
+    monkeypatch.setattr(bulk_import, "get_cow_registry", lambda: Herd())
+    return writes
+
+def test_unknown_cows_and_duplicate_milkings_are_rejected(committed):
+    data = (b"cow,date,time_of_milking,litres_sell\n"
+            b"Daisy,2025-06-01,Morning,10\n"      # line 2: valid
+            b"Ghost,2025-06-01,Morning,9\n"       # line 3: not in the herd
+            b"Daisy,2025-06-01,morning,10.5\n"    # line 4: repeats line 2, in the next chunk
+            b"Bella,2025-06-01,Morning,11\n"      # line 5: already stored
+            b"Bella,2025-06-01,Evening,12\n")     # line 6: valid
+    result = bulk_import.import_file(data, "milk.csv", "milk_production", "Manager", chunk_size=2, workers=1)
+
+    assert sorted(record["cow"] + " " + record["time_of_milking"] for _, _, record, _ in committed) == \
+        ["Bella Evening", "Daisy Morning"]
+    assert result["imported"] == 2
+    errors = result["errors"]
+    assert errors["row"].tolist() == [3, 4, 5]
+    assert errors["error"].tolist() == ["not a cow in the herd", "repeats an earlier record", "repeats an earlier record"]
@@ -0,0 +1,33 @@
+# dairy_farm_app/tests/test_yield_matrix.py
+from datetime import date, timedelta
+import pandas as pd
+from utils.yield_matrix import YieldMatrix, yield_drops
+
+START = date(2025, 6, 1)
+
+def milkings(days, drop_on=None):
+    """Morning milkings of two steady cows for days days; cow A yields a fifth on day drop_on."""
+    rows = []
+    for offset in range(days):
+        for cow, litres in (("A", 10.0), ("B", 12.0)):
+            if cow == "A" and offset == drop_on:
+                litres = 2.0
+            rows.append({"cow": cow, "date": (START + timedelta(days=offset)).isoformat(),
+                         "time_of_milking": "Morning", "litres_sell": litres + 0.1 * (offset % 3)})
+    return pd.DataFrame(rows)
+
+def test_drop_on_last_recorded_day_is_flagged():
+    matrix = YieldMatrix.from_records(milkings(15, drop_on=14))
+    drops = yield_drops(matrix, end=START + timedelta(days=14))
+    assert drops["cow"].tolist() == ["A"]
+    assert drops["date"].tolist() == [START + timedelta(days=14)]
+
+def test_end_well_past_the_records_gives_no_alerts():
+    matrix = YieldMatrix.from_records(milkings(15, drop_on=14))
+    assert yield_drops(matrix, end=START + timedelta(days=60)).empty
+
+def test_end_inside_the_grown_matrix_without_milkings_gives_no_alerts():
+    matrix = YieldMatrix.from_records(milkings(15, drop_on=14))
+    # Recording a milking grows the matrix by whole blocks of empty days
+    matrix.record("B", START + timedelta(days=15), "Morning", 12.0)
+    assert yield_drops(matrix, end=START + timedelta(days=25)).empty
@@ -0,0 +1,178 @@
+# dairy_farm_app/utils/bulk_import.py
+"""
+Bulk import of historical records from CSV or Excel files.
+
+The file is read in chunks, each chunk is typed against the collection schema in one
+vectorized pass and checked with the shared reference and duplicate rules (against the
+herd, the stored records and the file's earlier rows), and the valid rows are written as
+parallel WriteBatch commits. Every
+row gets a document id derived from the file and its row number, so re-running an
+import overwrites instead of duplicating. A checkpoint in import_jobs records the
+chunks already committed, and an interrupted import resumes after the last one.
+"""
+import hashlib
+import importlib.util
+import io
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import pandas as pd
+from firebase_utils import get_db, get_document, set_document, commit_writes, log_audit_event
+from utils.schemas import SCHEMAS, coerce_frame, missing_columns, normalize_columns, to_records
+from utils.validation import UNIQUE_KEYS, validate_frame
+from utils.data_loader import load_table
+from utils.cow_registry import get_cow_registry
+from utils.milk_counters import rebuild_milk_counters
+
+OPENPYXL_AVAILABLE = importlib.util.find_spec("openpyxl") is not None
+
+IMPORT_COLLECTIONS = list(SCHEMAS)
+JOBS_COLLECTION = "import_jobs"
+IMPORT_CHUNK_SIZE = 2000
+# Firestore accepts at most 500 writes per batch
+BATCH_SIZE = 500
+IMPORT_WORKERS = 4
+
+def import_formats():
+    return ["csv", "xlsx"] if OPENPYXL_AVAILABLE else ["csv"]
+
+def job_id(data, collection):
+    """Identifies an import of this exact file into this collection."""
+    return hashlib.sha256(collection.encode() + b"\0" + data).hexdigest()[:20]
+
+def _excel_chunks(data, chunk_size):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(io.BytesIO(data), read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        chunk, start = [], 2
+        for line, row in enumerate(rows, start=2):
+            chunk.append(row)
+            if len(chunk) == chunk_size:
+                yield pd.DataFrame(chunk, columns=header, index=range(start, line + 1), dtype=object)
+                chunk, start = [], line + 1
+        if chunk:
+            yield pd.DataFrame(chunk, columns=header, index=range(start, start + len(chunk)), dtype=object)
+    finally:
+        workbook.close()
+
+def read_chunks(data, file_name, chunk_size=IMPORT_CHUNK_SIZE):
+    """
+    Yield the file's rows as DataFrames of at most chunk_size rows, indexed by their line
+    in the file (the header is line 1) so errors can point at the spreadsheet row.
+    """
+    if file_name.lower().endswith((".xlsx", ".xlsm")):
+        if not OPENPYXL_AVAILABLE:
+            raise ValueError("Install 'openpyxl' to import Excel files")
+        yield from _excel_chunks(data, chunk_size)
+        return
+    for chunk in pd.read_csv(io.BytesIO(data), chunksize=chunk_size, dtype=str, skipinitialspace=True):
+        chunk.index = chunk.index + 2
+        yield chunk
+
+def check_header(data, file_name, collection):
+    """Required columns of the collection missing from the file's header."""
+    first = next(read_chunks(data, file_name, chunk_size=1), pd.DataFrame())
+    return missing_columns(normalize_columns(first).columns, collection)
+
+def key_tuples(df, key):
+    """The key fields of df's rows with a complete key, as a set of text tuples."""
+    complete = df[key].notna().all(axis=1)
+    return set(df.loc[complete, key].astype(str).itertuples(index=False, name=None))
+
+def stored_keys(collection, job):
+    """Keys of the stored records, leaving out this job's own documents (a re-run overwrites them)."""
+    key = UNIQUE_KEYS.get(collection)
+    stored = load_table(collection) if key else pd.DataFrame()
+    if stored.empty or not set(key) <= set(stored.columns):
+        return set()
+    if "id" in stored.columns:
+        stored = stored[~stored["id"].astype(str).str.startswith(f"{job}-")]
+    return key_tuples(stored, key)
+
+def rule_issues(valid, collection, herd, earlier):
+    """
+    Reference and duplicate problems of a typed chunk in the error report layout. earlier
+    is the set of keys of stored records and of the file's earlier rows.
+    """
+    key = UNIQUE_KEYS.get(collection)
+    checked = valid
+    if key:
+        # The earlier keys this chunk repeats, placed before it so validate_frame flags the chunk's rows
+        repeated = sorted(key_tuples(valid, key) & earlier)
+        if repeated:
+            checked = pd.concat([pd.DataFrame(repeated, columns=key, index=range(-len(repeated), 0)), valid])
+    issues = validate_frame(checked, collection, herd)
+    issues = issues[issues["rule"].isin(["reference", "duplicate"]) & issues["row"].isin(valid.index)]
+    return issues.rename(columns={"message": "error"})[["row", "field", "value", "error"]]
+
+def import_file(data, file_name, collection, username, chunk_size=IMPORT_CHUNK_SIZE, workers=IMPORT_WORKERS,
+                progress=None):
+    """
+    Import a CSV or Excel file into collection. progress(rows read, rows imported) is called
+    after each chunk. Returns a summary dict with the per-row error report as "errors".
+    Raises if a commit fails; the chunks committed before it are kept and a re-run resumes.
+    """
+    db = get_db()
+    if not db:
+        raise RuntimeError("Firebase not initialized")
+    job = job_id(data, collection)
+    checkpoint = get_document(JOBS_COLLECTION, job) or {}
+    if checkpoint.get("status") == "done":
+        return {"job": job, "status": "already imported", "rows": checkpoint.get("rows", 0),
+                "imported": checkpoint.get("imported", 0), "resumed": 0, "errors": pd.DataFrame()}
+    done_chunks = checkpoint.get("chunks_done", 0)
+    state = {"collection": collection, "file_name": file_name, "user": username, "status": "running",
+             "started": checkpoint.get("started", datetime.now().strftime("%Y-%m-%d %H:%M:%S")),
+             "chunks_done": done_chunks, "rows": 0, "imported": checkpoint.get("imported", 0)}
+    errors, resumed = [], 0
+    herd = get_cow_registry().by_name
+    earlier = stored_keys(collection, job)
+    key = UNIQUE_KEYS.get(collection)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for index, chunk in enumerate(read_chunks(data, file_name, chunk_size)):
+            valid, chunk_errors = coerce_frame(chunk, collection)
+            issues = rule_issues(valid, collection, herd, earlier)
+            valid = valid[~valid.index.isin(issues["row"])]
+            errors += [chunk_errors, issues]
+            if key:
+                earlier |= key_tuples(valid, key)
+            state["rows"] += len(chunk)
+            if index < done_chunks:
+                # Committed by an earlier run; only its error rows are needed for the report
+                resumed += len(valid)
+                continue
+
+            ids = [f"{job}-{row}" for row in valid.index]
+            writes = [(collection, doc_id, record, False) for doc_id, record in zip(ids, to_records(valid))]
+            batches = [writes[start:start + BATCH_SIZE] for start in range(0, len(writes), BATCH_SIZE)]
+            try:
+                # list() waits for every batch and re-raises the first failure
+                list(pool.map(lambda batch: commit_writes(db, batch), batches))
+            except Exception:
+                set_document(JOBS_COLLECTION, job, {**state, "status": "failed",
+                                                    "updated": datetime.now().strftime("%Y-%m-%d %H:%M:%S")})
+                raise
+            state["chunks_done"] = index + 1
+            state["imported"] += len(writes)
+            set_document(JOBS_COLLECTION, job, {**state, "updated": datetime.now().strftime("%Y-%m-%d %H:%M:%S")})
+            if progress is not None:
+                progress(state["rows"], state["imported"])
+
+    errors = [frame for frame in errors if not frame.empty]
+    errors = (pd.concat(errors, ignore_index=True).sort_values("row", kind="stable", ignore_index=True) if errors
+              else pd.DataFrame(columns=["row", "field", "value", "error"]))
+    state.update(status="done", errors=len(errors), updated=datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+    set_document(JOBS_COLLECTION, job, state)
+    # Imported milk bypasses the dashboard counters' increments
+    counters_stale = collection in ("milk_production", "milk_totals") and rebuild_milk_counters() is None
+    if counters_stale:
+        log_audit_event(username, "MILK_COUNTERS_STALE", f"Counters not rebuilt after importing {file_name}")
+    log_audit_event(username, "BULK_IMPORT", f"{file_name} -> {collection}: {state['imported']} rows imported, "
+                                              f"{errors['row'].nunique()} rows rejected")
+    return {"job": job, "status": "done", "rows": state["rows"], "imported": state["imported"],
+            "resumed": resumed, "errors": errors, "counters_stale": counters_stale}
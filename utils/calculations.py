@@ -1,12 +1,14 @@
 # dairy_farm_app/utils/calculations.py
+import numpy as np
 import pandas as pd
 from datetime import date, datetime
-from firebase_utils import get_collection
 from utils.data_loader import load_table, to_date
+from utils.pricing import price_milk
+from utils.cow_registry import get_cow_registry
 
 def get_feed_inventory():
-    received = get_collection("feeds_received")
-    used = get_collection("feeds_used")
+    received = load_table("feeds_received")
+    used = load_table("feeds_used")
     
     if received.empty and used.empty:
         return pd.DataFrame()
@@ -14,12 +16,12 @@ def get_feed_inventory():
     if received.empty:
         received_grouped = pd.DataFrame(columns=["feed_type", "quantity"])
     else:
-        received_grouped = received.groupby("feed_type")["quantity"].sum().reset_index()
+        received_grouped = received.groupby("feed_type", observed=True)["quantity"].sum().reset_index()
     
     if used.empty:
         used_grouped = pd.DataFrame(columns=["feed_type", "quantity"])
     else:
-        used_grouped = used.groupby("feed_type")["quantity"].sum().reset_index()
+        used_grouped = used.groupby("feed_type", observed=True)["quantity"].sum().reset_index()
     
     inventory = pd.merge(
         received_grouped, 
@@ -42,12 +44,10 @@ def get_available_feed_types():
     return available_feeds
 
 def get_all_cows():
-    cows_df = load_table("cows")
-    return cows_df["name"].tolist() if not cows_df.empty else []
+    return list(get_cow_registry().names)
 
 def get_cows_by_status(status):
-    cows_df = load_table("cows")
-    return cows_df[cows_df["status"] == status]["name"].tolist() if not cows_df.empty else []
+    return get_cow_registry().names_with_status(status)
 
 def calculate_feed_cost_used(start_date, end_date):
     """
@@ -59,7 +59,8 @@ def calculate_feed_cost_used(start_date, end_date):
         return pd.DataFrame()
     
     feeds_received = to_date(feeds_received, "date")
-    feeds_received = feeds_received.sort_values("date")  # Sort by date for FIFO
+    feeds_received = feeds_received.dropna(subset=["date"])
+    feeds_received = feeds_received.sort_values("date", kind="mergesort")  # Sort by date for FIFO
     
     # Load and filter feeds used
     feeds_used = load_table("feeds_used")
@@ -69,89 +70,60 @@ def calculate_feed_cost_used(start_date, end_date):
     feeds_used = to_date(feeds_used, "date")
     feeds_used = feeds_used[(feeds_used['date'] >= start_date) & (feeds_used['date'] <= end_date)]
     
-    # For each feed usage, calculate cost based on available inventory at time of use
+    # Each usage draws on the receipts of its feed type received on or before the usage
+    # date, oldest first. With cumulative receipt quantities and costs per feed type that
+    # is one searchsorted per usage instead of a walk over the receipts.
     feed_costs = []
     
-    for _, usage in feeds_used.iterrows():
-        usage_date = usage['date']
-        feed_type = usage['feed_type']
-        quantity_used = usage['quantity']
+    for feed_type, usage in feeds_used.groupby("feed_type", sort=False, observed=True):
+        lots = feeds_received[feeds_received["feed_type"] == feed_type]
+        if lots.empty:
+            continue
         
-        # Get all receipts of this feed type before the usage date
-        available_feed = feeds_received[
-            (feeds_received['feed_type'] == feed_type) & 
-            (feeds_received['date'] <= usage_date)
-        ].copy()
+        lot_dates = pd.to_datetime(lots["date"]).to_numpy()
+        lot_qty = pd.to_numeric(lots["quantity"], errors="coerce").to_numpy(dtype=float)
+        lot_cost = pd.to_numeric(lots["cost"], errors="coerce").to_numpy(dtype=float)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            lot_cost_per_kg = lot_cost / lot_qty
+        cum_qty = np.cumsum(lot_qty)
+        cum_cost = np.cumsum(lot_cost)
         
-        if available_feed.empty:
-            # No feed available before usage date - use latest cost
-            latest_feed = feeds_received[feeds_received['feed_type'] == feed_type]
-            if not latest_feed.empty:
-                latest_feed = latest_feed.sort_values('date').iloc[-1]
-                cost_per_kg = latest_feed['cost'] / latest_feed['quantity']
-                feed_cost = quantity_used * cost_per_kg
-                feed_costs.append({
-                    'date': usage_date,
-                    'feed_type': feed_type,
-                    'quantity': quantity_used,
-                    'cost': feed_cost,
-                    'method': 'latest_cost'
-                })
-            continue
+        quantity_used = pd.to_numeric(usage["quantity"], errors="coerce").to_numpy(dtype=float)
+        usage_dates = pd.to_datetime(usage["date"]).to_numpy()
         
-        # Calculate cost using FIFO method
-        remaining_quantity = quantity_used
-        total_cost = 0
+        # Number of receipts available at each usage date
+        n_available = np.searchsorted(lot_dates, usage_dates, side="right")
+        # First receipt that covers the remaining quantity
+        last_lot = np.searchsorted(cum_qty, quantity_used, side="left")
         
-        for _, receipt in available_feed.sort_values('date').iterrows():
-            if remaining_quantity <= 0:
-                break
-                
-            receipt_quantity_available = receipt['quantity']
-            receipt_cost_per_kg = receipt['cost'] / receipt['quantity']
-            
-            quantity_to_use = min(remaining_quantity, receipt_quantity_available)
-            cost_for_this_receipt = quantity_to_use * receipt_cost_per_kg
-            
-            total_cost += cost_for_this_receipt
-            remaining_quantity -= quantity_to_use
+        prev_qty = np.where(last_lot > 0, cum_qty[np.maximum(last_lot - 1, 0)], 0.0)
+        prev_cost = np.where(last_lot > 0, cum_cost[np.maximum(last_lot - 1, 0)], 0.0)
+        partial_cost = prev_cost + (quantity_used - prev_qty) * lot_cost_per_kg[np.minimum(last_lot, len(lots) - 1)]
+        # Usage larger than everything received so far only costs what was received
+        all_available_cost = cum_cost[np.maximum(n_available - 1, 0)]
+        fifo_cost = np.where(last_lot < n_available, partial_cost, all_available_cost)
+        
+        # No feed available before usage date - use latest cost
+        latest_cost = quantity_used * lot_cost_per_kg[-1]
         
-        feed_costs.append({
-            'date': usage_date,
+        feed_costs.append(pd.DataFrame({
+            'date': usage['date'].to_numpy(),
             'feed_type': feed_type,
-            'quantity': quantity_used,
-            'cost': total_cost,
-            'method': 'fifo'
-        })
+            'quantity': usage['quantity'].to_numpy(),
+            'cost': np.where(n_available > 0, fifo_cost, latest_cost),
+            'method': np.where(n_available > 0, 'fifo', 'latest_cost'),
+        }, index=usage.index))
     
     if not feed_costs:
         return pd.DataFrame()
     
-    return pd.DataFrame(feed_costs)
+    # Keep the order of the usage records
+    return pd.concat(feed_costs).sort_index(kind="mergesort").reset_index(drop=True)
 
 def calculate_profit_per_cow(start_date, end_date):
-    cows_df = load_table("cows")
-    milk_df = load_table("milk_production")
-    
-    if not milk_df.empty and 'date' in milk_df.columns:
-        milk_df = to_date(milk_df, "date")
-        milk_df = milk_df[(milk_df["date"] >= start_date) & (milk_df["date"] <= end_date)]
-    
-    # Calculate feed cost using the improved method
-    feeds_used_cost = calculate_feed_cost_used(start_date, end_date)
-    if not feeds_used_cost.empty and 'cost' in feeds_used_cost.columns:
-        total_feed_cost = feeds_used_cost['cost'].sum()
-    else:
-        total_feed_cost = 0
-    
-    health_df = load_table("health_records")
-    if not health_df.empty and 'date' in health_df.columns:
-        health_df = to_date(health_df, "date")
-        health_df = health_df[(health_df["date"] >= start_date) & (health_df["date"] <= end_date)]
-        total_health_cost = health_df["cost"].sum() if 'cost' in health_df.columns else 0
-    else:
-        total_health_cost = 0
+    from utils.cost_attribution import get_cow_day_costs
 
+    cows_df = load_table("cows")
     if not cows_df.empty and 'status' in cows_df.columns:
         lactating_cows = cows_df[cows_df["status"] == "Lactating"]
     else:
@@ -160,38 +132,128 @@ def calculate_profit_per_cow(start_date, end_date):
     if lactating_cows.empty:
         return pd.DataFrame()
     
-    if milk_df.empty:
+    # Costs attributed to each cow and day: allocated feed, shared feed, health and AI
+    cow_day = get_cow_day_costs(start_date, end_date)
+    if cow_day.empty or cow_day["litres_sell"].sum() <= 0:
         return pd.DataFrame()
     
-    # Use individual cow records (litres_sell) for profit per cow calculation
-    milk_per_cow = milk_df.groupby("cow")["litres_sell"].sum().reset_index()
-    milk_per_cow["revenue"] = milk_per_cow["litres_sell"] * 43
+    per_cow = cow_day.groupby("cow", observed=True)[["litres_sell", "revenue", "feed_cost", "shared_feed_cost",
+                                      "health_cost", "ai_cost", "total_cost"]].sum()
     
-    # Allocate costs based on milk production rather than equally
-    total_milk_produced = milk_per_cow["litres_sell"].sum()
+    result = pd.merge(lactating_cows[["name"]], per_cow, left_on="name", right_index=True, how="left")
+    result = result.fillna(0)
+    result["feed_cost"] = result["feed_cost"] + result["shared_feed_cost"]
+    result["profit"] = result["revenue"] - result["total_cost"]
     
-    if total_milk_produced > 0:
-        # Calculate cost per liter
-        cost_per_liter = (total_feed_cost + total_health_cost) / total_milk_produced
-        
-        result = pd.merge(lactating_cows[["name"]], milk_per_cow, 
-                         left_on="name", right_on="cow", how="left")
-        
-        result["litres_sell"] = result["litres_sell"].fillna(0)
-        result["revenue"] = result["revenue"].fillna(0)
-        
-        # Allocate costs based on milk production
-        result["feed_cost"] = result["litres_sell"] * cost_per_liter
-        result["profit"] = result["revenue"] - result["feed_cost"]
+    result = result.rename(columns={
+        "name": "Cow",
+        "litres_sell": "Milk Produced (L)",
+        "revenue": "Revenue (KES)",
+        "feed_cost": "Feed Cost (KES)",
+        "health_cost": "Health Cost (KES)",
+        "ai_cost": "AI Cost (KES)",
+        "total_cost": "Cost (KES)",
+        "profit": "Profit (KES)"
+    })
+    
+    return result[["Cow", "Milk Produced (L)", "Revenue (KES)", "Feed Cost (KES)", "Health Cost (KES)",
+                   "AI Cost (KES)", "Cost (KES)", "Profit (KES)"]].reset_index(drop=True)
+
+def calculate_monthly_salaries(employees, start_date, end_date):
+    """
+    Calculate monthly salaries paid on the 1st of each month
+    """
+    # Create a date range for the 1st of each month in the period
+    start_dt = pd.to_datetime(start_date)
+    end_dt = pd.to_datetime(end_date)
+    
+    # Generate all 1st of month dates in the range
+    monthly_dates = pd.date_range(
+        start=start_dt.replace(day=1),
+        end=end_dt.replace(day=1),
+        freq='MS'
+    )
+    
+    # Create a DataFrame to store salary costs
+    salary_costs = pd.DataFrame(index=monthly_dates, columns=["salary_cost"])
+    salary_costs.index.name = "date"
+    salary_costs["salary_cost"] = 0.0
+    
+    # For each month, add salaries for employees active on the 1st of that month
+    for month_start in monthly_dates:
+        total_monthly_salary = 0
         
-        result = result.rename(columns={
-            "name": "Cow",
-            "litres_sell": "Milk Produced (L)",
-            "revenue": "Revenue (KES)",
-            "feed_cost": "Cost (KES)",
-            "profit": "Profit (KES)"
-        })
+        for _, emp in employees.iterrows():
+            emp_start = pd.to_datetime(emp["start_date"])
+            emp_end = pd.to_datetime(emp["end_date"]) if pd.notna(emp["end_date"]) else pd.Timestamp.max
+            
+            # Check if employee was active on the 1st of this month
+            if emp_start <= month_start <= emp_end:
+                total_monthly_salary += emp["salary"]
         
-        return result[["Cow", "Milk Produced (L)", "Revenue (KES)", "Cost (KES)", "Profit (KES)"]]
+        salary_costs.loc[month_start, "salary_cost"] = total_monthly_salary
+    
+    return salary_costs
+
+def build_daily_report(start_date, end_date, milk_totals, milk, feed_cost_used, feeds_received, health, ai,
+                       salary_costs, milk_prices=None):
+    """
+    One row per day of the period with milk_l, revenue, feed_cost, feed_purchased_cost,
+    health_cost, ai_cost, salary_cost, total_cost and profit. Inputs are already filtered to the period.
+    """
+    milk_daily = pd.DataFrame()
+    
+    # Use milk_totals for profit calculation (as requested)
+    if not milk_totals.empty:
+        milk_daily = (milk_totals.groupby("date")["total_litres"].sum().to_frame("milk_l"))
+    elif not milk.empty:
+        # Fallback to individual records if totals not available
+        milk_daily = (milk.groupby("date")["litres_sell"].sum().to_frame("milk_l"))
+    if not milk_daily.empty:
+        milk_daily = price_milk(milk_daily.reset_index(), "date", "milk_l", milk_prices).set_index("date")[["milk_l", "revenue"]]
+
+    if not feed_cost_used.empty:
+        cost_daily = feed_cost_used.groupby("date")["cost"].sum().to_frame("feed_cost")
     else:
-        return pd.DataFrame()
+        cost_daily = pd.DataFrame(columns=["feed_cost"])
+
+    # Total feed purchased in KES (not kg)
+    if not feeds_received.empty:
+        feed_purchased_daily = feeds_received.groupby("date")["cost"].sum().to_frame("feed_purchased_cost")
+    else:
+        feed_purchased_daily = pd.DataFrame(columns=["feed_purchased_cost"])
+
+    health_costs = pd.DataFrame()
+    if not health.empty and 'cost' in health.columns:
+        health_costs = health.groupby("date")["cost"].sum().to_frame("health_cost")
+
+    ai_costs = pd.DataFrame()
+    if not ai.empty and 'cost' in ai.columns:
+        ai_costs = ai.groupby("ai_date")["cost"].sum().to_frame("ai_cost")
+
+    daily = pd.DataFrame(index=pd.date_range(start=start_date, end=end_date, freq="D"))
+    daily.index.name = "date"
+    for part in [milk_daily, cost_daily, feed_purchased_daily, health_costs, ai_costs, salary_costs]:
+        if not part.empty:
+            daily = daily.join(part, how="left")
+
+    pd.set_option('future.no_silent_downcasting', True)
+    numeric_cols = ['milk_l', 'revenue', 'feed_cost', 'feed_purchased_cost', 'health_cost', 'ai_cost', 'salary_cost', 'total_cost', 'profit']
+    for col in numeric_cols:
+        if col not in daily.columns:
+            daily[col] = 0.0
+        else:
+            daily[col] = pd.to_numeric(daily[col], errors='coerce')
+    daily = daily.infer_objects(copy=False).fillna(0.0).reset_index()
+    daily["total_cost"] = daily["feed_cost"] + daily["health_cost"] + daily["ai_cost"] + daily["salary_cost"]
+    daily["profit"] = daily["revenue"] - daily["total_cost"]
+    return daily
+
+def aggregate_report(daily, granularity):
+    """Resample the daily report to the report granularity ("Daily", "Weekly" or "Monthly")."""
+    rule = {"Weekly": "W", "Monthly": "ME"}.get(granularity)
+    if rule is None:
+        return daily
+    df = daily.copy()
+    df["date"] = pd.to_datetime(df["date"])
+    return df.set_index("date").resample(rule).sum().reset_index()
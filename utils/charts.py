@@ -0,0 +1,116 @@
+# dairy_farm_app/utils/charts.py
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+# Roughly the plot-area width in pixels of a full-width chart in the wide layout.
+# Drawing more points than pixels adds payload without adding detail.
+MAX_POINTS_PER_TRACE = 1200
+# Above this many points per trace the browser renders faster with WebGL than SVG.
+WEBGL_MIN_POINTS = 500
+
+def _as_float(values):
+    """Convert numeric, datetime or date values to a float array for downsampling."""
+    s = pd.Series(values)
+    if pd.api.types.is_numeric_dtype(s):
+        return s.to_numpy(dtype=float)
+    return pd.to_datetime(s, errors="coerce").to_numpy(dtype="datetime64[ns]").astype("int64").astype(float)
+
+def lttb_indices(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets: pick n_out indices that preserve the visual shape of the series.
+    """
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = _as_float(x)
+    y = np.nan_to_num(np.asarray(y, dtype=float))
+
+    # n_out - 2 buckets between the fixed first and last points
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    idx = np.empty(n_out, dtype=np.int64)
+    idx[0], idx[-1] = 0, n - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(area.argmax())
+        idx[i + 1] = a
+
+    return idx
+
+def minmax_indices(y, n_out):
+    """Keep the minimum and maximum of each bucket so spikes are never dropped."""
+    n = len(y)
+    if n_out >= n or n_out < 4:
+        return np.arange(n)
+
+    y = np.asarray(y, dtype=float)
+    # two points per bucket plus the fixed first and last points
+    n_buckets = (n_out - 2) // 2
+    bucket = (np.arange(n) * n_buckets) // n
+
+    order = np.lexsort((y, bucket))
+    starts = np.searchsorted(bucket[order], np.arange(n_buckets))
+    ends = np.r_[starts[1:], n] - 1
+    return np.unique(np.r_[0, order[starts], order[ends], n - 1])
+
+def downsample_frame(df, x, y_cols, max_points=MAX_POINTS_PER_TRACE, method="lttb"):
+    """
+    Reduce df to at most max_points rows per trace, keeping the rows that shape the chart.
+    """
+    if isinstance(y_cols, str):
+        y_cols = [y_cols]
+    if df.empty or len(df) <= max_points:
+        return df
+
+    df = df.sort_values(x)
+    budget = max(3, max_points // len(y_cols))
+    keep = []
+    for col in y_cols:
+        if method == "minmax":
+            keep.append(minmax_indices(df[col].to_numpy(), budget))
+        else:
+            keep.append(lttb_indices(df[x].to_numpy(), df[col].to_numpy(), budget))
+
+    return df.iloc[np.unique(np.concatenate(keep))]
+
+def trace_class(n_points):
+    """Use WebGL traces for large series."""
+    return go.Scattergl if n_points > WEBGL_MIN_POINTS else go.Scatter
+
+def time_series_figure(df, x, y_cols, names=None, colors=None, title=None, xaxis_title=None, yaxis_title=None,
+                       max_points=MAX_POINTS_PER_TRACE):
+    """Build a multi-trace line figure from a downsampled frame."""
+    if isinstance(y_cols, str):
+        y_cols = [y_cols]
+    names = names or y_cols
+    colors = colors or [None] * len(y_cols)
+
+    plot_df = downsample_frame(df, x, y_cols, max_points=max_points)
+    Trace = trace_class(len(plot_df))
+
+    fig = go.Figure()
+    for col, name, color in zip(y_cols, names, colors):
+        fig.add_trace(Trace(x=plot_df[x], y=plot_df[col], name=name, mode="lines",
+                            line=dict(color=color) if color else None))
+    fig.update_layout(title=title, xaxis_title=xaxis_title, yaxis_title=yaxis_title)
+    return fig
+
+def time_series_line(df, x, y, title=None, labels=None, max_points=MAX_POINTS_PER_TRACE):
+    """Downsampled drop-in for px.line on a single series."""
+    plot_df = downsample_frame(df, x, y, max_points=max_points)
+    render_mode = "webgl" if len(plot_df) > WEBGL_MIN_POINTS else "svg"
+    return px.line(plot_df, x=x, y=y, title=title, labels=labels, render_mode=render_mode)
+
+def time_series_area(df, x, y, title=None, labels=None, max_points=MAX_POINTS_PER_TRACE):
+    """Downsampled drop-in for px.area; min/max bucketing keeps every loss and profit spike."""
+    plot_df = downsample_frame(df, x, y, max_points=max_points, method="minmax")
+    return px.area(plot_df, x=x, y=y, title=title, labels=labels)
@@ -0,0 +1,164 @@
+# dairy_farm_app/utils/cost_attribution.py
+from functools import lru_cache
+import pandas as pd
+from utils.data_loader import load_table, to_date, table_tokens
+from utils.calculations import calculate_feed_cost_used
+from utils.pricing import price_milk
+
+COST_COLUMNS = ["feed_cost", "shared_feed_cost", "health_cost", "ai_cost"]
+ATTRIBUTION_COLLECTIONS = ("feeds_received", "feeds_used", "feed_allocations", "health_records",
+                           "ai_records", "milk_production", "milk_prices")
+
+def _in_period(df, col, start_date, end_date):
+    if df.empty or col not in df.columns:
+        return pd.DataFrame()
+    df = to_date(df, col)
+    return df[(df[col] >= start_date) & (df[col] <= end_date)]
+
+def _feed_unit_costs(feed_costs, feeds_received):
+    """FIFO cost per kg of each feed type on each day it was used, with the latest receipt price as a fallback."""
+    if not feed_costs.empty:
+        daily = feed_costs.groupby(["date", "feed_type"], as_index=False, observed=True)[["cost", "quantity"]].sum()
+        daily["cost_per_kg"] = daily["cost"] / daily["quantity"].where(daily["quantity"] > 0)
+        daily = daily[["date", "feed_type", "cost_per_kg"]]
+    else:
+        daily = pd.DataFrame(columns=["date", "feed_type", "cost_per_kg"])
+
+    if feeds_received.empty:
+        receipts = pd.DataFrame(columns=["date", "feed_type", "receipt_cost_per_kg"])
+    else:
+        receipts = to_date(feeds_received, "date").dropna(subset=["date"])
+        quantity = pd.to_numeric(receipts["quantity"], errors="coerce")
+        receipts = pd.DataFrame({
+            "date": pd.to_datetime(receipts["date"]),
+            "feed_type": receipts["feed_type"].astype(str),
+            "receipt_cost_per_kg": pd.to_numeric(receipts["cost"], errors="coerce") / quantity.where(quantity > 0),
+        }).sort_values("date")
+    return daily, receipts
+
+def _allocated_feed_costs(allocations, daily_unit_costs, receipts):
+    """Cost each cow's feed allocation at that day's FIFO price per kg."""
+    if allocations.empty:
+        return pd.DataFrame(columns=["cow", "date", "feed_cost"])
+
+    alloc = allocations[["cow", "date", "feed_type"]].copy()
+    alloc["feed_type"] = alloc["feed_type"].astype(str)
+    alloc["amount"] = pd.to_numeric(allocations["amount"], errors="coerce").fillna(0)
+    alloc = alloc.merge(daily_unit_costs, on=["date", "feed_type"], how="left")
+
+    # Allocations with no matching usage record are priced at the latest receipt before them
+    if not receipts.empty:
+        alloc["_dt"] = pd.to_datetime(alloc["date"])
+        alloc = alloc.sort_values("_dt")
+        alloc = pd.merge_asof(alloc, receipts.rename(columns={"date": "_dt"}), on="_dt", by="feed_type",
+                              direction="backward")
+        alloc["cost_per_kg"] = alloc["cost_per_kg"].fillna(alloc["receipt_cost_per_kg"])
+
+    alloc["feed_cost"] = alloc["amount"] * alloc["cost_per_kg"].fillna(0)
+    return alloc.groupby(["cow", "date"], as_index=False, observed=True)["feed_cost"].sum()
+
+def _tagged_costs(records, date_col, name):
+    """Sum a per-cow cost column (health or AI) by cow and day."""
+    if records.empty or "cost" not in records.columns or "cow_tag" not in records.columns:
+        return pd.DataFrame(columns=["cow", "date", name])
+    df = pd.DataFrame({
+        "cow": records["cow_tag"],
+        "date": records[date_col],
+        name: pd.to_numeric(records["cost"], errors="coerce").fillna(0),
+    })
+    return df.groupby(["cow", "date"], as_index=False, observed=True)[name].sum()
+
+def _spread_by_litres(shared, milk_cow_day):
+    """
+    Spread a per-day shared cost over the cows milked that day in proportion to litres.
+    Costs on days without milk records are spread by each cow's share of the period's litres.
+    """
+    if shared.empty or milk_cow_day.empty:
+        return pd.DataFrame(columns=["cow", "date", "shared_feed_cost"])
+
+    day_litres = milk_cow_day.groupby("date")["litres_sell"].transform("sum")
+    share = milk_cow_day[["cow", "date"]].assign(share=(milk_cow_day["litres_sell"] / day_litres.where(day_litres > 0)).fillna(0))
+    on_milk_days = share.merge(shared, on="date", how="inner")
+    on_milk_days["shared_feed_cost"] = on_milk_days["share"] * on_milk_days["shared"]
+
+    other_days = shared[~shared["date"].isin(share["date"])]
+    cow_litres = milk_cow_day.groupby("cow", observed=True)["litres_sell"].sum()
+    if not other_days.empty and cow_litres.sum() > 0:
+        cow_share = (cow_litres / cow_litres.sum()).rename("share").reset_index()
+        spread = other_days.merge(cow_share, how="cross")
+        spread["shared_feed_cost"] = spread["share"] * spread["shared"]
+        on_milk_days = pd.concat([on_milk_days, spread], ignore_index=True)
+
+    return on_milk_days[["cow", "date", "shared_feed_cost"]]
+
+def build_cow_day_costs(start_date, end_date):
+    """
+    Build the cow x day cost frame for the period with columns
+    cow, date, litres_sell, revenue, feed_cost, shared_feed_cost, health_cost, ai_cost, total_cost.
+
+    Feed allocations are costed at FIFO prices, health and AI costs go to the tagged cow,
+    and feed use not covered by allocations is shared out by litres.
+    """
+    feed_costs = calculate_feed_cost_used(start_date, end_date)
+    feeds_received = load_table("feeds_received")
+    allocations = _in_period(load_table("feed_allocations"), "date", start_date, end_date)
+    health = _in_period(load_table("health_records"), "date", start_date, end_date)
+    ai = _in_period(load_table("ai_records"), "ai_date", start_date, end_date)
+    milk = _in_period(load_table("milk_production"), "date", start_date, end_date)
+
+    if not milk.empty:
+        milk = milk.assign(litres_sell=pd.to_numeric(milk["litres_sell"], errors="coerce").fillna(0))
+        milk_cow_day = milk.groupby(["cow", "date"], as_index=False, observed=True)["litres_sell"].sum()
+        milk_cow_day = price_milk(milk_cow_day, "date", "litres_sell")[["cow", "date", "litres_sell", "revenue"]]
+    else:
+        milk_cow_day = pd.DataFrame(columns=["cow", "date", "litres_sell", "revenue"])
+
+    daily_unit_costs, receipts = _feed_unit_costs(feed_costs, feeds_received)
+    allocated = _allocated_feed_costs(allocations, daily_unit_costs, receipts)
+
+    # Feed used on a day that was not allocated to individual cows is a shared cost
+    if not feed_costs.empty:
+        used_daily = feed_costs.groupby("date")["cost"].sum()
+        allocated_daily = allocated.groupby("date")["feed_cost"].sum().reindex(used_daily.index, fill_value=0)
+        shared = (used_daily - allocated_daily).clip(lower=0).rename("shared").reset_index()
+        shared = shared[shared["shared"] > 0]
+    else:
+        shared = pd.DataFrame(columns=["date", "shared"])
+
+    parts = [
+        milk_cow_day,
+        allocated,
+        _spread_by_litres(shared, milk_cow_day),
+        _tagged_costs(health, "date", "health_cost"),
+        _tagged_costs(ai, "ai_date", "ai_cost"),
+    ]
+    parts = [p for p in parts if not p.empty]
+    if not parts:
+        return pd.DataFrame(columns=["cow", "date", "litres_sell", "revenue"] + COST_COLUMNS + ["total_cost"])
+
+    costs = pd.concat(parts, ignore_index=True)
+    costs = costs.groupby(["cow", "date"], as_index=False, observed=True).sum(min_count=1)
+    for col in ["litres_sell", "revenue"] + COST_COLUMNS:
+        if col not in costs.columns:
+            costs[col] = 0.0
+        costs[col] = pd.to_numeric(costs[col], errors="coerce").fillna(0.0)
+    costs["total_cost"] = costs[COST_COLUMNS].sum(axis=1)
+    return costs[["cow", "date", "litres_sell", "revenue"] + COST_COLUMNS + ["total_cost"]]
+
+@lru_cache(maxsize=8)
+def _cached_cow_day_costs(start_date, end_date, data_version):
+    return build_cow_day_costs(start_date, end_date)
+
+def get_cow_day_costs(start_date, end_date):
+    """
+    Cached cow x day cost frame, rebuilt only when one of its source tables is written or
+    reloaded. The frame is shared between callers; slice or group it, don't modify it.
+    """
+    return _cached_cow_day_costs(start_date, end_date, table_tokens(*ATTRIBUTION_COLLECTIONS))
+
+def cost_matrix(cow_day_costs, value="total_cost"):
+    """Pivot the cow x day frame into a matrix with one row per cow and one column per day."""
+    if cow_day_costs.empty:
+        return pd.DataFrame()
+    return cow_day_costs.pivot_table(index="cow", columns="date", values=value, aggfunc="sum",
+                                     fill_value=0.0, observed=True)
@@ -0,0 +1,80 @@
+# dairy_farm_app/utils/cow_registry.py
+import threading
+from utils.data_loader import load_table, table_token
+from utils.cow_search import CowSearch, filter_cows
+
+class CowRegistry:
+    """
+    The herd indexed by name, document id, status and yield category, so lookups are dict
+    accesses instead of filtering the cows frame. Built from the shared cows table and
+    shared by every session; treat it as read-only.
+    """
+
+    def __init__(self, cows):
+        self.names = []             # every cow name in collection order
+        self.by_name = {}           # name -> cow document (dict)
+        self.by_id = {}             # document id -> cow document
+        self.by_status = {}         # status -> [names]
+        self.by_yield_category = {} # yield category -> [names]
+        self._search = None
+        for cow in (cows.to_dict("records") if not cows.empty else []):
+            name = cow.get("name")
+            if not isinstance(name, str):
+                continue
+            self.names.append(name)
+            self.by_name[name] = cow
+            if isinstance(cow.get("id"), str):
+                self.by_id[cow["id"]] = cow
+            if isinstance(cow.get("status"), str):
+                self.by_status.setdefault(cow["status"], []).append(name)
+            if isinstance(cow.get("yield_category"), str):
+                self.by_yield_category.setdefault(cow["yield_category"], []).append(name)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.by_name
+
+    def get(self, name):
+        """The cow document for name, or None."""
+        return self.by_name.get(name)
+
+    def id_of(self, name):
+        cow = self.by_name.get(name)
+        return cow.get("id") if cow else None
+
+    @property
+    def search(self):
+        """Search index over the herd's names, built on first use."""
+        if self._search is None:
+            self._search = CowSearch(self.names)
+        return self._search
+
+    def names_with_status(self, status):
+        return list(self.by_status.get(status, []))
+
+    def names_in_yield_category(self, category):
+        return list(self.by_yield_category.get(category, []))
+
+_registry = None  # (table token, CowRegistry)
+_registry_lock = threading.Lock()
+
+def get_cow_registry():
+    """The shared registry, rebuilt when the cows table is written or reloaded."""
+    global _registry
+    cows = load_table("cows")  # refreshes the shared table if it is stale
+    token = table_token("cows")
+    with _registry_lock:
+        if token is not None and _registry is not None and _registry[0] == token:
+            return _registry[1]
+    registry = CowRegistry(cows)
+    # An uncached (empty or offline-source) table gives no token; such registries are not kept
+    if token is not None:
+        with _registry_lock:
+            _registry = (token, registry)
+    return registry
+
+def search_cows(search, cows):
+    """(cows matching search, fuzzy) using the shared herd's search index; see filter_cows."""
+    return filter_cows(search, cows, get_cow_registry().search)
@@ -0,0 +1,84 @@
+# dairy_farm_app/utils/cow_search.py
+"""
+Cow search: a prefix trie over names and ear-tag numbers, with a fuzzy fallback for
+typos. Build it once per herd (CowRegistry.search does) and query it on every keystroke.
+"""
+import difflib
+import re
+
+# Fuzzy matches must be at least this similar (difflib ratio) to the typed text
+FUZZY_CUTOFF = 0.7
+FUZZY_LIMIT = 10
+
+def search_keys(name):
+    """
+    The strings a cow can be found by: the whole name, each word and, for numbers, the
+    number without leading zeros, so "Cow 0042" is found by "cow 0", "004" and "42".
+    """
+    name = name.lower().strip()
+    keys = {name}
+    for token in re.split(r"[^0-9a-z]+", name):
+        if token:
+            keys.add(token)
+            if token.isdigit():
+                keys.add(token.lstrip("0") or "0")
+    return keys
+
+class CowSearch:
+    def __init__(self, names):
+        self.names = list(dict.fromkeys(names))  # unique, in herd order
+        self._keys = {}   # search key -> indices of the names it belongs to
+        self._trie = {}   # char -> child node; a node's "" entry holds the indices below it
+        for index, name in enumerate(self.names):
+            for key in search_keys(name):
+                self._keys.setdefault(key, set()).add(index)
+                node = self._trie
+                for char in key:
+                    node = node.setdefault(char, {"": set()})
+                    node[""].add(index)
+
+    def prefix_matches(self, query):
+        """Names with a key starting with query. Names that start with it come first, then herd order."""
+        query = query.lower().strip()
+        node = self._trie
+        for char in query:
+            node = node.get(char)
+            if node is None:
+                return []
+        matches = sorted(node.get("", range(len(self.names))))
+        return sorted((self.names[i] for i in matches), key=lambda name: not name.lower().startswith(query))
+
+    def fuzzy_matches(self, query, limit=FUZZY_LIMIT):
+        """Names with a key close to query, most similar first, for typos such as 0024 for 0042."""
+        query = query.lower().strip()
+        names = []
+        for key in difflib.get_close_matches(query, self._keys, n=limit, cutoff=FUZZY_CUTOFF):
+            for index in sorted(self._keys[key]):
+                if self.names[index] not in names:
+                    names.append(self.names[index])
+        return names[:limit]
+
+    def search(self, query):
+        """(names, fuzzy): prefix matches, or fuzzy matches when nothing starts with query."""
+        if not query.strip():
+            return list(self.names), False
+        matches = self.prefix_matches(query)
+        if matches:
+            return matches, False
+        return self.fuzzy_matches(query), True
+
+def filter_cows(search, cows, index):
+    """
+    (matching cows, fuzzy) for the cows in the list cows, using the shared index. Cows the
+    index does not know (e.g. names on old records) fall back to a substring match.
+    """
+    if not search or not search.strip():
+        return list(cows), False
+    matches, fuzzy = index.search(search)
+    allowed = set(cows)
+    known = set(index.names)
+    unknown = [name for name in cows if name not in known and search.lower() in str(name).lower()]
+    # A real substring match on an unknown name beats guesses
+    if fuzzy and unknown:
+        return unknown, False
+    return [name for name in matches if name in allowed] + unknown, fuzzy
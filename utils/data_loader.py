@@ -1,11 +1,138 @@
+import threading
+import time
+import numpy as np
 import pandas as pd
 from datetime import date
-from firebase_utils import get_collection
+
+try:
+    import pyarrow as pa
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+# Cached tables are shared by every session. Copy-on-write lets each caller get a shallow
+# copy it can modify freely without touching the shared frame (always on from pandas 3).
+if int(pd.__version__.split(".")[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)
+
+# Compact dtypes for the shared frames
+CATEGORY_COLUMNS = ["cow", "cow_tag", "feed_type", "time_of_milking", "status"]
+FLOAT32_COLUMNS = ["litres_sell", "litres_calves", "total_litres", "quantity", "amount"]
+DATE_COLUMNS = ["date", "ai_date"]
+# Tables are re-read after this long even without a write from this process, to pick up other writers
+TABLE_TTL_SECONDS = 300
+
+# Where load_table reads from. None means Firestore; benchmarks and offline tools
+# install a callable (collection name -> DataFrame) with set_table_source.
+_table_source = None
+
+# Per-collection write counters shared by every session in this process.
+# Caches include these in their keys so a write invalidates them.
+_collection_versions = {}
+_versions_lock = threading.Lock()
+
+_tables = {}  # collection -> (version, loaded at, compact frame)
+_tables_lock = threading.Lock()
+
+def set_table_source(source):
+    """Read tables from source(name) instead of Firestore. Pass None to restore Firestore."""
+    global _table_source
+    _table_source = source
+
+def compact_frame(df):
+    """Categoricals for repeated labels, float32 for litres and kg, and date32 for dates."""
+    if df.empty:
+        return df
+    converted = {}
+    for col in df.columns.intersection(CATEGORY_COLUMNS):
+        if not isinstance(df[col].dtype, pd.CategoricalDtype):
+            converted[col] = df[col].astype("category")
+    for col in df.columns.intersection(FLOAT32_COLUMNS):
+        converted[col] = pd.to_numeric(df[col], errors="coerce").astype("float32")
+    for col in df.columns.intersection(DATE_COLUMNS):
+        dates = pd.to_datetime(df[col], errors="coerce")
+        converted[col] = dates.astype(pd.ArrowDtype(pa.date32())) if PYARROW_AVAILABLE else dates.dt.normalize()
+    return df.assign(**converted)
 
 def load_table(table_name: str) -> pd.DataFrame:
-    return get_collection(table_name)
+    """
+    The collection as a compact frame shared by all sessions. Each call returns a shallow
+    copy, so callers can add or replace columns without affecting other sessions.
+    """
+    if _table_source is not None:
+        return _table_source(table_name)
+    from firebase_utils import get_collection, over_budget_fallback
+
+    version = get_collection_version(table_name)[0]
+    with _tables_lock:
+        entry = _tables.get(table_name)
+    if entry is not None:
+        cached_version, loaded_at, frame = entry
+        if cached_version == version and time.monotonic() - loaded_at < TABLE_TTL_SECONDS:
+            return frame.copy(deep=False)
+        stale = over_budget_fallback(table_name, frame)
+        if stale is not None:
+            return stale.copy(deep=False)
+
+    frame = compact_frame(get_collection(table_name, keep_last=False))
+    # Empty results are not cached: they are cheap to re-read and may be a failed read
+    if not frame.empty:
+        with _tables_lock:
+            _tables[table_name] = (version, time.monotonic(), frame)
+    return frame.copy(deep=False)
+
+def table_token(table_name):
+    """
+    (write version, load time) of the shared frame for table_name, or None when it is not
+    cached. It changes whenever the shared frame is replaced, by a write or a TTL reload,
+    so caches built from the frame can use it as their key.
+    """
+    with _tables_lock:
+        entry = _tables.get(table_name)
+    return (entry[0], entry[1]) if entry is not None else None
+
+def table_tokens(*table_names):
+    """
+    One cache key for results built from several shared tables: each table's write version
+    and table_token, read after load_table so a TTL reload is picked up first.
+    """
+    for table_name in table_names:
+        load_table(table_name)
+    return tuple((get_collection_version(table_name)[0], table_token(table_name)) for table_name in table_names)
+
+def cached_tables():
+    """(collection, version, age in seconds, frame) for every table in the shared cache."""
+    now = time.monotonic()
+    with _tables_lock:
+        return [(name, version, now - loaded_at, frame) for name, (version, loaded_at, frame) in _tables.items()]
+
+def bump_collection_version(collection_name):
+    with _versions_lock:
+        _collection_versions[collection_name] = _collection_versions.get(collection_name, 0) + 1
+
+def get_collection_version(*collection_names):
+    """Return the current write version of each collection as a hashable tuple."""
+    with _versions_lock:
+        return tuple(_collection_versions.get(name, 0) for name in collection_names)
+
+def _is_date32(values):
+    return PYARROW_AVAILABLE and isinstance(values.dtype, pd.ArrowDtype) and pa.types.is_date32(values.dtype.pyarrow_dtype)
+
+def _date_objects(values):
+    """datetime.date values (NaT where missing) straight from a date32 column, skipping Timestamps."""
+    dates = pa.array(values).to_pandas(date_as_object=True).to_numpy()
+    return pd.Series(np.where(pd.isna(dates), pd.NaT, dates), index=values.index, name=values.name)
+
+def to_datetime64(values):
+    """A date column as datetime64 values (NaT where missing). date32 columns are cast, not parsed."""
+    if _is_date32(values):
+        return values.astype(pd.ArrowDtype(pa.timestamp("s"))).astype("datetime64[s]")
+    return pd.to_datetime(values, errors="coerce")
 
 def to_date(df, col):
+    """Return df with col as datetime.date values. The input frame is left unchanged."""
     if col in df.columns:
-        df[col] = pd.to_datetime(df[col], errors="coerce").dt.date
+        values = df[col]
+        dates = _date_objects(values) if _is_date32(values) else pd.to_datetime(values, errors="coerce").dt.date
+        df = df.assign(**{col: dates})
     return df
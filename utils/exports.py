@@ -0,0 +1,148 @@
+# dairy_farm_app/utils/exports.py
+import importlib.util
+import os
+import tempfile
+import zipfile
+import pandas as pd
+from firebase_utils import stream_collection
+from utils.schemas import SCHEMAS
+
+# The writers import openpyxl and pyarrow.parquet when an export runs, not when the Reports page loads
+OPENPYXL_AVAILABLE = importlib.util.find_spec("openpyxl") is not None
+PYARROW_AVAILABLE = importlib.util.find_spec("pyarrow") is not None
+
+EXPORT_CHUNK_SIZE = 2000
+
+# Schema field type -> export dtype. Dates are stored as ISO strings and exported as such.
+EXPORT_DTYPES = {"number": "float64", "integer": "Int64", "text": "string", "date": "string", "choice": "string"}
+
+def export_columns(collection, leading, extra=None):
+    """
+    Column -> dtype for one export: the leading columns, the rest of the collection's schema
+    fields, then extra fields the pages write outside the schema, and the document id.
+    """
+    fields = {field: EXPORT_DTYPES[spec["type"]] for field, spec in SCHEMAS[collection].items()}
+    fields.update(extra or {})
+    columns = {column: fields.get(column, "string") for column in leading}
+    columns.update((field, dtype) for field, dtype in fields.items() if field not in columns)
+    columns["id"] = "string"
+    return columns
+
+# Export name -> (collection, date field, column -> dtype). Firestore documents are schemaless
+# and a chunk only has the fields its own documents have, so every chunk is cast to the full
+# declared column list; fields not declared here are not exported.
+EXPORT_TABLES = {
+    "Milk Production": ("milk_production", "date",
+                        export_columns("milk_production", ["date", "cow", "time_of_milking", "litres_sell", "litres_calves"])),
+    "Milk Totals": ("milk_totals", "date", export_columns("milk_totals", ["date", "total_litres"])),
+    "Feeds Received": ("feeds_received", "date", export_columns("feeds_received", ["date", "feed_type", "quantity", "cost"])),
+    "Feeds Used": ("feeds_used", "date", export_columns("feeds_used", ["date", "category", "feed_type", "quantity"],
+                                                       {"automated": "boolean"})),
+    "Health Records": ("health_records", "date",
+                       export_columns("health_records", ["date", "cow_tag", "disease", "medicine", "medicine_quantity",
+                                                         "medicine_price", "cost", "vaccinations", "observations"],
+                                      {"medicine_id": "string"})),
+    "AI Records": ("ai_records", "ai_date",
+                   export_columns("ai_records", ["ai_date", "cow_tag", "heat_date", "technician", "bull_id", "bull_breed",
+                                                 "semen_batch", "semen_quality", "expected_calving_date",
+                                                 "pregnancy_status", "calving_outcome", "cost"])),
+}
+
+EXPORT_FORMATS = {"CSV": ".csv", "Excel": ".xlsx", "Parquet": ".parquet"}
+
+def available_formats():
+    formats = ["CSV"]
+    if OPENPYXL_AVAILABLE:
+        formats.append("Excel")
+    if PYARROW_AVAILABLE:
+        formats.append("Parquet")
+    return formats
+
+_BOOLEANS = {True: True, False: False, "True": True, "False": False, "true": True, "false": False}
+
+def _cast(values, dtype):
+    """values as dtype, NaN where a value does not fit."""
+    if dtype == "string":
+        return values.astype("string")
+    if dtype == "boolean":
+        return values.map(_BOOLEANS, na_action="ignore").astype("boolean")
+    numbers = pd.to_numeric(values, errors="coerce")
+    return (numbers.round() if dtype == "Int64" else numbers).astype(dtype)
+
+def iter_export_chunks(table_name, start_date, end_date, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield the raw records of one export table for the period, cast to its declared columns and dtypes."""
+    collection, date_field, columns = EXPORT_TABLES[table_name]
+    for chunk in stream_collection(collection, chunk_size=chunk_size, order_field=date_field,
+                                   start=start_date.isoformat(), end=end_date.isoformat()):
+        chunk = chunk.reindex(columns=list(columns))
+        yield pd.DataFrame({column: _cast(chunk[column], dtype) for column, dtype in columns.items()})
+
+def _write_csv(chunks, path):
+    rows = 0
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        for i, chunk in enumerate(chunks):
+            chunk.to_csv(f, header=(i == 0), index=False)
+            rows += len(chunk)
+    return rows
+
+def _write_xlsx(chunks, path, sheet_name):
+    from openpyxl import Workbook
+
+    # write_only workbooks flush rows to disk instead of keeping cells in memory
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title=sheet_name[:31])
+    rows = 0
+    for i, chunk in enumerate(chunks):
+        if i == 0:
+            ws.append(list(chunk.columns))
+        values = chunk.astype(object).where(chunk.notna(), None)
+        for row in values.itertuples(index=False, name=None):
+            ws.append(row)
+        rows += len(chunk)
+    wb.save(path)
+    return rows
+
+def _write_parquet(chunks, path):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    rows = 0
+    try:
+        for chunk in chunks:
+            # Chunks are cast to the declared dtypes, so the first one's schema fits them all
+            if writer is None:
+                schema = pa.Schema.from_pandas(chunk, preserve_index=False)
+                writer = pq.ParquetWriter(path, schema)
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False, safe=False))
+            rows += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+def export_table(table_name, start_date, end_date, fmt, path):
+    """Stream one table to path in the given format. Returns the number of rows written."""
+    chunks = iter_export_chunks(table_name, start_date, end_date)
+    if fmt == "Excel":
+        return _write_xlsx(chunks, path, table_name)
+    if fmt == "Parquet":
+        return _write_parquet(chunks, path)
+    return _write_csv(chunks, path)
+
+def export_tables_zip(table_names, start_date, end_date, fmt, path):
+    """Export several tables into one zip, one file at a time. Returns rows written per table."""
+    counts = {}
+    ext = EXPORT_FORMATS[fmt]
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for table_name in table_names:
+            fd, tmp_path = tempfile.mkstemp(suffix=ext)
+            os.close(fd)
+            try:
+                counts[table_name] = export_table(table_name, start_date, end_date, fmt, tmp_path)
+                if counts[table_name]:
+                    arcname = f"{EXPORT_TABLES[table_name][0]}_{start_date}_{end_date}{ext}"
+                    zf.write(tmp_path, arcname=arcname)
+            finally:
+                os.remove(tmp_path)
+    return counts
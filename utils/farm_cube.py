@@ -0,0 +1,169 @@
+# dairy_farm_app/utils/farm_cube.py
+from datetime import date
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+from utils.data_loader import load_table, to_date, table_tokens
+from utils.cost_attribution import ATTRIBUTION_COLLECTIONS, build_cow_day_costs
+
+CUBE_COLLECTIONS = tuple(sorted(set(ATTRIBUTION_COLLECTIONS) | {"cows"}))
+# Category names are "<group>:<detail>", e.g. "milk:Morning" or "health:Mastitis"
+CATEGORY_GROUPS = ["milk", "feed", "health", "ai"]
+PERIODS = {"Daily": "D", "Weekly": "W", "Monthly": "M", "Quarterly": "Q"}
+
+class FarmCube:
+    """
+    Dense date x cow x category array of litres (milk group) and KES (cost groups).
+    Dates are contiguous days so a date maps to an index by subtraction.
+    """
+
+    def __init__(self, dates, cows, categories, values):
+        self.dates = dates            # np.datetime64[D] array, one entry per day
+        self.cows = cows              # np.ndarray of cow names
+        self.categories = categories  # np.ndarray of "<group>:<detail>"
+        self.values = values          # float32 array, shape (dates, cows, categories)
+
+    @property
+    def empty(self):
+        return self.values.size == 0
+
+    def _date_index(self, day, side):
+        offset = (np.datetime64(day, "D") - self.dates[0]).astype(int) if len(self.dates) else 0
+        return int(np.clip(offset + (1 if side == "end" else 0), 0, len(self.dates)))
+
+    def select(self, start=None, end=None, cows=None, categories=None, group=None):
+        """Sub-cube for a date range, cows and categories. Date ranges are views, not copies."""
+        lo = self._date_index(start, "start") if start is not None else 0
+        hi = self._date_index(end, "end") if end is not None else len(self.dates)
+        values = self.values[lo:hi]
+        cow_idx = np.arange(len(self.cows))
+        cat_idx = np.arange(len(self.categories))
+
+        if cows is not None:
+            cow_idx = np.flatnonzero(np.isin(self.cows, list(cows)))
+            values = values[:, cow_idx]
+        if categories is not None or group is not None:
+            mask = np.ones(len(self.categories), dtype=bool)
+            if categories is not None:
+                mask &= np.isin(self.categories, list(categories))
+            if group is not None:
+                mask &= np.array([c.startswith(f"{group}:") for c in self.categories], dtype=bool)
+            cat_idx = np.flatnonzero(mask)
+            values = values[:, :, cat_idx]
+
+        return FarmCube(self.dates[lo:hi], self.cows[cow_idx], self.categories[cat_idx], values)
+
+    def total(self):
+        return float(self.values.sum(dtype=np.float64))
+
+    def _period_starts(self, freq):
+        """Index of the first day of each period and the period's start date, in plain NumPy."""
+        days = self.dates.astype(np.int64)
+        if freq == "W":
+            # 1970-01-01 was a Thursday; shift so weeks start on Monday
+            codes = (days + 3) // 7
+            label_days = codes * 7 - 3
+        elif freq in ("M", "Q"):
+            months = self.dates.astype("datetime64[M]").astype(np.int64)
+            codes = months // 3 if freq == "Q" else months
+            label_days = (codes * 3 if freq == "Q" else codes).astype("datetime64[M]").astype("datetime64[D]").astype(np.int64)
+        else:
+            codes = label_days = days
+        starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+        return starts, label_days[starts].astype("datetime64[D]")
+
+    def aggregate(self, by=("date",), freq="D"):
+        """
+        Sum over every axis not in `by` ("date", "cow", "category"), with dates bucketed to
+        freq ("D", "W", "M" or "Q"). Returns the summed array (axes in date, cow, category
+        order) and the labels of each kept axis.
+        """
+        values = self.values
+        labels = {"cow": self.cows, "category": self.categories}
+        if "date" in by and len(self.dates):
+            starts, labels["date"] = self._period_starts(freq)
+            values = np.add.reduceat(values, starts, axis=0, dtype=np.float64)
+        else:
+            labels["date"] = self.dates[:0]
+            values = values.sum(axis=0, keepdims=True, dtype=np.float64)
+
+        axes = ["date", "cow", "category"]
+        drop = tuple(i for i, axis in enumerate(axes) if axis not in by)
+        values = values.sum(axis=drop) if drop else values
+        return values, {axis: labels[axis] for axis in axes if axis in by}
+
+    def rollup(self, by=("date",), freq="D"):
+        """aggregate() as a long DataFrame with one value column."""
+        by = list(by)
+        values, labels = self.aggregate(by, freq)
+        if not labels:
+            return pd.DataFrame({"value": [float(values)]})
+        index = pd.MultiIndex.from_product(list(labels.values()), names=list(labels.keys()))
+        frame = pd.DataFrame({"value": np.ravel(values)}, index=index).reset_index()
+        return frame[by + ["value"]]
+
+    def pivot(self, index="cow", columns="date", freq="M"):
+        """Two-axis rollup as a wide table."""
+        values, labels = self.aggregate((index, columns), freq)
+        axes = list(labels.keys())
+        if axes.index(index) > axes.index(columns):
+            values = values.T
+        return pd.DataFrame(values, index=pd.Index(labels[index], name=index),
+                            columns=pd.Index(labels[columns], name=columns))
+
+def build_farm_cube():
+    """Build the cube over the farm's full history from the cow x day costs and raw records."""
+    milk = to_date(load_table("milk_production"), "date")
+    health = to_date(load_table("health_records"), "date")
+
+    known_dates = [d for d in [milk["date"].min() if not milk.empty else None,
+                               health["date"].min() if not health.empty else None] if pd.notna(d)]
+    start = min(known_dates, default=date.today())
+    end = date.today()
+    costs = build_cow_day_costs(start, end)
+
+    parts = []
+    if not milk.empty:
+        parts.append(pd.DataFrame({
+            "date": milk["date"], "cow": milk["cow"],
+            "category": "milk:" + milk["time_of_milking"].astype(str),
+            "value": pd.to_numeric(milk["litres_sell"], errors="coerce"),
+        }))
+    if not costs.empty:
+        parts.append(pd.DataFrame({"date": costs["date"], "cow": costs["cow"], "category": "feed:all",
+                                   "value": costs["feed_cost"] + costs["shared_feed_cost"]}))
+        parts.append(pd.DataFrame({"date": costs["date"], "cow": costs["cow"], "category": "ai:all",
+                                   "value": costs["ai_cost"]}))
+    if not health.empty and "cost" in health.columns:
+        parts.append(pd.DataFrame({
+            "date": health["date"], "cow": health["cow_tag"],
+            "category": "health:" + health["disease"].fillna("Unknown").astype(str),
+            "value": pd.to_numeric(health["cost"], errors="coerce"),
+        }))
+
+    facts = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=["date", "cow", "category", "value"])
+    facts = facts.dropna(subset=["date", "cow", "value"])
+    facts = facts[facts["value"] != 0]
+    if facts.empty:
+        return FarmCube(np.array([], dtype="datetime64[D]"), np.array([], dtype=object),
+                        np.array([], dtype=object), np.zeros((0, 0, 0), dtype=np.float32))
+
+    day = pd.to_datetime(facts["date"]).to_numpy().astype("datetime64[D]")
+    first = min(day.min(), np.datetime64(start, "D"))
+    last = max(day.max(), np.datetime64(end, "D"))
+    dates = np.arange(first, last + 1, dtype="datetime64[D]")
+
+    cow_codes, cows = pd.factorize(facts["cow"].astype(str), sort=True)
+    cat_codes, categories = pd.factorize(facts["category"], sort=True)
+    values = np.zeros((len(dates), len(cows), len(categories)), dtype=np.float32)
+    np.add.at(values, ((day - first).astype(int), cow_codes, cat_codes), facts["value"].to_numpy(dtype=np.float32))
+
+    return FarmCube(dates, np.asarray(cows, dtype=object), np.asarray(categories, dtype=object), values)
+
+@lru_cache(maxsize=1)
+def _cached_farm_cube(data_version, today):
+    return build_farm_cube()
+
+def get_farm_cube():
+    """The process-wide cube, shared by every session and rebuilt when its source data changes."""
+    return _cached_farm_cube(table_tokens(*CUBE_COLLECTIONS), date.today())
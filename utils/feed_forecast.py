@@ -0,0 +1,253 @@
+# dairy_farm_app/utils/feed_forecast.py
+"""
+Feed stock forecasting: an exponentially weighted daily consumption rate per feed type,
+and from it the days of cover, projected stock-out date and reorder point of every feed
+at once.
+
+The shared state holds, per feed type, the kg received and used and the weighted rate
+folded through yesterday, plus today's usage. It is built once from feeds_received and
+feeds_used and then takes new receipts and usage as they are recorded (record_feed_*),
+so the dashboard never rescans the usage history. Other writers are picked up by
+re-reading only the last REFRESH_DAYS days, whose daily amounts are kept for that.
+"""
+import threading
+import time
+from datetime import date, timedelta
+import numpy as np
+import pandas as pd
+from firebase_utils import query_collection
+from utils.data_loader import load_table, get_collection_version, to_datetime64, TABLE_TTL_SECONDS
+
+# A day's usage counts half as much after this many days
+HALF_LIFE_DAYS = 7
+ALPHA = 1 - 0.5 ** (1 / HALF_LIFE_DAYS)
+# Days between ordering feed and receiving it, and extra days of stock kept against surprises
+LEAD_TIME_DAYS = 7
+SAFETY_DAYS = 3
+# Days of cover and stock-out dates further ahead than this are not projected
+HORIZON_DAYS = 365
+# Days re-read after the shared table lifetime to pick up records from other writers
+REFRESH_DAYS = 7
+
+FORECAST_COLUMNS = ["feed_type", "quantity_received", "quantity_used", "remaining", "daily_rate", "days_of_cover",
+                    "stockout_date", "reorder_point", "reorder"]
+
+class FeedRates:
+    """
+    Per feed type (arrays in feed_types order): received and used totals, first_use day,
+    rate (weighted daily usage folded through the day before day) and pending (usage on day).
+    recent_received and recent_used hold kg per (feed type, day) from the last REFRESH_DAYS
+    days on, later days included; usage recorded ahead of day joins the rate once day
+    reaches it.
+    """
+
+    def __init__(self, day):
+        self.day = day
+        self.feed_types = []
+        self.index = {}
+        self.received = np.zeros(0)
+        self.used = np.zeros(0)
+        self.rate = np.zeros(0)
+        self.pending = np.zeros(0)
+        self.first_use = []  # date of each feed's first usage, or None
+        self.recent_received = {}
+        self.recent_used = {}
+
+    @classmethod
+    def from_records(cls, received, used, day):
+        """Build from feeds_received and feeds_used frames in one vectorized pass, folded up to day."""
+        rates = cls(day)
+        for feed_type in pd.unique(pd.concat([received.get("feed_type", pd.Series(dtype=object)).astype(object),
+                                              used.get("feed_type", pd.Series(dtype=object)).astype(object)]).dropna()):
+            rates._ensure(feed_type)
+        if not received.empty:
+            totals = pd.to_numeric(received["quantity"], errors="coerce").groupby(received["feed_type"].astype(object)).sum()
+            rates.received[[rates.index[f] for f in totals.index]] = totals.to_numpy()
+            rates.recent_received = daily_amounts(received, rates.window_start())
+        if used.empty:
+            return rates
+        rates.recent_used = daily_amounts(used, rates.window_start())
+        days = to_datetime64(used["date"])
+        quantity = pd.to_numeric(used["quantity"], errors="coerce").fillna(0.0)
+        feed = used["feed_type"].astype(object)
+        totals = quantity.groupby(feed).sum()
+        rates.used[[rates.index[f] for f in totals.index]] = totals.to_numpy()
+        for f, first in days.groupby(feed).min().dropna().items():
+            rates.first_use[rates.index[f]] = first.date()
+
+        # Each earlier day's usage weighs ALPHA * (1 - ALPHA)^(days before yesterday); today's stays pending
+        ages = (pd.Timestamp(day) - days).dt.days
+        past = ages >= 1
+        weights = ALPHA * (1 - ALPHA) ** (ages[past] - 1)
+        folded = (quantity[past] * weights).groupby(feed[past]).sum()
+        rates.rate[[rates.index[f] for f in folded.index]] = folded.to_numpy()
+        today = (quantity[ages == 0]).groupby(feed[ages == 0]).sum()
+        rates.pending[[rates.index[f] for f in today.index]] = today.to_numpy()
+        return rates
+
+    def _ensure(self, feed_type):
+        if feed_type not in self.index:
+            self.index[feed_type] = len(self.feed_types)
+            self.feed_types.append(feed_type)
+            self.received, self.used, self.rate, self.pending = (np.append(values, 0.0) for values in
+                                                                 (self.received, self.used, self.rate, self.pending))
+            self.first_use.append(None)
+        return self.index[feed_type]
+
+    def window_start(self):
+        """First day of the recent days kept per day."""
+        return self.day - timedelta(days=REFRESH_DAYS - 1)
+
+    def advance(self, day):
+        """Fold the pending usage and any days without usage into the rates, up to day."""
+        gap = (day - self.day).days
+        if gap <= 0:
+            return
+        self.rate = ((1 - ALPHA) * self.rate + ALPHA * self.pending) * (1 - ALPHA) ** (gap - 1)
+        self.pending = np.zeros_like(self.pending)
+        previous, self.day = self.day, day
+        # Usage recorded for the days just reached
+        for (feed_type, used_on), quantity in self.recent_used.items():
+            if previous < used_on <= day:
+                self._fold(self.index[feed_type], used_on, quantity)
+        first = self.window_start()
+        for recent in (self.recent_received, self.recent_used):
+            for key in [key for key in recent if key[1] < first]:
+                del recent[key]
+
+    def _fold(self, i, day, quantity):
+        if day == self.day:
+            self.pending[i] += quantity
+        elif day < self.day:
+            # An earlier day: the weighting is linear, so its share of the rate can be added directly
+            self.rate[i] += ALPHA * (1 - ALPHA) ** ((self.day - day).days - 1) * quantity
+
+    def use(self, feed_type, day, quantity):
+        """Record quantity kg of feed_type used on day. A later day than day joins the rate when reached."""
+        i = self._ensure(feed_type)
+        self.used[i] += quantity
+        if self.first_use[i] is None or day < self.first_use[i]:
+            self.first_use[i] = day
+        if day >= self.window_start():
+            self.recent_used[(feed_type, day)] = self.recent_used.get((feed_type, day), 0.0) + quantity
+        self._fold(i, day, quantity)
+
+    def receive(self, feed_type, day, quantity):
+        """Record quantity kg of feed_type received on day."""
+        self.received[self._ensure(feed_type)] += quantity
+        if day >= self.window_start():
+            self.recent_received[(feed_type, day)] = self.recent_received.get((feed_type, day), 0.0) + quantity
+
+    def refresh(self, first, received=None, used=None):
+        """
+        Replace the receipts and usage from day first (within the recent days) on with
+        those of re-read feeds_received and feeds_used frames. A side passed as None
+        is kept as it is. Only the differences are applied, so the rates stay folded.
+        """
+        first = max(first, self.window_start())
+        for frame, recent, apply in ((received, self.recent_received, self.receive), (used, self.recent_used, self.use)):
+            if frame is None:
+                continue
+            fresh = daily_amounts(frame, first)
+            stored = {key: kg for key, kg in recent.items() if key[1] >= first}
+            for feed_type, day in set(fresh) | set(stored):
+                change = fresh.get((feed_type, day), 0.0) - stored.get((feed_type, day), 0.0)
+                if abs(change) > 1e-9:
+                    apply(feed_type, day, change)
+
+    def forecast(self):
+        """FORECAST_COLUMNS for every feed type, computed in one vectorized step."""
+        if not self.feed_types:
+            return pd.DataFrame(columns=FORECAST_COLUMNS)
+        # Weights of the days since each feed was first used sum to 1 - (1 - ALPHA)^days, so a
+        # feed used for only a few days is not read as used slowly
+        history = np.array([(self.day - first).days if first is not None else 0 for first in self.first_use])
+        coverage = 1 - (1 - ALPHA) ** history
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rate = np.where(coverage > 0, self.rate / coverage, np.nan)
+            # Usage recorded beyond the receipts leaves no stock rather than negative stock
+            remaining = np.clip(self.received - self.used, 0, None)
+            cover = np.where(rate > 0, remaining / rate, np.nan)
+        # No recent usage, no stock-out in sight
+        cover[cover > HORIZON_DAYS] = np.nan
+        stockout = [self.day + timedelta(days=int(days)) if np.isfinite(days) else None for days in cover]
+        reorder_point = rate * (LEAD_TIME_DAYS + SAFETY_DAYS)
+        return pd.DataFrame({
+            "feed_type": self.feed_types,
+            "quantity_received": self.received,
+            "quantity_used": self.used,
+            "remaining": remaining,
+            "daily_rate": rate,
+            "days_of_cover": cover,
+            "stockout_date": stockout,
+            "reorder_point": reorder_point,
+            "reorder": remaining <= np.nan_to_num(reorder_point),
+        }, columns=FORECAST_COLUMNS)
+
+def daily_amounts(records, first):
+    """kg per (feed type, day) of a feeds_received or feeds_used frame, for day first on."""
+    if records.empty:
+        return {}
+    days = to_datetime64(records["date"])
+    keep = (days >= pd.Timestamp(first)).to_numpy()
+    quantity = pd.to_numeric(records["quantity"], errors="coerce").fillna(0.0)[keep]
+    sums = quantity.groupby([records["feed_type"].astype(object)[keep], days[keep].dt.date]).sum()
+    return {key: float(kg) for key, kg in sums.items()}
+
+_rates = None  # (feeds_received and feeds_used versions it is current with, refreshed at, FeedRates)
+_rates_lock = threading.Lock()
+
+def feed_versions():
+    return get_collection_version("feeds_received", "feeds_used")
+
+def feed_forecast():
+    """
+    Forecast for every feed type from the shared rates. They are rebuilt from the records
+    when these changed other than through record_feed_*. After the shared table lifetime
+    only the last REFRESH_DAYS days are re-read, to pick up other writers.
+    """
+    global _rates
+    versions = feed_versions()
+    today = date.today()
+    with _rates_lock:
+        current = _rates
+        if current is not None and current[0] == versions and time.monotonic() - current[1] < TABLE_TTL_SECONDS:
+            current[2].advance(today)
+            return current[2].forecast()
+    if current is not None and current[0] == versions:
+        first = today - timedelta(days=REFRESH_DAYS - 1)
+        received, used = (query_collection(name, [("date", ">=", first.isoformat())])
+                          for name in ("feeds_received", "feeds_used"))
+        with _rates_lock:
+            # Rates that took a write meanwhile are kept as they are until the next refresh
+            if _rates is current:
+                current[2].advance(today)
+                # An empty result may be a failed read; that side is then kept as it is
+                current[2].refresh(first, None if received.empty else received, None if used.empty else used)
+                _rates = (versions, time.monotonic(), current[2])
+            _rates[2].advance(today)
+            return _rates[2].forecast()
+    rates = FeedRates.from_records(load_table("feeds_received"), load_table("feeds_used"), today)
+    with _rates_lock:
+        _rates = (versions, time.monotonic(), rates)
+        return rates.forecast()
+
+def _record(update, since_versions):
+    global _rates
+    with _rates_lock:
+        if _rates is None or _rates[0] != since_versions:
+            return
+        update(_rates[2])
+        _rates = (feed_versions(), _rates[1], _rates[2])
+
+def record_feed_use(feed_type, day, quantity, since_versions):
+    """
+    Add usage just written to feeds_used to the shared rates. since_versions is feed_versions()
+    read before the write: only rates current at those versions take it, otherwise the next
+    read rebuilds them.
+    """
+    _record(lambda rates: rates.use(feed_type, day, float(quantity)), since_versions)
+
+def record_feed_receipt(feed_type, day, quantity, since_versions):
+    """Add a receipt just written to feeds_received; see record_feed_use."""
+    _record(lambda rates: rates.receive(feed_type, day, float(quantity)), since_versions)
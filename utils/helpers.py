@@ -3,25 +3,71 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 import re
+import threading
+import time
 
-def show_table(df: pd.DataFrame, title: str, search_cols=None, page_size=15, key_prefix=""):
+# Search text per table: (key_prefix, search columns) -> (data version, lowercased row text).
+# Shared by every session, one entry per table, replaced when the table's data version changes.
+_search_indexes = {}
+_search_lock = threading.Lock()
+
+def _search_text(df, cols):
+    """One lowercased string per row: the search columns joined by a separator that a query can't match."""
+    text = None
+    for col in cols:
+        values = df[col]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            # Lowercase each category once, then expand by code
+            labels = values.cat.categories.astype(str).str.lower().to_numpy(dtype=object)
+            values = pd.Series(np.append(labels, "")[values.cat.codes.to_numpy()], index=df.index)
+        else:
+            values = values.astype(str).str.lower()
+        text = values if text is None else text + "\x1f" + values
+    return text.astype("string").reset_index(drop=True)
+
+def search_index(df, cols, key_prefix, data_version=None):
+    """
+    Lowercased search text for df's rows, built once per table and data version. The data
+    version must change whenever df's rows do, as table_token does on writes and TTL reloads;
+    without one the text is rebuilt on every call.
+    """
+    cols = tuple(col for col in cols if col in df.columns)
+    if data_version is None:
+        return _search_text(df, cols)
+    key = (key_prefix, cols)
+    with _search_lock:
+        cached = _search_indexes.get(key)
+    # The length check catches a frame that changed without a version bump
+    if cached is not None and cached[0] == data_version and len(cached[1]) == len(df):
+        return cached[1]
+    text = _search_text(df, cols)
+    with _search_lock:
+        _search_indexes[key] = (data_version, text)
+    return text
+
+def show_table(df: pd.DataFrame, title: str, search_cols=None, page_size=15, key_prefix="", data_version=None,
+               formatters=None):
+    """
+    Searchable, paginated table. Pass data_version (e.g. table_token(name)) to
+    reuse the search index between renders, and formatters (column -> function) to format
+    only the rows on screen.
+    """
     st.subheader(title)
     if df.empty:
         st.info("No records yet.")
         return
 
-    df_disp = df.copy()
-
-    q = st.text_input("Search", key=f"{key_prefix}_search").strip()
+    q = st.text_input("Search", key=f"{key_prefix}_search").strip().lower()
+    positions = None
     if q and search_cols:
-        mask = np.zeros(len(df_disp), dtype=bool)
-        for col in search_cols:
-            if col in df_disp.columns:
-                mask |= df_disp[col].astype(str).str.contains(q, case=False, na=False)
-        df_disp = df_disp[mask]
+        text = search_index(df, search_cols, key_prefix, data_version)
+        positions = np.flatnonzero(text.str.contains(q, regex=False).to_numpy(dtype=bool, na_value=False))
 
-    total = len(df_disp)
+    total = len(df) if positions is None else len(positions)
     pages = max(1, (total + page_size - 1) // page_size)
+    # A narrower search can leave the remembered page past the end
+    if st.session_state.get(f"{key_prefix}_page", 1) > pages:
+        st.session_state[f"{key_prefix}_page"] = 1
     col1, col2, col3 = st.columns([1,2,1])
     with col1:
         current_page = st.number_input("Page", min_value=1, max_value=pages, value=1, step=1, key=f"{key_prefix}_page")
@@ -29,7 +75,89 @@ def show_table(df: pd.DataFrame, title: str, search_cols=None, page_size=15, key
         st.write(f"Showing {page_size} per page — {total} rows total.")
     start = (current_page - 1) * page_size
     end = start + page_size
-    st.dataframe(df_disp.iloc[start:end])
+    page = df.iloc[start:end] if positions is None else df.iloc[positions[start:end]]
+    if formatters:
+        page = page.assign(**{col: page[col].map(fmt) for col, fmt in formatters.items() if col in page.columns})
+    st.dataframe(page)
+
+def _next_page(pager):
+    pager["cursors"].append(pager["pages"][len(pager["cursors"])][1])
+
+def _previous_page(pager):
+    pager["cursors"].pop()
+
+def show_firestore_table(collection_name, title, order_field="date", search_field=None, page_size=15, key_prefix="",
+                         columns=None, formatters=None, descending=True):
+    """
+    Paginated table read from Firestore one page at a time instead of loading the whole
+    collection. The total comes from a count aggregation, pages are fetched with query
+    cursors and kept in the session, so going back or rerunning costs no reads until
+    the collection is written, or the shared table lifetime passes to pick up other
+    writers. Search is a case-sensitive prefix match on search_field.
+    """
+    from firebase_utils import count_documents, read_page
+    from utils.data_loader import get_collection_version, TABLE_TTL_SECONDS
+    from utils.read_budget import exceeded_budget
+
+    st.subheader(title)
+    prefix = ""
+    if search_field:
+        prefix = st.text_input(f"Search {search_field.replace('_', ' ')} (starts with)", key=f"{key_prefix}_search").strip()
+
+    # Pager state: the start cursor of every page visited so far (None for page 1) and the pages read
+    pager = st.session_state.setdefault(f"{key_prefix}_pager", {})
+    query = (order_field, descending, search_field, prefix, get_collection_version(collection_name)[0])
+    if pager.get("query") != query:
+        pager.update(query=query, cursors=[None], pages={}, total=None, read_at=time.monotonic())
+    elif time.monotonic() - pager["read_at"] >= TABLE_TTL_SECONDS:
+        # Re-read the count and pages, staying on the current page
+        pager.update(pages={}, total=None, read_at=time.monotonic())
+
+    if pager["total"] is None:
+        if exceeded_budget():
+            st.warning("The Firestore read budget is used up; this table will load when it resets.")
+            return
+        pager["total"] = count_documents(collection_name, order_field, descending, search_field, prefix)
+    total = pager["total"]
+    if total == 0:
+        st.info("No matching records." if prefix else "No records yet.")
+        return
+
+    current_page = len(pager["cursors"])
+    if current_page not in pager["pages"]:
+        if exceeded_budget():
+            st.warning("The Firestore read budget is used up; this page will load when it resets.")
+            return
+        pager["pages"][current_page] = read_page(collection_name, page_size, pager["cursors"][-1], order_field,
+                                                 descending, search_field, prefix)
+    df, cursor = pager["pages"][current_page]
+    pages = max(1, (total + page_size - 1) // page_size)
+
+    col1, col2, col3 = st.columns([1,2,1])
+    with col1:
+        st.button("◀ Previous", key=f"{key_prefix}_prev", on_click=_previous_page, args=(pager,),
+                  disabled=current_page == 1)
+    with col2:
+        st.write(f"Page {current_page} of {pages} — {total} rows total.")
+    with col3:
+        st.button("Next ▶", key=f"{key_prefix}_next", on_click=_next_page, args=(pager,),
+                  disabled=current_page >= pages or cursor is None)
+
+    df = df.drop(columns=["id"], errors="ignore")
+    if columns:
+        df = df[[col for col in columns if col in df.columns]]
+    if formatters:
+        df = df.assign(**{col: df[col].map(fmt) for col, fmt in formatters.items() if col in df.columns})
+    st.dataframe(df)
+
+def number_format(pattern):
+    """show_table formatter: pattern.format(x) for numbers, other values unchanged."""
+    def format_value(x):
+        try:
+            return pattern.format(x)
+        except (TypeError, ValueError):
+            return x
+    return format_value
 
 def money(x):
     try:
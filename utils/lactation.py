@@ -0,0 +1,165 @@
+# dairy_farm_app/utils/lactation.py
+"""
+Lactation curves for the whole herd: Wood's curve y = a * t^b * exp(-c t), with t the
+days in milk, fitted for every cow in one batched least-squares solve on
+log y = log a + b log t - c t, then used to predict each cow's 305-day yield.
+
+A lactation starts at the cow's latest calving in ai_records (the expected calving date
+of a record with a calving outcome, as the actual date is not recorded) or, when the
+milk records show a longer dry gap after it, at the first milking after that gap.
+Fitted parameters are kept per cow and refitted only when her lactation gets new records.
+"""
+import threading
+from datetime import timedelta
+import numpy as np
+import pandas as pd
+from utils.data_loader import load_table, to_datetime64
+from utils.yield_matrix import get_yield_matrix
+
+LACTATION_DAYS = 305
+# Days without a milking that end a lactation
+DRY_GAP_DAYS = 45
+# Complete milking days needed before a cow's curve is fitted
+MIN_FIT_DAYS = 21
+# Cows predicted below this share of the herd's median 305-day yield are underperformers
+UNDERPERFORM_SHARE = 0.8
+
+LACTATION_COLUMNS = ["cow", "calving", "days_in_milk", "a", "b", "c", "peak_day", "peak_yield",
+                     "yield_to_date", "predicted_305", "underperformer"]
+
+def calving_dates(ai):
+    """Latest calving per cow ({name: numpy datetime64}) from an ai_records frame."""
+    if ai.empty or "calving_outcome" not in ai.columns or "expected_calving_date" not in ai.columns:
+        return {}
+    outcome = ai["calving_outcome"].astype(object)
+    calved = outcome.notna() & outcome.astype(str).str.strip().ne("") & outcome.astype(str).ne("None")
+    dates = to_datetime64(ai["expected_calving_date"])[calved]
+    latest = dates.groupby(ai["cow_tag"].astype(object)[calved]).max().dropna()
+    return {cow: day.to_datetime64() for cow, day in latest.items()}
+
+def lactation_starts(recorded, calvings):
+    """
+    Day index of each cow's current lactation start: the first milking after her last dry
+    gap, or her latest calving if that is later or the records begin too soon to show the
+    gap. recorded is a (cows, days) bool array and calvings a (cows,) float array of day
+    indices (negative before the first day), NaN where unknown. Cows without milkings get -1
+    and start is then meaningless; check recorded.any(axis=1).
+    """
+    counts = np.concatenate([np.zeros((recorded.shape[0], 1), dtype=int), np.cumsum(recorded, axis=1)], axis=1)
+    days = np.arange(recorded.shape[1])
+    before = counts[:, days] - counts[:, np.maximum(days - DRY_GAP_DAYS, 0)]
+    # A milking with none in the DRY_GAP_DAYS before it starts a run; every cow's first milking does
+    run_starts = recorded & (before == 0)
+    last_run = np.where(run_starts.any(axis=1), recorded.shape[1] - 1 - np.argmax(run_starts[:, ::-1], axis=1), -1)
+    use_calving = ~np.isnan(calvings) & ((calvings > last_run) | (last_run < DRY_GAP_DAYS))
+    return np.where(use_calving, np.nan_to_num(calvings), last_run).astype(int)
+
+def fit_wood(days_in_milk, litres, valid):
+    """
+    Wood's a, b and c for each row at once from (cows, days) arrays: one 3 x 3 normal
+    equation per cow over log yields, solved as a batch. Rows with fewer than
+    MIN_FIT_DAYS valid days get NaN.
+    """
+    t = np.where(valid, days_in_milk, 1).astype("float64")
+    X = np.stack([np.ones_like(t), np.log(t), -t], axis=-1) * valid[..., None]
+    y = np.where(valid, np.log(np.where(valid, litres, 1.0)), 0.0)
+    XtX = np.einsum("cdi,cdj->cij", X, X)
+    Xty = np.einsum("cdi,cd->ci", X, y)
+    enough = valid.sum(axis=1) >= MIN_FIT_DAYS
+    # Rows without enough data get an identity system so the batch stays solvable
+    XtX[~enough] = np.eye(3)
+    coef = np.linalg.solve(XtX, Xty[..., None])[..., 0]
+    coef[~enough] = np.nan
+    return np.exp(coef[:, 0]), coef[:, 1], coef[:, 2]
+
+def wood_curve(a, b, c, t):
+    """Daily yield of each cow's curve at days in milk t: (cows,) parameters, (days,) t -> (cows, days)."""
+    return a[:, None] * t[None, :] ** b[:, None] * np.exp(-c[:, None] * t[None, :])
+
+_fits = {}  # cow -> (lactation signature, (a, b, c))
+_fits_lock = threading.Lock()
+
+def lactation_table(end=None):
+    """
+    One row per cow with a lactation in the milk records: calving (lactation start),
+    days_in_milk, Wood's a, b, c, peak_day, peak_yield, yield_to_date, predicted_305
+    (recorded days plus the curve for the rest) and underperformer.
+    """
+    matrix = get_yield_matrix()
+    if not matrix.cows or matrix.start is None:
+        return pd.DataFrame(columns=LACTATION_COLUMNS)
+    last = matrix.last_recorded if end is None else min((end - matrix.start).days, matrix.days - 1)
+    if last < 0:
+        return pd.DataFrame(columns=LACTATION_COLUMNS)
+    litres = matrix.litres[:, :last + 1]
+    sessions = (~np.isnan(litres)).sum(axis=2)
+    daily = np.nansum(litres, axis=2, dtype="float64")
+    # Days with fewer milkings than the cow usually has would read as low yields
+    complete = (sessions > 0) & (sessions == sessions.max(axis=1, keepdims=True))
+
+    start = np.datetime64(matrix.start, "D")
+    known = calving_dates(load_table("ai_records"))
+    calvings = np.array([(known[cow].astype("datetime64[D]") - start).astype(int) if cow in known else np.nan
+                         for cow in matrix.cows], dtype="float64")
+    milked = (sessions > 0).any(axis=1)
+    starts = lactation_starts(sessions > 0, np.where(calvings <= last, calvings, np.nan))
+    days_in_milk = np.arange(last + 1)[None, :] - starts[:, None] + 1
+    in_lactation = milked[:, None] & (days_in_milk >= 1) & (days_in_milk <= LACTATION_DAYS)
+    valid = in_lactation & complete & (daily > 0)
+
+    # Refit only cows whose lactation start or records changed since their last fit
+    signatures = list(zip(starts.tolist(), valid.sum(axis=1).tolist(), np.round((daily * valid).sum(axis=1), 3).tolist()))
+    params = np.full((len(matrix.cows), 3), np.nan)
+    with _fits_lock:
+        stale = []
+        for i, (cow, signature) in enumerate(zip(matrix.cows, signatures)):
+            cached = _fits.get(cow)
+            if cached is not None and cached[0] == signature:
+                params[i] = cached[1]
+            else:
+                stale.append(i)
+    if stale:
+        a, b, c = fit_wood(days_in_milk[stale], daily[stale], valid[stale])
+        params[stale] = np.column_stack([a, b, c])
+        with _fits_lock:
+            for i in stale:
+                _fits[matrix.cows[i]] = (signatures[i], tuple(params[i]))
+
+    a, b, c = params[:, 0], params[:, 1], params[:, 2]
+    t = np.arange(1, LACTATION_DAYS + 1, dtype="float64")
+    curve = wood_curve(a, b, c, t)
+    # Recorded daily yields where there are any, the curve for the rest of the 305 days
+    observed = np.full_like(curve, np.nan)
+    rows, columns = np.nonzero(valid)
+    observed[rows, days_in_milk[rows, columns] - 1] = daily[rows, columns]
+    predicted = np.where(np.isnan(observed), curve, observed).sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        peak_day = np.where(c > 0, b / c, np.nan)
+        peak_yield = np.where(peak_day > 0, a * peak_day ** b * np.exp(-c * peak_day), np.nan)
+
+    fitted = ~np.isnan(a)
+    result = pd.DataFrame({
+        "cow": matrix.cows,
+        "calving": [matrix.start + timedelta(days=int(s)) if m else None for s, m in zip(starts, milked)],
+        "days_in_milk": np.where(milked, last - starts + 1, 0),
+        "a": a, "b": b, "c": c,
+        "peak_day": peak_day, "peak_yield": peak_yield,
+        "yield_to_date": (daily * in_lactation).sum(axis=1),
+        "predicted_305": np.where(fitted, predicted, np.nan),
+    })
+    median = np.nanmedian(result["predicted_305"]) if fitted.any() else np.nan
+    result["underperformer"] = fitted & (result["predicted_305"] < UNDERPERFORM_SHARE * median)
+    # Cows dried off or sold long ago have no current lactation
+    current = milked & (last - starts < LACTATION_DAYS + DRY_GAP_DAYS)
+    return result[current].reset_index(drop=True)[LACTATION_COLUMNS]
+
+def with_lactation(profit_per_cow):
+    """The profit-per-cow table with Days in Milk, Predicted 305-Day Yield (L) and Underperformer columns."""
+    lactation = lactation_table().set_index("cow")
+    lactation = lactation[["days_in_milk", "predicted_305", "underperformer"]].rename(columns={
+        "days_in_milk": "Days in Milk",
+        "predicted_305": "Predicted 305-Day Yield (L)",
+        "underperformer": "Underperformer",
+    })
+    result = profit_per_cow.merge(lactation, left_on="Cow", right_index=True, how="left")
+    return result.assign(Underperformer=result["Underperformer"].fillna(False).astype(bool))
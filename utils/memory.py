@@ -0,0 +1,117 @@
+# dairy_farm_app/utils/memory.py
+"""
+Memory report: the shared table cache, what each session keeps in its session state,
+and, while tracing is switched on, the largest Python allocations by source line.
+"""
+import sys
+import threading
+import time
+import tracemalloc
+import pandas as pd
+from utils.data_loader import cached_tables
+
+# resource is Unix-only; without it the process memory is not reported
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Sessions that have not rerun for this long are dropped from the report
+SESSION_EXPIRY_SECONDS = 3600
+
+_lock = threading.Lock()
+_sessions = {}  # session id -> latest measurement
+
+def frame_bytes(df):
+    return int(df.memory_usage(deep=True).sum())
+
+def _value_bytes(value):
+    if isinstance(value, pd.DataFrame):
+        return frame_bytes(value)
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, (bytes, bytearray, str)):
+        return sys.getsizeof(value)
+    return 0
+
+def table_cache_report():
+    """One row per table in the shared cache with its rows, deep size and dtype mix."""
+    rows = []
+    for name, version, age, frame in cached_tables():
+        usage = frame.memory_usage(deep=True, index=True)
+        dtypes = frame.dtypes.astype(str).value_counts()
+        rows.append({
+            "table": name,
+            "rows": len(frame),
+            "size (MiB)": usage.sum() / 2**20,
+            "largest column": usage.drop("Index").idxmax() if len(usage) > 1 else "",
+            "dtypes": ", ".join(f"{count} {dtype}" for dtype, count in dtypes.items()),
+            "age (s)": round(age),
+            "version": version,
+        })
+    if not rows:
+        return pd.DataFrame()
+    return pd.DataFrame(rows).sort_values("size (MiB)", ascending=False).reset_index(drop=True)
+
+def record_session_memory(session_id, user, page, state):
+    """Measure the frames and file buffers a session keeps in its session state."""
+    sizes = {key: _value_bytes(value) for key, value in state.items()}
+    sizes = {key: size for key, size in sizes.items() if size}
+    now = time.time()
+    with _lock:
+        _sessions[session_id] = {"user": user, "page": page, "bytes": sum(sizes.values()),
+                                 "largest key": max(sizes, key=sizes.get) if sizes else "", "seen": now}
+        for sid in [sid for sid, s in _sessions.items() if now - s["seen"] > SESSION_EXPIRY_SECONDS]:
+            del _sessions[sid]
+
+def session_report():
+    """One row per recently active session with the size of its session state."""
+    now = time.time()
+    with _lock:
+        rows = [{"session": sid[:8], "user": s["user"], "page": s["page"], "size (MiB)": s["bytes"] / 2**20,
+                 "largest key": s["largest key"], "idle (s)": round(now - s["seen"])}
+                for sid, s in _sessions.items()]
+    if not rows:
+        return pd.DataFrame()
+    return pd.DataFrame(rows).sort_values("size (MiB)", ascending=False).reset_index(drop=True)
+
+def peak_rss_mib():
+    """Peak resident memory of the server process, or None where it cannot be read (Windows)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+
+def start_tracing(frames=1):
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+
+def stop_tracing():
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+def is_tracing():
+    return tracemalloc.is_tracing()
+
+def top_allocations(limit=15):
+    """Largest live allocations by source line since tracing started."""
+    if not tracemalloc.is_tracing():
+        return pd.DataFrame()
+    snapshot = tracemalloc.take_snapshot().filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    ])
+    stats = snapshot.statistics("lineno")[:limit]
+    return pd.DataFrame([{
+        "location": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+        "size (MiB)": stat.size / 2**20,
+        "blocks": stat.count,
+    } for stat in stats])
+
+def traced_memory_mib():
+    """Current and peak traced memory in MiB, or None when tracing is off."""
+    if not tracemalloc.is_tracing():
+        return None
+    current, peak = tracemalloc.get_traced_memory()
+    return current / 2**20, peak / 2**20
@@ -0,0 +1,114 @@
+# dairy_farm_app/utils/milk_counters.py
+"""
+Running milk totals kept in small counter documents, so the dashboards read three
+documents instead of every milk record ever written.
+
+    milk_counters/day_2025-06-30    morning, lunch, evening (litres for sale), total_litres
+    milk_counters/week_2025-06-30   total_litres for the week starting that Monday
+    milk_counters/month_2025-06     total_litres for the month
+
+Writers add the counter updates to the same batch as the record, so both land or
+neither does. rebuild_milk_counters recomputes everything from the records.
+"""
+from datetime import timedelta
+import pandas as pd
+from firebase_utils import get_collection, get_documents, increment, write_batch
+from utils.data_loader import to_date
+from utils.read_budget import exceeded_budget
+
+COUNTERS_COLLECTION = "milk_counters"
+# time_of_milking -> counter field
+SESSION_FIELDS = {"Morning": "morning", "Lunch": "lunch", "Evening": "evening"}
+# Firestore accepts at most 500 writes per batch
+BATCH_SIZE = 500
+
+def week_start(day):
+    return day - timedelta(days=day.weekday())
+
+def counter_ids(day):
+    """The day, week and month counter document ids for a date."""
+    return f"day_{day.isoformat()}", f"week_{week_start(day).isoformat()}", f"month_{day:%Y-%m}"
+
+def milking_counter_writes(day, litres_by_session):
+    """
+    Counter writes for individual milkings on one day: litres_by_session maps
+    time_of_milking to the change in litres for sale (negative for deletes and edits).
+    """
+    increments = {SESSION_FIELDS[session]: increment(float(litres))
+                  for session, litres in litres_by_session.items() if session in SESSION_FIELDS and litres}
+    if not increments:
+        return []
+    return [(COUNTERS_COLLECTION, counter_ids(day)[0], {"date": day.isoformat(), **increments}, True)]
+
+def total_counter_writes(day, total_litres):
+    """Counter writes for a daily total: the day, its week and its month."""
+    day_id, week_id, month_id = counter_ids(day)
+    litres = increment(float(total_litres))
+    return [
+        (COUNTERS_COLLECTION, day_id, {"date": day.isoformat(), "total_litres": litres}, True),
+        (COUNTERS_COLLECTION, week_id, {"start": week_start(day).isoformat(), "total_litres": litres}, True),
+        (COUNTERS_COLLECTION, month_id, {"start": day.replace(day=1).isoformat(), "total_litres": litres}, True),
+    ]
+
+def read_milk_counters(day, periods=True):
+    """
+    Litres for sale per session on day and the day's total, plus the week and month totals
+    when periods is True. Missing counters read as zero.
+    """
+    day_id, week_id, month_id = counter_ids(day)
+    docs = get_documents(COUNTERS_COLLECTION, [day_id, week_id, month_id] if periods else [day_id])
+    today = docs.get(day_id, {})
+    counters = {field: float(today.get(field, 0.0)) for field in SESSION_FIELDS.values()}
+    counters["day_total"] = float(today.get("total_litres", 0.0))
+    if periods:
+        counters["week_total"] = float(docs.get(week_id, {}).get("total_litres", 0.0))
+        counters["month_total"] = float(docs.get(month_id, {}).get("total_litres", 0.0))
+    return counters
+
+def build_milk_counters(milk, totals):
+    """Counter documents ({id: data}) computed from milk_production and milk_totals frames."""
+    counters = {}
+    if not milk.empty:
+        milk = to_date(milk, "date").dropna(subset=["date"])
+        sold = pd.to_numeric(milk["litres_sell"], errors="coerce").astype("float64").fillna(0.0)
+        by_session = sold.groupby([milk["date"], milk["time_of_milking"].astype(str)]).sum()
+        for (day, session), litres in by_session.items():
+            if session in SESSION_FIELDS:
+                doc = counters.setdefault(counter_ids(day)[0], {"date": day.isoformat()})
+                doc[SESSION_FIELDS[session]] = float(litres)
+    if not totals.empty:
+        totals = to_date(totals, "date").dropna(subset=["date"])
+        litres = pd.to_numeric(totals["total_litres"], errors="coerce").astype("float64").fillna(0.0)
+        for day, total in litres.groupby(totals["date"]).sum().items():
+            day_id, week_id, month_id = counter_ids(day)
+            counters.setdefault(day_id, {"date": day.isoformat()})["total_litres"] = float(total)
+            for doc_id, start in ((week_id, week_start(day)), (month_id, day.replace(day=1))):
+                doc = counters.setdefault(doc_id, {"start": start.isoformat(), "total_litres": 0.0})
+                doc["total_litres"] += float(total)
+    return counters
+
+def rebuild_milk_counters():
+    """
+    Recompute every counter from the milk records and overwrite the stored ones, deleting
+    counters whose records are gone. Returns the number of counter documents written, or
+    None when nothing was written: a write failed, or a read budget is spent.
+
+    The records are read from Firestore, not the shared tables: those may be up to
+    TABLE_TTL_SECONDS old or, over budget, the stale fallback frame, and counters rebuilt
+    from either would overwrite correct ones.
+    """
+    if exceeded_budget() is not None:
+        return None
+    milk, totals, existing = (get_collection(name, keep_last=False)
+                              for name in ("milk_production", "milk_totals", COUNTERS_COLLECTION))
+    # A budget spent by these reads may have served the later ones from the fallback
+    if exceeded_budget() is not None:
+        return None
+    counters = build_milk_counters(milk, totals)
+    stale = set(existing["id"]) - set(counters) if not existing.empty else set()
+    writes = [(COUNTERS_COLLECTION, doc_id, data, False) for doc_id, data in counters.items()]
+    writes += [(COUNTERS_COLLECTION, doc_id, None, False) for doc_id in stale]
+    for start in range(0, len(writes), BATCH_SIZE):
+        if not write_batch(writes[start:start + BATCH_SIZE]):
+            return None
+    return len(counters)
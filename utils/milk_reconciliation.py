@@ -0,0 +1,90 @@
+# dairy_farm_app/utils/milk_reconciliation.py
+"""
+Reconciliation of the two milk records: the per-cow milkings in milk_production and the
+daily totals in milk_totals. For every day the litres for sale of the individual records
+are compared with the recorded total, and days that differ by more than the tolerance,
+or have only one of the two, are flagged.
+
+The daily counters (utils/milk_counters.py) already hold both sides, kept up to date by
+every write, so a period is reconciled from one counter document per day instead of the
+full record history.
+"""
+from datetime import date, timedelta
+import numpy as np
+import pandas as pd
+from firebase_utils import query_collection
+from utils.milk_counters import COUNTERS_COLLECTION, SESSION_FIELDS
+
+# A day matches when the two differ by at most this share of the total, or this many litres
+TOLERANCE_SHARE = 0.05
+TOLERANCE_LITRES = 1.0
+
+# status -> what the manager should do about it
+STATUSES = {
+    "ok": "",
+    "mismatch": "Check the individual records and the total for this day.",
+    "no total": "Record the day's total production.",
+    "no cow records": "Record the individual milkings.",
+    "no records": "Nothing was recorded for this day.",
+}
+
+def reconcile(daily, start, end, tolerance_share=TOLERANCE_SHARE, tolerance_litres=TOLERANCE_LITRES):
+    """
+    One row per day from start to end with per_cow (litres for sale of the individual
+    records), recorded (the daily total), difference, difference_pct and status. daily has
+    a date column and per_cow and recorded columns, NaN where a side has no records.
+    """
+    days = pd.date_range(start, end, freq="D")
+    if daily.empty:
+        daily = pd.DataFrame({"per_cow": np.nan, "recorded": np.nan}, index=days)
+    else:
+        daily = daily.assign(date=pd.to_datetime(daily["date"])).groupby("date")[["per_cow", "recorded"]].sum(min_count=1)
+        daily = daily.reindex(days)
+    per_cow, recorded = daily["per_cow"].to_numpy(dtype="float64"), daily["recorded"].to_numpy(dtype="float64")
+    difference = recorded - per_cow
+    with np.errstate(divide="ignore", invalid="ignore"):
+        difference_pct = np.where(recorded > 0, 100 * difference / recorded, np.nan)
+    allowed = np.maximum(tolerance_share * np.nan_to_num(recorded), tolerance_litres)
+    has_cows, has_total = ~np.isnan(per_cow), ~np.isnan(recorded)
+    status = np.select(
+        [has_cows & has_total & (np.abs(difference) <= allowed), has_cows & has_total, has_cows, has_total],
+        ["ok", "mismatch", "no total", "no cow records"], default="no records")
+    return pd.DataFrame({"date": days.date, "per_cow": per_cow, "recorded": recorded, "difference": difference,
+                         "difference_pct": difference_pct, "status": status})
+
+def daily_sums(milk, totals):
+    """The per_cow and recorded sides of each day from milk_production and milk_totals frames."""
+    sides = []
+    if not milk.empty:
+        litres = pd.to_numeric(milk["litres_sell"], errors="coerce").astype("float64")
+        sides.append(litres.groupby(pd.to_datetime(milk["date"], errors="coerce")).sum().rename("per_cow"))
+    if not totals.empty:
+        litres = pd.to_numeric(totals["total_litres"], errors="coerce").astype("float64")
+        sides.append(litres.groupby(pd.to_datetime(totals["date"], errors="coerce")).sum().rename("recorded"))
+    if not sides:
+        return pd.DataFrame(columns=["date", "per_cow", "recorded"])
+    daily = pd.concat(sides, axis=1).reindex(columns=["per_cow", "recorded"])
+    return daily.rename_axis("date").reset_index()
+
+def reconcile_records(milk, totals, start, end, **tolerance):
+    """reconcile over already loaded milk_production and milk_totals frames."""
+    return reconcile(daily_sums(milk, totals), start, end, **tolerance)
+
+def read_reconciliation(start, end, **tolerance):
+    """reconcile from the day counters between start and end: one document read per recorded day."""
+    counters = query_collection(COUNTERS_COLLECTION, [("date", ">=", start.isoformat()), ("date", "<=", end.isoformat())])
+    if counters.empty:
+        return reconcile(pd.DataFrame(), start, end, **tolerance)
+    sessions = counters.reindex(columns=list(SESSION_FIELDS.values())).apply(pd.to_numeric, errors="coerce")
+    daily = pd.DataFrame({
+        "date": counters["date"],
+        # A counter that never had a milking has no session fields; one whose records were all deleted reads 0
+        "per_cow": sessions.sum(axis=1, min_count=1),
+        "recorded": pd.to_numeric(counters["total_litres"], errors="coerce") if "total_litres" in counters.columns else np.nan,
+    })
+    return reconcile(daily, start, end, **tolerance)
+
+def recent_reconciliation(days=30, **tolerance):
+    """read_reconciliation for the last days days, today included."""
+    end = date.today()
+    return read_reconciliation(end - timedelta(days=days - 1), end, **tolerance)
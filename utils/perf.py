@@ -0,0 +1,146 @@
+# dairy_farm_app/utils/perf.py
+"""
+In-process performance counters: Firestore documents read and written per collection,
+timings of every Firestore call and of every page render. Numbers are shared by all
+sessions of this server process and reset when it restarts.
+"""
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+# Timings kept per (operation, collection) and per page for the percentiles
+MAX_SAMPLES = 2000
+
+_lock = threading.Lock()
+_local = threading.local()
+_started = datetime.now()
+_firestore = defaultdict(lambda: {"calls": 0, "docs": 0, "errors": 0, "seconds": 0.0,
+                                  "samples": deque(maxlen=MAX_SAMPLES)})
+_pages = defaultdict(lambda: {"renders": 0, "reads": 0, "seconds": 0.0, "samples": deque(maxlen=MAX_SAMPLES)})
+_page_reads = defaultdict(int)  # (page, collection) -> documents read
+_imports = {}                   # page module -> seconds its first import took
+
+def current_page():
+    """The page being rendered on this thread, or None outside a page_timer block."""
+    return getattr(_local, "page", None)
+
+class _Call:
+    def __init__(self):
+        self.docs = 0
+        self.error = False
+
+@contextmanager
+def track_firestore(operation, collection):
+    """
+    Time one Firestore call. Set .docs on the yielded object to the number of documents
+    read or written and .error if the call failed.
+    """
+    call = _Call()
+    started = time.perf_counter()
+    try:
+        yield call
+    except Exception:
+        call.error = True
+        raise
+    finally:
+        record_firestore_call(operation, collection, call.docs, time.perf_counter() - started, call.error)
+
+def record_firestore_call(operation, collection, docs, seconds, error=False):
+    page = current_page()
+    with _lock:
+        stats = _firestore[(operation, collection)]
+        stats["calls"] += 1
+        stats["docs"] += docs
+        stats["errors"] += int(error)
+        stats["seconds"] += seconds
+        stats["samples"].append(seconds)
+        if operation == "read":
+            _page_reads[(page or "(outside pages)", collection)] += docs
+    if operation == "read" and page is not None:
+        _local.reads = getattr(_local, "reads", 0) + docs
+
+@contextmanager
+def page_timer(page):
+    """Time a page render and attribute the Firestore reads made during it to the page."""
+    _local.page = page
+    _local.reads = 0
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - started
+        with _lock:
+            stats = _pages[page]
+            stats["renders"] += 1
+            stats["reads"] += _local.reads
+            stats["seconds"] += seconds
+            stats["samples"].append(seconds)
+        _local.page = None
+
+def record_import(module_name, seconds):
+    with _lock:
+        _imports[module_name] = seconds
+
+def import_stats():
+    """Time each page module took to import when its page was first opened in this process."""
+    with _lock:
+        rows = [{"module": module, "import (ms)": seconds * 1000} for module, seconds in _imports.items()]
+    if not rows:
+        return pd.DataFrame()
+    return pd.DataFrame(rows).sort_values("import (ms)", ascending=False).reset_index(drop=True)
+
+def _percentiles(samples):
+    if not samples:
+        return {"p50 (ms)": 0.0, "p95 (ms)": 0.0, "p99 (ms)": 0.0, "max (ms)": 0.0}
+    values = np.fromiter(samples, dtype=float) * 1000
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"p50 (ms)": p50, "p95 (ms)": p95, "p99 (ms)": p99, "max (ms)": values.max()}
+
+def firestore_stats():
+    """One row per (operation, collection) with call counts, documents and latency percentiles."""
+    with _lock:
+        rows = [{"operation": op, "collection": collection, "calls": s["calls"], "documents": s["docs"],
+                 "errors": s["errors"], "total (s)": s["seconds"], **_percentiles(s["samples"])}
+                for (op, collection), s in _firestore.items()]
+    if not rows:
+        return pd.DataFrame()
+    return pd.DataFrame(rows).sort_values("documents", ascending=False).reset_index(drop=True)
+
+def page_stats():
+    """One row per page with render counts, reads per render and render time percentiles."""
+    with _lock:
+        rows = [{"page": page, "renders": s["renders"], "reads": s["reads"],
+                 "reads / render": s["reads"] / s["renders"] if s["renders"] else 0.0,
+                 "total (s)": s["seconds"], **_percentiles(s["samples"])}
+                for page, s in _pages.items()]
+    if not rows:
+        return pd.DataFrame()
+    return pd.DataFrame(rows).sort_values("p95 (ms)", ascending=False).reset_index(drop=True)
+
+def top_read_offenders(n=10):
+    """The (page, collection) pairs that have read the most documents."""
+    with _lock:
+        rows = [{"page": page, "collection": collection, "documents": docs}
+                for (page, collection), docs in _page_reads.items()]
+    if not rows:
+        return pd.DataFrame()
+    return pd.DataFrame(rows).sort_values("documents", ascending=False).head(n).reset_index(drop=True)
+
+def totals():
+    with _lock:
+        reads = sum(s["docs"] for (op, _), s in _firestore.items() if op == "read")
+        writes = sum(s["docs"] for (op, _), s in _firestore.items() if op == "write")
+        renders = sum(s["renders"] for s in _pages.values())
+    return {"reads": reads, "writes": writes, "renders": renders, "since": _started}
+
+def reset():
+    global _started
+    with _lock:
+        _firestore.clear()
+        _pages.clear()
+        _page_reads.clear()
+        _started = datetime.now()
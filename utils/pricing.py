@@ -0,0 +1,55 @@
+# dairy_farm_app/utils/pricing.py
+import numpy as np
+import pandas as pd
+from utils.data_loader import load_table, to_date
+
+# Price used for any milk sold before the first entry in milk_prices
+DEFAULT_MILK_PRICE = 43.0
+
+def get_milk_prices():
+    """Milk price history (effective_date, price_per_litre) sorted by effective date."""
+    prices = load_table("milk_prices")
+    if prices.empty or "effective_date" not in prices.columns:
+        return pd.DataFrame(columns=["effective_date", "price_per_litre"])
+    prices = to_date(prices, "effective_date")
+    prices["price_per_litre"] = pd.to_numeric(prices["price_per_litre"], errors="coerce")
+    prices = prices.dropna(subset=["effective_date", "price_per_litre"])
+    # If two prices share an effective date the last one recorded wins
+    return prices.sort_values("effective_date").drop_duplicates("effective_date", keep="last")[
+        ["effective_date", "price_per_litre"]].reset_index(drop=True)
+
+def price_on(day, prices=None):
+    """Milk price in effect on a single day."""
+    if prices is None:
+        prices = get_milk_prices()
+    in_effect = prices[prices["effective_date"] <= day]
+    return float(in_effect["price_per_litre"].iloc[-1]) if not in_effect.empty else DEFAULT_MILK_PRICE
+
+def price_milk(df, date_col="date", litres_col="litres", prices=None):
+    """
+    Return a copy of df with price_per_litre and revenue columns, priced with one
+    as-of join of each row's date against the price history.
+    """
+    if prices is None:
+        prices = get_milk_prices()
+    out = df.copy()
+    if out.empty:
+        out["price_per_litre"] = pd.Series(dtype=float)
+        out["revenue"] = pd.Series(dtype=float)
+        return out
+
+    price = np.full(len(out), DEFAULT_MILK_PRICE)
+    dates = pd.to_datetime(pd.Series(out[date_col].to_numpy()), errors="coerce")
+    valid = dates.notna().to_numpy()
+
+    if not prices.empty and valid.any():
+        left = pd.DataFrame({"_date": dates[valid].to_numpy(), "_pos": np.flatnonzero(valid)}).sort_values("_date")
+        right = pd.DataFrame({"_date": pd.to_datetime(prices["effective_date"]).to_numpy(dtype="datetime64[ns]"),
+                              "price_per_litre": prices["price_per_litre"].to_numpy(dtype=float)})
+        left["_date"] = left["_date"].astype("datetime64[ns]")
+        matched = pd.merge_asof(left, right, on="_date", direction="backward")
+        price[matched["_pos"].to_numpy()] = matched["price_per_litre"].fillna(DEFAULT_MILK_PRICE).to_numpy()
+
+    out["price_per_litre"] = price
+    out["revenue"] = pd.to_numeric(out[litres_col], errors="coerce").fillna(0).to_numpy() * price
+    return out
@@ -0,0 +1,108 @@
+# dairy_farm_app/utils/read_budget.py
+"""
+Firestore read budgets. Every read is charged to the session and to the day; once either
+budget is spent, collection reads are served from the last frame read for that collection
+and the manager is alerted with the collection and page that hit the limit.
+
+Budgets come from the [read_budget] section of Streamlit secrets (session_reads, daily_reads),
+then the READ_BUDGET_SESSION / READ_BUDGET_DAILY environment variables, then the defaults.
+"""
+import os
+import threading
+from collections import deque
+from datetime import date, datetime
+import pandas as pd
+import streamlit as st
+
+DEFAULT_SESSION_READS = 20000
+# Firestore's free tier is 50,000 reads a day; leave room for exports and logins
+DEFAULT_DAILY_READS = 45000
+
+_lock = threading.Lock()
+_daily = {"day": None, "reads": 0}
+_last_frames = {}            # collection -> (DataFrame, read at)
+_alerts = deque(maxlen=500)  # dicts of time, scope, collection, page, reads, budget
+_alerted = set()             # (day, scope, collection, page) already alerted
+
+def _setting(key, env_var, default):
+    try:
+        value = st.secrets.get("read_budget", {}).get(key)
+    except Exception:
+        # No secrets file configured
+        value = None
+    if value is None:
+        value = os.getenv(env_var)
+    try:
+        return int(value) if value is not None else default
+    except (TypeError, ValueError):
+        return default
+
+def get_read_budgets():
+    return {
+        "session": _setting("session_reads", "READ_BUDGET_SESSION", DEFAULT_SESSION_READS),
+        "daily": _setting("daily_reads", "READ_BUDGET_DAILY", DEFAULT_DAILY_READS),
+    }
+
+def _roll_day():
+    today = date.today()
+    if _daily["day"] != today:
+        _daily["day"] = today
+        _daily["reads"] = 0
+        # Alerts are once per day, so earlier days' keys are no longer needed
+        _alerted.clear()
+
+def charge_reads(docs):
+    """Charge documents read to the current session and to today's total."""
+    with _lock:
+        _roll_day()
+        _daily["reads"] += docs
+    st.session_state.firestore_reads = st.session_state.get("firestore_reads", 0) + docs
+
+def read_usage():
+    with _lock:
+        _roll_day()
+        daily = _daily["reads"]
+    return {"session": st.session_state.get("firestore_reads", 0), "daily": daily}
+
+def exceeded_budget():
+    """"session" or "daily" if that read budget is spent, otherwise None."""
+    budgets = get_read_budgets()
+    usage = read_usage()
+    if usage["daily"] >= budgets["daily"]:
+        return "daily"
+    if usage["session"] >= budgets["session"]:
+        return "session"
+    return None
+
+def remember_frame(collection_name, df):
+    with _lock:
+        # Shallow: the caller's frame and this one share data until either is modified
+        _last_frames[collection_name] = (df.copy(deep=False), datetime.now())
+
+def last_frame(collection_name):
+    """A copy of the last frame read for the collection, or None if it was never read."""
+    with _lock:
+        entry = _last_frames.get(collection_name)
+    return entry[0].copy(deep=False) if entry is not None else None
+
+def record_budget_alert(scope, collection_name, page):
+    """Record that a page was served cached data. Returns True the first time today for this scope, collection and page."""
+    budgets = get_read_budgets()
+    usage = read_usage()
+    key = (date.today(), scope, collection_name, page)
+    with _lock:
+        if key in _alerted:
+            return False
+        _alerted.add(key)
+        _alerts.append({"time": datetime.now(), "scope": scope, "collection": collection_name, "page": page,
+                        "reads": usage[scope], "budget": budgets[scope]})
+    return True
+
+def budget_alerts(day=None):
+    """Alerts raised on the given day (default today), newest first."""
+    day = day or date.today()
+    with _lock:
+        rows = [a for a in _alerts if a["time"].date() == day]
+    if not rows:
+        return pd.DataFrame()
+    return pd.DataFrame(rows).sort_values("time", ascending=False).reset_index(drop=True)
@@ -0,0 +1,132 @@
+# dairy_farm_app/utils/report_pdf.py
+import importlib.util
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from io import BytesIO
+from utils.helpers import format_with_commas
+
+# reportlab is only imported when a report is rendered; checking for it is enough at import
+REPORTLAB_AVAILABLE = importlib.util.find_spec("reportlab") is not None
+
+# Rows per table chunk; the layout engine only ever measures one chunk at a time
+# so rendering time stays linear in herd size.
+ROWS_PER_TABLE = 200
+MAX_CACHED_REPORTS = 16
+
+# Collections the report is built from; a write or reload of any of them changes the data version.
+REPORT_COLLECTIONS = ("milk_totals", "milk_production", "milk_prices", "feeds_received", "feeds_used",
+                      "health_records", "ai_records", "employees", "cows")
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="pdf-report")
+_lock = threading.Lock()
+_cache = OrderedDict()   # key -> PDF bytes
+_pending = {}            # key -> Future
+
+def _summary_lines(df_agg):
+    revenue = df_agg["revenue"].sum()
+    feed_cost = df_agg["feed_cost"].sum()
+    return [
+        f"Total Revenue: KES {format_with_commas(revenue)}",
+        f"Total Costs: KES {format_with_commas(df_agg['total_cost'].sum())}",
+        f"Total Profit: KES {format_with_commas(df_agg['profit'].sum())}",
+        f"Feed Efficiency: {revenue / feed_cost:.2f}" if feed_cost > 0 else "Feed Efficiency: N/A",
+        f"Total Salary Cost: KES {format_with_commas(df_agg['salary_cost'].sum())}"
+    ]
+
+def _profit_rows(profit_per_cow):
+    # Format whole columns at once instead of row by row
+    return list(zip(
+        profit_per_cow["Cow"].astype(str),
+        profit_per_cow["Milk Produced (L)"].map("{:,.1f}".format),
+        profit_per_cow["Revenue (KES)"].map("KES {:,.0f}".format),
+        profit_per_cow["Cost (KES)"].map("KES {:,.0f}".format),
+        profit_per_cow["Profit (KES)"].map("KES {:,.0f}".format),
+    ))
+
+def render_report_pdf(df_agg, profit_per_cow, start_date, end_date):
+    """Render the farm report to PDF bytes. Safe to call off the Streamlit script thread."""
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.lib.units import cm
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, LongTable, TableStyle, PageBreak
+
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4, leftMargin=2*cm, rightMargin=2*cm,
+                            topMargin=2*cm, bottomMargin=2*cm,
+                            title="Dairy Farm Management Report")
+    styles = getSampleStyleSheet()
+
+    story = [
+        Paragraph("Dairy Farm Management Report", styles["Title"]),
+        Paragraph(f"Period: {start_date} to {end_date}", styles["Normal"]),
+        Paragraph(f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M')}", styles["Normal"]),
+        Spacer(1, 0.5*cm),
+        Paragraph("Summary Metrics:", styles["Heading3"]),
+    ]
+    story += [Paragraph(line, styles["Normal"]) for line in _summary_lines(df_agg)]
+
+    if not profit_per_cow.empty:
+        story += [PageBreak(), Paragraph("Profit per Cow Analysis", styles["Heading2"])]
+
+        headers = ["Cow", "Milk (L)", "Revenue", "Cost", "Profit"]
+        table_style = TableStyle([
+            ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+            ("FONTSIZE", (0, 0), (-1, -1), 9),
+            ("BACKGROUND", (0, 0), (-1, 0), colors.lightgrey),
+            ("ALIGN", (1, 0), (-1, -1), "RIGHT"),
+            ("ROWBACKGROUNDS", (0, 1), (-1, -1), [colors.white, colors.whitesmoke]),
+            ("LINEBELOW", (0, 0), (-1, 0), 0.5, colors.grey),
+        ])
+        rows = _profit_rows(profit_per_cow)
+        for i in range(0, len(rows), ROWS_PER_TABLE):
+            table = LongTable([headers] + rows[i:i + ROWS_PER_TABLE], colWidths=[3.4*cm] * 5, repeatRows=1)
+            table.setStyle(table_style)
+            story.append(table)
+
+    doc.build(story)
+    return buffer.getvalue()
+
+def _render_and_store(key, df_agg, profit_per_cow, start_date, end_date):
+    pdf = render_report_pdf(df_agg, profit_per_cow, start_date, end_date)
+    with _lock:
+        _cache[key] = pdf
+        _cache.move_to_end(key)
+        while len(_cache) > MAX_CACHED_REPORTS:
+            _cache.popitem(last=False)
+        _pending.pop(key, None)
+    return pdf
+
+def report_cache_key(start_date, end_date, granularity, data_version):
+    return (str(start_date), str(end_date), granularity, data_version)
+
+def request_report_pdf(key, df_agg, profit_per_cow, start_date, end_date):
+    """Start rendering the report for key in the background, unless it is cached or already rendering."""
+    with _lock:
+        future = _pending.get(key)
+        # A failed render stays pending to report its error, and is replaced by the next request
+        if key in _cache or (future is not None and not (future.done() and future.exception() is not None)):
+            return
+        _pending[key] = _executor.submit(_render_and_store, key, df_agg.copy(), profit_per_cow.copy(),
+                                         start_date, end_date)
+
+def report_pdf_status(key):
+    """
+    (pdf_bytes, error, rendering) for key without starting a render. A failed render's
+    error is returned until the report is requested again.
+    """
+    with _lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key], None, False
+        future = _pending.get(key)
+    if future is None:
+        return None, None, False
+    if not future.done():
+        return None, None, True
+    error = future.exception()
+    if error is not None:
+        return None, error, False
+    return future.result(), None, False
@@ -0,0 +1,174 @@
+# dairy_farm_app/utils/schemas.py
+"""
+Field schemas for the collections records are written to, and vectorized typing of
+whole frames against them. Firestore itself is schemaless; these describe what the
+pages write, so imported rows come out the same as rows entered through the forms.
+
+Field types: text, number, integer, date (stored as an ISO string) and choice.
+"""
+import numpy as np
+import pandas as pd
+from utils.data_loader import to_datetime64
+
+MILKING_SESSIONS = ["Morning", "Lunch", "Evening"]
+MAX_LITRES = 10000.0
+
+SCHEMAS = {
+    "milk_production": {
+        "cow": {"type": "text", "required": True},
+        "date": {"type": "date", "required": True},
+        "time_of_milking": {"type": "choice", "required": True, "choices": MILKING_SESSIONS},
+        "litres_sell": {"type": "number", "required": True, "min": 0, "max": MAX_LITRES},
+        "litres_calves": {"type": "number", "min": 0, "max": MAX_LITRES, "default": 0.0},
+    },
+    "milk_totals": {
+        "date": {"type": "date", "required": True},
+        "total_litres": {"type": "number", "required": True, "min": 0, "max": MAX_LITRES},
+    },
+    "feeds_received": {
+        "date": {"type": "date", "required": True},
+        "feed_type": {"type": "text", "required": True},
+        "quantity": {"type": "number", "required": True, "min": 0, "max": 1000000},
+        "cost": {"type": "number", "required": True, "min": 0, "max": 100000000},
+    },
+    "feeds_used": {
+        "date": {"type": "date", "required": True},
+        "category": {"type": "text", "required": True},
+        "feed_type": {"type": "text", "required": True},
+        "quantity": {"type": "number", "required": True, "min": 0, "max": 1000000},
+        "note": {"type": "text"},
+    },
+    "health_records": {
+        "cow_tag": {"type": "text", "required": True},
+        "date": {"type": "date", "required": True},
+        "disease": {"type": "text", "required": True},
+        "medicine": {"type": "text"},
+        "medicine_quantity": {"type": "integer", "min": 0, "default": 0},
+        "medicine_price": {"type": "number", "min": 0},
+        "cost": {"type": "number", "min": 0},
+        "vaccinations": {"type": "text"},
+        "observations": {"type": "text"},
+    },
+    "ai_records": {
+        "cow_tag": {"type": "text", "required": True},
+        "ai_date": {"type": "date", "required": True},
+        "heat_date": {"type": "date"},
+        "heat_signs": {"type": "text"},
+        "ai_time": {"type": "text"},
+        "technician": {"type": "text"},
+        "technician_id": {"type": "text"},
+        "bull_id": {"type": "text"},
+        "bull_breed": {"type": "text"},
+        "semen_batch": {"type": "text"},
+        "semen_expiry": {"type": "date"},
+        "semen_quality": {"type": "choice", "choices": ["Poor", "Fair", "Good", "Excellent"]},
+        "expected_calving_date": {"type": "date"},
+        "success_rating": {"type": "integer", "min": 1, "max": 5},
+        "pregnancy_status": {"type": "text"},
+        "calving_outcome": {"type": "text"},
+        "cost": {"type": "number", "min": 0},
+        "observations": {"type": "text"},
+    },
+    "employees": {
+        "name": {"type": "text", "required": True},
+        "role": {"type": "choice", "required": True, "choices": ["Milker", "Feeder", "Cleaner", "Supervisor"]},
+        "salary": {"type": "number", "required": True, "min": 1},
+        "phone": {"type": "text"},
+        "start_date": {"type": "date", "required": True},
+        "status": {"type": "choice", "choices": ["Active", "On Leave", "Terminated"], "default": "Active"},
+        "end_date": {"type": "date"},
+    },
+}
+
+def normalize_columns(df):
+    """Column headers as field names: "Litres Sell " -> "litres_sell"."""
+    return df.rename(columns=lambda col: str(col).strip().lower().replace(" ", "_").replace("-", "_"))
+
+def missing_columns(columns, collection):
+    """Required fields of collection that columns (already normalized) do not contain."""
+    return [field for field, spec in SCHEMAS[collection].items() if spec.get("required") and field not in columns]
+
+def _text(raw):
+    """Values as stripped strings, NaN where missing. Categoricals are converted per category."""
+    if isinstance(raw.dtype, pd.CategoricalDtype):
+        categories = raw.cat.categories.astype(str).str.strip().to_numpy(dtype=object)
+        codes = raw.cat.codes.to_numpy()
+        return pd.Series(np.where(codes >= 0, categories[codes], np.nan), index=raw.index, dtype=object)
+    return raw.astype(str).str.strip().where(raw.notna())
+
+def _blank(raw):
+    """Missing values and empty text. Only text can be empty, so typed columns skip the string pass."""
+    if not (isinstance(raw.dtype, pd.CategoricalDtype) or pd.api.types.is_object_dtype(raw)
+            or pd.api.types.is_string_dtype(raw)):
+        return raw.isna()
+    return raw.isna() | _text(raw).eq("")
+
+def _dates(raw, blank):
+    if isinstance(raw.dtype, pd.ArrowDtype) or pd.api.types.is_datetime64_any_dtype(raw):
+        # Typed date columns of the shared tables: a cast instead of parsing every value
+        return to_datetime64(raw)
+    return pd.to_datetime(raw.where(~blank), errors="coerce", format="mixed")
+
+def _coerce_field(raw, spec):
+    """(typed values, mask of values present but not of the field's type)."""
+    blank = _blank(raw)
+    kind = spec["type"]
+    if kind in ("number", "integer"):
+        values = pd.to_numeric(raw.where(~blank), errors="coerce")
+        invalid = ~blank & values.isna()
+        if kind == "integer":
+            invalid |= values.notna() & (values % 1 != 0)
+            return values.where(~invalid).astype("Int64"), invalid
+        # Stored as floats even when whole, as the forms do
+        return values.astype("float64"), invalid
+    if kind == "date":
+        parsed = _dates(raw, blank)
+        return parsed.dt.strftime("%Y-%m-%d").where(parsed.notna()), ~blank & parsed.isna()
+    text = _text(raw).where(~blank)
+    if kind == "choice":
+        # Case-insensitive match onto the canonical spelling
+        canonical = {choice.lower(): choice for choice in spec["choices"]}
+        values = text.str.lower().map(canonical)
+        return values, ~blank & values.isna()
+    return text, pd.Series(False, index=raw.index)
+
+def coerce_frame(df, collection):
+    """
+    Type every schema field of df in one pass per column. Returns (valid rows typed and
+    limited to the schema fields, errors) where errors has one row per problem with the
+    row label of df, the field, the offending value and the reason.
+    """
+    df = normalize_columns(df)
+    typed = {}
+    problems = []
+    for field, spec in SCHEMAS[collection].items():
+        raw = df[field] if field in df.columns else pd.Series(np.nan, index=df.index, dtype=object)
+        values, invalid = _coerce_field(raw, spec)
+        missing = values.isna() & ~invalid
+        if "default" in spec:
+            values = values.where(~missing, spec["default"])
+        elif spec.get("required"):
+            problems.append((missing, field, "required"))
+        problems.append((invalid, field, f"not a valid {spec['type']}"
+                         + (f" ({', '.join(spec['choices'])})" if spec["type"] == "choice" else "")))
+        if "min" in spec:
+            problems.append((values.notna() & (values.astype(float) < spec["min"]), field, f"below {spec['min']:,}"))
+        if "max" in spec:
+            problems.append((values.notna() & (values.astype(float) > spec["max"]), field, f"above {spec['max']:,}"))
+        typed[field] = values
+
+    errors = [pd.DataFrame({"row": df.index[mask.to_numpy()], "field": field,
+                            "value": (df[field][mask] if field in df.columns else pd.Series(None, index=df.index[mask]))
+                            .astype(object).to_numpy(),
+                            "error": reason})
+              for mask, field, reason in problems if mask.any()]
+    errors = (pd.concat(errors, ignore_index=True).sort_values("row", kind="stable", ignore_index=True) if errors
+              else pd.DataFrame(columns=["row", "field", "value", "error"]))
+    typed = pd.DataFrame(typed, index=df.index)
+    return typed[~typed.index.isin(errors["row"])], errors
+
+def to_records(typed):
+    """Rows as Firestore-ready dicts: Python scalars, with missing optional values left out."""
+    values = typed.astype(object).where(typed.notna(), None)
+    return [{field: value for field, value in row.items() if value is not None}
+            for row in values.to_dict("records")]
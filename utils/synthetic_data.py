@@ -0,0 +1,274 @@
+# dairy_farm_app/utils/synthetic_data.py
+"""
+Synthetic farm data for load and scale testing.
+
+    python -m utils.synthetic_data --cows 500 --years 5 --out snapshots/large
+    FIRESTORE_EMULATOR_HOST=localhost:8080 python -m utils.synthetic_data --cows 500 --years 5 --emulator
+
+Collections mirror what the app writes: ISO date strings, float quantities and the same field names.
+"""
+import argparse
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+SESSIONS = ["Morning", "Lunch", "Evening"]
+SESSION_SHARE = np.array([0.42, 0.28, 0.30])
+FEEDS = {  # feed type -> (KES per kg, kg per cow per day)
+    "Dairy Meal": (55.0, 5.5),
+    "Hay": (18.0, 8.0),
+    "Silage": (9.0, 15.0),
+    "Mineral Lick": (120.0, 0.1),
+}
+DISEASES = ["Mastitis", "Milk Fever", "Foot Rot", "East Coast Fever", "Bloat", "Pneumonia", "Worms"]
+BREEDS = ["Friesian", "Ayrshire", "Jersey", "Guernsey"]
+TECHNICIANS = ["J. Kamau", "M. Wanjiru", "P. Otieno", "A. Njoroge"]
+EMPLOYEE_ROLES = ["Milker", "Feeder", "Cleaner", "Supervisor"]
+AUDIT_ACTIONS = ["MILK_RECORDED", "FEED_USED", "HEALTH_RECORD_ADDED", "AI_RECORD_ADDED", "STAFF_LOGIN", "MANAGER_LOGIN"]
+
+def _iso(days):
+    return pd.DatetimeIndex(days).strftime("%Y-%m-%d").to_numpy(dtype=object)
+
+def generate_cows(rng, n_cows):
+    status = rng.choice(["Lactating", "Dry", "Calf"], size=n_cows, p=[0.7, 0.2, 0.1])
+    gender = np.where(status == "Calf", rng.choice(["Male", "Female"], size=n_cows), "Female")
+    yield_category = np.where(status == "Lactating", rng.choice(["High", "Low"], size=n_cows, p=[0.4, 0.6]), None)
+    return pd.DataFrame({
+        "name": [f"Cow {i:04d}" for i in range(1, n_cows + 1)],
+        "status": status,
+        "gender": gender,
+        "yield_category": yield_category,
+    })
+
+def generate_milk(rng, cows, days):
+    """Three milkings a day for every lactating cow, following a lactation curve per cow."""
+    lactating = cows[cows["status"] == "Lactating"].reset_index(drop=True)
+    n_cows, n_days = len(lactating), len(days)
+    if n_cows == 0:
+        return pd.DataFrame(columns=["cow", "date", "time_of_milking", "litres_sell", "litres_calves"])
+
+    base = np.where(lactating["yield_category"] == "High", 26.0, 16.0) * rng.normal(1.0, 0.1, n_cows)
+    # Cows calve roughly yearly at different points; Wood's curve over days in milk
+    calving_offset = rng.integers(0, 365, n_cows)
+    dim = (np.arange(n_days)[None, :] + calving_offset[:, None]) % 365 + 1
+    curve = dim ** 0.2 * np.exp(-0.004 * dim)
+    curve /= curve.max()
+    daily = base[:, None] * curve * rng.normal(1.0, 0.08, (n_cows, n_days))
+
+    # cow x day x session, flattened
+    litres = np.clip(daily[:, :, None] * SESSION_SHARE[None, None, :], 0, None)
+    calves = np.where(rng.random(litres.shape) < 0.1, np.round(rng.uniform(0.5, 2.0, litres.shape), 1), 0.0)
+
+    return pd.DataFrame({
+        "cow": np.repeat(lactating["name"].to_numpy(), n_days * 3),
+        "date": np.tile(np.repeat(_iso(days), 3), n_cows),
+        "time_of_milking": np.tile(SESSIONS, n_cows * n_days),
+        "litres_sell": np.round(litres.ravel(), 1),
+        "litres_calves": calves.ravel(),
+    })
+
+def generate_milk_totals(rng, milk):
+    """Daily totals close to, but not exactly, the per-cow sum, as they are recorded by hand."""
+    if milk.empty:
+        return pd.DataFrame(columns=["date", "total_litres"])
+    totals = milk.groupby("date", as_index=False)["litres_sell"].sum()
+    noise = rng.normal(1.0, 0.02, len(totals))
+    missing = rng.random(len(totals)) < 0.03
+    totals = totals[~missing]
+    return pd.DataFrame({"date": totals["date"].to_numpy(),
+                         "total_litres": np.round(totals["litres_sell"].to_numpy() * noise[~missing], 1)})
+
+def generate_feeds(rng, cows, days):
+    n_lactating = int((cows["status"] == "Lactating").sum())
+    n_grown = int((cows["status"] != "Calf").sum())
+    used, received = [], []
+    for feed_type, (price, per_cow) in FEEDS.items():
+        head = n_lactating if feed_type == "Dairy Meal" else n_grown
+        daily_use = np.round(head * per_cow * rng.normal(1.0, 0.05, len(days)), 1)
+        used.append(pd.DataFrame({
+            "date": _iso(days),
+            "category": "Lactating Cows" if feed_type == "Dairy Meal" else "Grown Cow",
+            "feed_type": feed_type,
+            "quantity": np.clip(daily_use, 0, None),
+        }))
+
+        # Weekly deliveries sized to cover the week, with slow price inflation
+        delivery_days = days[::7]
+        weekly = np.add.reduceat(daily_use, np.arange(0, len(days), 7))
+        quantity = np.round(weekly * rng.uniform(1.0, 1.15, len(delivery_days)), 0)
+        inflation = 1 + 0.06 * (np.arange(len(delivery_days)) / 52)
+        received.append(pd.DataFrame({
+            "date": _iso(delivery_days),
+            "feed_type": feed_type,
+            "quantity": quantity,
+            "cost": np.round(quantity * price * inflation * rng.normal(1.0, 0.03, len(delivery_days)), 0),
+        }))
+    return pd.concat(received, ignore_index=True), pd.concat(used, ignore_index=True)
+
+def generate_feed_allocations(cows, days):
+    lactating = cows[cows["status"] == "Lactating"]
+    amount = np.where(lactating["yield_category"] == "High", 7.0, 4.0)
+    return pd.DataFrame({
+        "date": np.tile(_iso(days), len(lactating)),
+        "cow": np.repeat(lactating["name"].to_numpy(), len(days)),
+        "feed_type": "Dairy Meal",
+        "amount": np.repeat(amount, len(days)),
+        "yield_category": np.repeat(lactating["yield_category"].to_numpy(), len(days)),
+        "recorded_by": "Staff",
+    })
+
+def generate_health(rng, cows, days):
+    n = rng.poisson(0.4 * len(cows) * len(days) / 365)
+    medicine_price = np.round(rng.uniform(200, 3000, n), 0)
+    return pd.DataFrame({
+        "cow_tag": rng.choice(cows["name"].to_numpy(), n),
+        "disease": rng.choice(DISEASES, n, p=[0.3, 0.1, 0.15, 0.1, 0.1, 0.1, 0.15]),
+        "medicine": rng.choice(["Penicillin", "Oxytetracycline", "Calcium Borogluconate", "Albendazole"], n),
+        "medicine_id": None,
+        "medicine_quantity": rng.integers(1, 5, n),
+        "medicine_price": medicine_price,
+        "date": _iso(rng.choice(days, n)),
+        "vaccinations": "",
+        "observations": "",
+        "cost": np.where(rng.random(n) < 0.9, medicine_price + np.round(rng.uniform(0, 1500, n), 0), np.nan),
+    })
+
+def generate_ai(rng, cows, days):
+    breeding = cows[cows["status"] != "Calf"]["name"].to_numpy()
+    n = rng.poisson(1.3 * len(breeding) * len(days) / 365) if len(breeding) else 0
+    ai_days = pd.DatetimeIndex(rng.choice(days, n)) if n else pd.DatetimeIndex([])
+    pregnant = rng.random(n) < 0.55
+    calved = pregnant & (ai_days + timedelta(days=280) < pd.Timestamp(days[-1]))
+    return pd.DataFrame({
+        "cow_tag": rng.choice(breeding, n) if n else [],
+        "heat_date": _iso(ai_days - timedelta(days=1)),
+        "heat_signs": "Standing to be mounted, Clear mucus discharge",
+        "ai_date": _iso(ai_days),
+        "ai_time": "08:30",
+        "technician": rng.choice(TECHNICIANS, n),
+        "technician_id": "",
+        "bull_id": [f"B{x:03d}" for x in rng.integers(1, 60, n)],
+        "bull_breed": rng.choice(BREEDS, n),
+        "semen_batch": [f"S{x:05d}" for x in rng.integers(1, 99999, n)],
+        "semen_expiry": None,
+        "semen_quality": rng.choice(["Fair", "Good", "Excellent"], n),
+        "expected_calving_date": _iso(ai_days + timedelta(days=280)),
+        "success_rating": rng.integers(1, 6, n),
+        "observations": "",
+        "cost": np.round(rng.uniform(1500, 4000, n), 0),
+        "pregnancy_status": np.where(pregnant, "Pregnant", rng.choice(["Not Pregnant", None], n)),
+        "calving_outcome": np.where(calved, rng.choice(["Heifer", "Bull"], n), None),
+    })
+
+def generate_employees(rng, n_cows, days):
+    n = max(3, n_cows // 25)
+    start = pd.DatetimeIndex(rng.choice(days[: max(1, len(days) // 2)], n))
+    left = rng.random(n) < 0.2
+    end = start + pd.to_timedelta(rng.integers(60, 365, n), unit="D")
+    return pd.DataFrame({
+        "name": [f"Employee {i:03d}" for i in range(1, n + 1)],
+        "role": rng.choice(EMPLOYEE_ROLES, n),
+        "salary": rng.choice([12000, 15000, 18000, 25000], n),
+        "phone": [f"07{x:08d}" for x in rng.integers(0, 99999999, n)],
+        "start_date": _iso(start),
+        "status": np.where(left, "Terminated", "Active"),
+        "end_date": np.where(left, _iso(end), None),
+    })
+
+def generate_audit_log(rng, n_events, days):
+    seconds = rng.integers(5 * 3600, 20 * 3600, n_events)
+    stamps = pd.DatetimeIndex(rng.choice(days, n_events)) + pd.to_timedelta(seconds, unit="s")
+    return pd.DataFrame({
+        "timestamp": stamps.strftime("%Y-%m-%d %H:%M:%S").to_numpy(dtype=object),
+        "user": rng.choice(["Staff", "Manager"], n_events, p=[0.85, 0.15]),
+        "action": rng.choice(AUDIT_ACTIONS, n_events),
+        "details": "",
+    })
+
+def generate_farm_data(n_cows=100, years=1.0, end_date=None, seed=0, allocations=True):
+    """Generate every collection for a farm of n_cows over `years` of history. Returns {collection: DataFrame}."""
+    rng = np.random.default_rng(seed)
+    end_date = end_date or date.today()
+    n_days = max(1, int(round(years * 365)))
+    days = pd.date_range(end=pd.Timestamp(end_date), periods=n_days, freq="D").to_numpy()
+
+    cows = generate_cows(rng, n_cows)
+    milk = generate_milk(rng, cows, days)
+    feeds_received, feeds_used = generate_feeds(rng, cows, days)
+    data = {
+        "cows": cows,
+        "milk_production": milk,
+        "milk_totals": generate_milk_totals(rng, milk),
+        "feeds_received": feeds_received,
+        "feeds_used": feeds_used,
+        "health_records": generate_health(rng, cows, days),
+        "ai_records": generate_ai(rng, cows, days),
+        "employees": generate_employees(rng, n_cows, days),
+    }
+    if allocations:
+        data["feed_allocations"] = generate_feed_allocations(cows, days)
+    data["audit_log"] = generate_audit_log(rng, max(10, len(milk) // 10), days)
+    return data
+
+def _records(df):
+    return df.astype(object).where(df.notna(), None).to_dict("records")
+
+def write_snapshot(data, directory):
+    """Write one Parquet file per collection."""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    for name, df in data.items():
+        df.to_parquet(directory / f"{name}.parquet", index=False)
+
+def write_to_emulator(data, project="demo-dairy-farm", batch_size=500, workers=8):
+    """Bulk-load into the Firestore emulator with parallel 500-write batches."""
+    if "FIRESTORE_EMULATOR_HOST" not in os.environ:
+        raise SystemExit("FIRESTORE_EMULATOR_HOST is not set; refusing to write synthetic data to a real project.")
+    from google.cloud import firestore
+
+    client = firestore.Client(project=project)
+
+    def commit(collection, chunk):
+        batch = client.batch()
+        for record in chunk:
+            batch.set(client.collection(collection).document(), record)
+        batch.commit()
+        return len(chunk)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for name, df in data.items():
+            records = _records(df)
+            chunks = [records[i:i + batch_size] for i in range(0, len(records), batch_size)]
+            written = sum(pool.map(lambda chunk: commit(name, chunk), chunks))
+            print(f"{name}: {written:,} documents")
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic dairy farm data.")
+    parser.add_argument("--cows", type=int, default=100)
+    parser.add_argument("--years", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-allocations", action="store_true", help="skip per-cow feed_allocations")
+    parser.add_argument("--out", help="directory for Parquet snapshot files")
+    parser.add_argument("--emulator", action="store_true", help="write to the Firestore emulator")
+    parser.add_argument("--project", default="demo-dairy-farm")
+    args = parser.parse_args()
+
+    if not args.out and not args.emulator:
+        parser.error("choose --out DIR and/or --emulator")
+
+    started = datetime.now()
+    data = generate_farm_data(args.cows, args.years, seed=args.seed, allocations=not args.no_allocations)
+    for name, df in data.items():
+        print(f"generated {name}: {len(df):,} rows")
+    if args.out:
+        write_snapshot(data, args.out)
+        print(f"snapshot written to {args.out}")
+    if args.emulator:
+        write_to_emulator(data, project=args.project)
+    print(f"done in {(datetime.now() - started).total_seconds():.1f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+# dairy_farm_app/utils/validation.py
+"""
+Rule-based validation shared by the write paths and the data-quality audit.
+
+    required, type, range   the field rules of utils/schemas.py
+    reference               cow names must belong to the herd
+    duplicate               one record per key, e.g. per cow, day and milking
+    outlier                 values far from the rest of their group (audit only)
+
+validate_record checks one record before it is written. audit_collection checks a whole
+collection in one vectorized pass and keeps the result until the table or the herd changes.
+"""
+import threading
+import numpy as np
+import pandas as pd
+from utils.schemas import SCHEMAS, coerce_frame
+from utils.data_loader import load_table, table_token
+from utils.cow_registry import get_cow_registry
+
+# collection -> field holding a cow name
+REFERENCE_FIELDS = {"milk_production": "cow", "health_records": "cow_tag", "ai_records": "cow_tag"}
+# collection -> fields that identify a record; a second record with the same values is a duplicate
+UNIQUE_KEYS = {
+    "milk_production": ["cow", "date", "time_of_milking"],
+    "milk_totals": ["date"],
+    "employees": ["name"],
+}
+# collection -> (field, grouping field or None) compared for outliers
+OUTLIER_FIELDS = {
+    "milk_production": ("litres_sell", "cow"),
+    "milk_totals": ("total_litres", None),
+    "feeds_used": ("quantity", "feed_type"),
+    "feeds_received": ("quantity", "feed_type"),
+}
+# Modified z-score (0.6745 * distance from the median / MAD) above which a value is an outlier
+OUTLIER_SCORE = 3.5
+# Groups with fewer values than this are not checked for outliers
+OUTLIER_MIN_GROUP = 10
+
+AUDIT_COLLECTIONS = list(SCHEMAS)
+ISSUE_COLUMNS = ["row", "field", "value", "rule", "message"]
+
+def _issues(rows, field, values, rule, message):
+    return pd.DataFrame({"row": rows, "field": field, "value": pd.Series(values, dtype=object).to_numpy(),
+                         "rule": rule, "message": message})
+
+def _schema_issues(errors):
+    """coerce_frame's error report in the issue layout."""
+    reason = errors["error"].astype(str)
+    rule = np.where(reason.eq("required"), "required",
+                    np.where(reason.str.startswith(("below", "above")), "range", "type"))
+    return errors.assign(rule=rule).rename(columns={"error": "message"})[ISSUE_COLUMNS]
+
+def reference_issues(df, collection, herd):
+    """Rows whose cow is not in herd (a collection of names). Skipped when the herd is empty."""
+    field = REFERENCE_FIELDS.get(collection)
+    if field is None or field not in df.columns or not herd:
+        return pd.DataFrame(columns=ISSUE_COLUMNS)
+    names = df[field]
+    unknown = names.notna() & ~names.isin(list(herd))
+    return _issues(df.index[unknown.to_numpy()], field, names[unknown], "reference", "not a cow in the herd")
+
+def duplicate_issues(df, collection):
+    """Rows repeating the key of an earlier row of df."""
+    key = UNIQUE_KEYS.get(collection)
+    if key is None or not set(key) <= set(df.columns):
+        return pd.DataFrame(columns=ISSUE_COLUMNS)
+    repeated = df[key].notna().all(axis=1) & df.duplicated(subset=key, keep="first")
+    if not repeated.any():
+        return pd.DataFrame(columns=ISSUE_COLUMNS)
+    values = df.loc[repeated, key].astype(str).agg(" / ".join, axis=1)
+    return _issues(df.index[repeated.to_numpy()], ", ".join(key), values, "duplicate", "repeats an earlier record")
+
+def outlier_issues(df, collection):
+    """
+    Rows whose value is far from the median of its group (e.g. the cow's own yields), by the
+    modified z-score, so a few extreme values do not hide each other the way they would
+    with a mean and standard deviation.
+    """
+    field, group = OUTLIER_FIELDS.get(collection, (None, None))
+    if field is None or field not in df.columns or (group is not None and group not in df.columns):
+        return pd.DataFrame(columns=ISSUE_COLUMNS)
+    values = pd.to_numeric(df[field], errors="coerce").astype("float64")
+    keys = df[group].astype(object) if group is not None else pd.Series(0, index=df.index)
+    grouped = values.groupby(keys, sort=False, dropna=True)
+    median = grouped.transform("median")
+    mad = (values - median).abs().groupby(keys, sort=False, dropna=True).transform("median")
+    count = grouped.transform("count")
+    score = 0.6745 * (values - median).abs() / mad.where(mad > 0)
+    flagged = (score > OUTLIER_SCORE) & (count >= OUTLIER_MIN_GROUP)
+    if not flagged.any():
+        return pd.DataFrame(columns=ISSUE_COLUMNS)
+    scope = f" for this {group.replace('_', ' ')}" if group else ""
+    return _issues(df.index[flagged.to_numpy()], field, df[field][flagged], "outlier",
+                   [f"far from the usual {typical:,.1f}{scope}" for typical in median[flagged]])
+
+def validate_frame(df, collection, herd=None):
+    """
+    Every required, type, range, reference and duplicate problem in df, one row per problem
+    with the row label of df. herd defaults to the shared registry's cow names.
+    """
+    if herd is None:
+        herd = get_cow_registry().by_name
+    issues = [_schema_issues(coerce_frame(df, collection)[1]), reference_issues(df, collection, herd),
+              duplicate_issues(df, collection)]
+    issues = [frame for frame in issues if not frame.empty]
+    if not issues:
+        return pd.DataFrame(columns=ISSUE_COLUMNS)
+    return pd.concat(issues, ignore_index=True).sort_values("row", kind="stable", ignore_index=True)
+
+def validate_record(collection, record, existing=None, herd=None):
+    """
+    Problems with one record about to be written, as messages for the form. existing is an
+    optional frame of stored records to check the record's key against, e.g. a query for
+    the same day. An empty herd skips the reference check.
+    """
+    df = pd.DataFrame([record])
+    if existing is not None and not existing.empty:
+        df = pd.concat([existing, df], ignore_index=True)
+    issues = validate_frame(df, collection, herd)
+    issues = issues[issues["row"] == df.index[-1]]
+    return [f"{field.replace('_', ' ').capitalize()}: {message}."
+            for field, message in zip(issues["field"], issues["message"])]
+
+_audits = {}  # collection -> (table and herd tokens, issues)
+_audits_lock = threading.Lock()
+
+def audit_collection(collection):
+    """
+    Every problem in the stored collection, outliers included, with the document id as
+    "row". Computed once per version of the shared table and herd for all sessions.
+    """
+    df = load_table(collection)
+    token = (table_token(collection), table_token("cows"))
+    with _audits_lock:
+        cached = _audits.get(collection)
+    if cached is not None and token[0] is not None and cached[0] == token:
+        return cached[1]
+    if df.empty:
+        return pd.DataFrame(columns=ISSUE_COLUMNS)
+
+    df = df.set_index("id") if "id" in df.columns else df
+    issues = [validate_frame(df, collection), outlier_issues(df, collection)]
+    issues = pd.concat([frame for frame in issues if not frame.empty] or [pd.DataFrame(columns=ISSUE_COLUMNS)],
+                       ignore_index=True)
+    if token[0] is not None:
+        with _audits_lock:
+            _audits[collection] = (token, issues)
+    return issues
+
+def audit_summary(collections=AUDIT_COLLECTIONS):
+    """Problem counts per collection and rule, one row per collection."""
+    counts = {collection: audit_collection(collection)["rule"].value_counts() for collection in collections}
+    summary = pd.DataFrame(counts).T.reindex(columns=["required", "type", "range", "reference", "duplicate", "outlier"])
+    summary = summary.rename_axis(columns=None).fillna(0).astype(int)
+    return summary.assign(total=summary.sum(axis=1)).rename_axis("collection").reset_index()
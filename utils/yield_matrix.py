@@ -0,0 +1,235 @@
+# dairy_farm_app/utils/yield_matrix.py
+"""
+Milk yield as a dense cow x day x session array, and yield drop alerts computed on it
+for the whole herd at once.
+
+A cow's milking is compared with the same session on her previous days: a sudden drop
+well below her own recent level (by z-score and by share) is an early sign of mastitis or
+other illness. Sessions are compared separately, so a day whose evening milking is not
+recorded yet does not look like a drop.
+
+The shared matrix is built once from milk_production and then takes new milkings as they
+are recorded (record_milkings), instead of being rebuilt from every record after each write.
+Other writers are picked up by re-reading only the days the alerts look at. A published
+matrix is never changed: updates are made on a copy that then replaces it, so readers
+need no lock.
+"""
+import threading
+import time
+from datetime import date, timedelta
+import numpy as np
+import pandas as pd
+from utils.data_loader import load_table, get_collection_version, to_datetime64, TABLE_TTL_SECONDS
+
+SESSIONS = ["Morning", "Lunch", "Evening"]
+# Days of the same session a milking is compared with
+BASELINE_DAYS = 7
+# Fewer recorded days than this in the baseline and the milking is not judged
+MIN_BASELINE_DAYS = 4
+# A drop is flagged when the milking is this many standard deviations below the baseline mean...
+DROP_Z = -2.5
+# ...and at least this share below it
+DROP_SHARE = 0.2
+# The standard deviation is taken as at least this share of the mean, so very steady cows
+# are not flagged for small dips
+MIN_STD_SHARE = 0.05
+ALERT_DAYS = 3
+# Days added at a time when a milking falls after the last day of the matrix
+GROW_DAYS = 31
+
+class YieldMatrix:
+    """
+    litres[cow, day, session] of milk for sale, NaN where nothing was recorded. cows lists
+    the rows and start is the date of the first column.
+    """
+
+    def __init__(self, cows, start, litres):
+        self.cows = list(cows)
+        self.cow_index = {cow: i for i, cow in enumerate(self.cows)}
+        self.start = start
+        self.litres = litres
+
+    @classmethod
+    def from_records(cls, milk):
+        """Build from a milk_production frame in one vectorized pass. Repeated milkings keep the last."""
+        if milk.empty:
+            return cls([], None, np.full((0, 0, len(SESSIONS)), np.nan, dtype="float32"))
+        days = to_datetime64(milk["date"])
+        sessions = pd.Categorical(milk["time_of_milking"].astype(object), categories=SESSIONS).codes
+        cows = pd.Categorical(milk["cow"].astype(object))
+        keep = days.notna().to_numpy() & (sessions >= 0) & (cows.codes >= 0)
+        if not keep.any():
+            return cls([], None, np.full((0, 0, len(SESSIONS)), np.nan, dtype="float32"))
+        start = days[keep].min()
+        day_index = ((days[keep] - start).dt.days).to_numpy()
+        litres = np.full((len(cows.categories), int(day_index.max()) + 1, len(SESSIONS)), np.nan, dtype="float32")
+        litres[cows.codes[keep], day_index, sessions[keep]] = pd.to_numeric(milk["litres_sell"], errors="coerce").to_numpy()[keep]
+        return cls(cows.categories, start.date(), litres)
+
+    @property
+    def days(self):
+        return self.litres.shape[1]
+
+    @property
+    def last_recorded(self):
+        """Index of the last day with any milking, or -1 for an empty matrix."""
+        recorded = np.flatnonzero(~np.isnan(self.litres).all(axis=(0, 2)))
+        return int(recorded[-1]) if len(recorded) else -1
+
+    def _ensure(self, cow, day):
+        """Row and column for cow on day, adding a row or days (at either end) as needed."""
+        if cow not in self.cow_index:
+            self.cow_index[cow] = len(self.cows)
+            self.cows.append(cow)
+            self.litres = np.concatenate([self.litres, np.full((1,) + self.litres.shape[1:], np.nan, "float32")])
+        if self.start is None:
+            self.start = day
+            self.litres = np.full((len(self.cows), GROW_DAYS, len(SESSIONS)), np.nan, dtype="float32")
+        offset = (day - self.start).days
+        if offset < 0:
+            pad = np.full((len(self.cows), -offset, len(SESSIONS)), np.nan, dtype="float32")
+            self.litres, self.start, offset = np.concatenate([pad, self.litres], axis=1), day, 0
+        elif offset >= self.days:
+            pad = np.full((len(self.cows), offset - self.days + GROW_DAYS, len(SESSIONS)), np.nan, dtype="float32")
+            self.litres = np.concatenate([self.litres, pad], axis=1)
+        return self.cow_index[cow], offset
+
+    def record(self, cow, day, session, litres):
+        """Set one milking (day a datetime.date)."""
+        if session not in SESSIONS:
+            return
+        row, column = self._ensure(cow, day)
+        self.litres[row, column, SESSIONS.index(session)] = litres
+
+    def copy(self):
+        return YieldMatrix(self.cows, self.start, self.litres.copy())
+
+    def replace_days(self, first, milk):
+        """Clear every milking from day first on and set those of the milk_production frame milk instead."""
+        if self.start is not None:
+            self.litres[:, max((first - self.start).days, 0):] = np.nan
+        if milk.empty:
+            return
+        days = to_datetime64(milk["date"])
+        sessions = pd.Categorical(milk["time_of_milking"].astype(object), categories=SESSIONS).codes
+        cows = milk["cow"].astype(object)
+        keep = (days.notna() & cows.notna()).to_numpy() & (sessions >= 0)
+        if not keep.any():
+            return
+        days, sessions, cows = days[keep], sessions[keep], cows[keep]
+        # Rows for new cows and columns for the first and last day, then one assignment
+        for cow in pd.unique(cows):
+            self._ensure(cow, days.min().date())
+        self._ensure(cows.iloc[0], days.max().date())
+        rows = cows.map(self.cow_index).to_numpy()
+        columns = (days - pd.Timestamp(self.start)).dt.days.to_numpy()
+        self.litres[rows, columns, sessions] = pd.to_numeric(milk["litres_sell"], errors="coerce").to_numpy()[keep]
+
+def rolling_baseline(litres, window=BASELINE_DAYS):
+    """
+    (mean, std, count) of each cell's previous window days in the same session, for every
+    cow, day and session at once. Missing milkings are left out; cells whose window has
+    fewer than two milkings get NaN.
+    """
+    values = np.nan_to_num(litres, nan=0.0).astype("float64")
+    present = ~np.isnan(litres)
+    # Cumulative sums along days with a leading zero day, so a window sum is a difference
+    pad = np.zeros((litres.shape[0], 1, litres.shape[2]))
+    sums = np.concatenate([pad, np.cumsum(values, axis=1)], axis=1)
+    squares = np.concatenate([pad, np.cumsum(values ** 2, axis=1)], axis=1)
+    counts = np.concatenate([pad, np.cumsum(present, axis=1)], axis=1)
+    ends = np.arange(litres.shape[1])
+    starts = np.maximum(ends - window, 0)
+    count = counts[:, ends] - counts[:, starts]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = (sums[:, ends] - sums[:, starts]) / count
+        variance = ((squares[:, ends] - squares[:, starts]) - count * mean ** 2) / (count - 1)
+    mean[count < 2] = np.nan
+    return mean, np.sqrt(np.clip(variance, 0.0, None)), count
+
+def yield_drops(matrix, days=ALERT_DAYS, end=None):
+    """
+    Milkings of the last days days up to end (default the last recorded day) well below the
+    cow's own baseline for that session, worst first: cow, date, session, litres, baseline,
+    z_score and drop (share below the baseline).
+    """
+    columns = ["cow", "date", "session", "litres", "baseline", "z_score", "drop"]
+    if not matrix.cows or matrix.start is None:
+        return pd.DataFrame(columns=columns)
+    last = (end - matrix.start).days if end is not None else matrix.last_recorded
+    first = max(last - days + 1, 0)
+    # Nothing recorded in the alert days: older drops are not current alerts
+    if last < 0 or first >= matrix.days:
+        return pd.DataFrame(columns=columns)
+    # Only the alert days and their baselines are needed; days past the matrix have no milkings
+    recent = matrix.litres[:, max(first - BASELINE_DAYS, 0):last + 1]
+    if last + 1 > matrix.days:
+        recent = np.concatenate([recent, np.full((recent.shape[0], last + 1 - matrix.days, len(SESSIONS)), np.nan,
+                                                 dtype="float32")], axis=1)
+    mean, std, count = rolling_baseline(recent)
+    tail = slice(recent.shape[1] - (last - first + 1), None)
+    litres, mean, std, count = recent[:, tail], mean[:, tail], std[:, tail], count[:, tail]
+    std = np.maximum(std, MIN_STD_SHARE * mean)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z_score = (litres - mean) / std
+        drop = 1 - litres / mean
+    flagged = (count >= MIN_BASELINE_DAYS) & (z_score <= DROP_Z) & (drop >= DROP_SHARE)
+    cow, day, session = np.nonzero(flagged)
+    return pd.DataFrame({
+        "cow": np.asarray(matrix.cows, dtype=object)[cow],
+        "date": [matrix.start + timedelta(days=first + int(d)) for d in day],
+        "session": np.asarray(SESSIONS, dtype=object)[session],
+        "litres": litres[flagged].astype("float64"),
+        "baseline": mean[flagged],
+        "z_score": z_score[flagged],
+        "drop": drop[flagged],
+    }, columns=columns).sort_values("z_score", ignore_index=True)
+
+_matrix = None  # (milk_production version it is current with, refreshed at, YieldMatrix)
+_matrix_lock = threading.Lock()
+
+def get_yield_matrix():
+    """
+    The shared matrix. It is rebuilt from the records when they changed other than through
+    record_milkings. After the shared table lifetime only the days the alerts look at are
+    re-read, to pick up other writers without reading the whole history again.
+    """
+    global _matrix
+    version = get_collection_version("milk_production")
+    with _matrix_lock:
+        current = _matrix
+    if current is not None and current[0] == version:
+        if time.monotonic() - current[1] < TABLE_TTL_SECONDS:
+            return current[2]
+        from firebase_utils import query_collection
+
+        first = date.today() - timedelta(days=ALERT_DAYS + BASELINE_DAYS - 1)
+        recent = query_collection("milk_production", [("date", ">=", first.isoformat())])
+        matrix = current[2].copy()
+        # An empty result may be a failed read; the recent days are then kept as they are
+        if not recent.empty:
+            matrix.replace_days(first, recent)
+    else:
+        matrix = YieldMatrix.from_records(load_table("milk_production"))
+    with _matrix_lock:
+        # Milkings recorded meanwhile changed the version; their matrix is kept
+        if _matrix is current:
+            _matrix = (version, time.monotonic(), matrix)
+    return matrix
+
+def record_milkings(records, since_version):
+    """
+    Add milkings just written (dicts with cow, date, time_of_milking and litres_sell) to the
+    shared matrix. since_version is the milk_production version read before the write: only
+    a matrix current at that version takes them, otherwise the next read rebuilds it.
+    """
+    global _matrix
+    with _matrix_lock:
+        if _matrix is None or _matrix[0] != since_version:
+            return
+        version, refreshed_at, matrix = _matrix
+        matrix = matrix.copy()
+        for record in records:
+            matrix.record(record["cow"], pd.Timestamp(record["date"]).date(), record["time_of_milking"],
+                          float(record["litres_sell"]))
+        _matrix = (get_collection_version("milk_production"), refreshed_at, matrix)